@@ -0,0 +1,23 @@
+"""Add event range indexes
+
+Revision ID: 002_event_range_indexes
+Revises: 001_initial
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '002_event_range_indexes'
+down_revision = '001_initial'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_index('ix_events_org_starts_at', 'events', ['org_id', 'starts_at'], unique=False)
+    op.create_index('ix_events_org_ends_at', 'events', ['org_id', 'ends_at'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_events_org_ends_at', table_name='events')
+    op.drop_index('ix_events_org_starts_at', table_name='events')
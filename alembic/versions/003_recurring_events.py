@@ -0,0 +1,46 @@
+"""Add recurring events and occurrence exceptions
+
+Revision ID: 003_recurring_events
+Revises: 002_event_range_indexes
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '003_recurring_events'
+down_revision = '002_event_range_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('rrule', sa.String(), nullable=True))
+    op.add_column('events', sa.Column('recurrence_until', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_events_org_recurring', 'events', ['org_id', 'recurrence_until'], unique=False,
+        postgresql_where=sa.text('rrule IS NOT NULL'),
+        sqlite_where=sa.text('rrule IS NOT NULL')
+    )
+
+    op.create_table('event_exceptions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('original_start', sa.DateTime(), nullable=False),
+        sa.Column('cancelled', sa.Boolean(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('starts_at', sa.DateTime(), nullable=True),
+        sa.Column('ends_at', sa.DateTime(), nullable=True),
+        sa.Column('location', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('event_id', 'original_start', name='_event_occurrence_uc')
+    )
+    op.create_index(op.f('ix_event_exceptions_id'), 'event_exceptions', ['id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_event_exceptions_id'), table_name='event_exceptions')
+    op.drop_table('event_exceptions')
+    op.drop_index('ix_events_org_recurring', table_name='events')
+    op.drop_column('events', 'recurrence_until')
+    op.drop_column('events', 'rrule')
@@ -0,0 +1,90 @@
+"""Add interval index for event conflict detection
+
+Revision ID: 004_event_interval_index
+Revises: 003_recurring_events
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '004_event_interval_index'
+down_revision = '003_recurring_events'
+branch_labels = None
+depends_on = None
+
+# Events without ends_at are treated as one hour long
+SQLITE_STATEMENTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS events_rtree USING rtree_i32(id, starts_min, ends_max)",
+    """CREATE TRIGGER IF NOT EXISTS events_rtree_insert AFTER INSERT ON events BEGIN
+        INSERT INTO events_rtree (id, starts_min, ends_max) VALUES (
+            new.id,
+            CAST(strftime('%s', new.starts_at) AS INTEGER) / 60,
+            MAX(CAST(strftime('%s', new.starts_at) AS INTEGER) / 60,
+                (CAST(strftime('%s', COALESCE(new.ends_at, datetime(new.starts_at, '+1 hour'))) AS INTEGER) + 59) / 60)
+        );
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_rtree_update AFTER UPDATE OF starts_at, ends_at ON events BEGIN
+        UPDATE events_rtree SET
+            starts_min = CAST(strftime('%s', new.starts_at) AS INTEGER) / 60,
+            ends_max = MAX(CAST(strftime('%s', new.starts_at) AS INTEGER) / 60,
+                (CAST(strftime('%s', COALESCE(new.ends_at, datetime(new.starts_at, '+1 hour'))) AS INTEGER) + 59) / 60)
+        WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_rtree_delete AFTER DELETE ON events BEGIN
+        DELETE FROM events_rtree WHERE id = old.id;
+    END""",
+    # Backfill existing events
+    """INSERT INTO events_rtree (id, starts_min, ends_max)
+        SELECT id,
+            CAST(strftime('%s', starts_at) AS INTEGER) / 60,
+            MAX(CAST(strftime('%s', starts_at) AS INTEGER) / 60,
+                (CAST(strftime('%s', COALESCE(ends_at, datetime(starts_at, '+1 hour'))) AS INTEGER) + 59) / 60)
+        FROM events""",
+]
+
+POSTGRES_STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    """CREATE INDEX ix_events_user_during ON events USING gist (
+        user_id, tsrange(starts_at, COALESCE(ends_at, starts_at + interval '1 hour'), '[)'))""",
+    """CREATE INDEX ix_events_location_during ON events USING gist (
+        location, tsrange(starts_at, COALESCE(ends_at, starts_at + interval '1 hour'), '[)'))
+        WHERE location IS NOT NULL""",
+]
+
+def upgrade() -> None:
+    # Series lookups filter on starts_at; index it so the planner picks the
+    # small partial index over the full (org_id, starts_at) one
+    op.drop_index('ix_events_org_recurring', table_name='events')
+    op.create_index(
+        'ix_events_org_recurring', 'events', ['org_id', 'starts_at'], unique=False,
+        postgresql_where=sa.text('rrule IS NOT NULL'),
+        sqlite_where=sa.text('rrule IS NOT NULL')
+    )
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_STATEMENTS:
+            op.execute(sa.text(statement))
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_STATEMENTS:
+            op.execute(sa.text(statement))
+
+def downgrade() -> None:
+    op.drop_index('ix_events_org_recurring', table_name='events')
+    op.create_index(
+        'ix_events_org_recurring', 'events', ['org_id', 'recurrence_until'], unique=False,
+        postgresql_where=sa.text('rrule IS NOT NULL'),
+        sqlite_where=sa.text('rrule IS NOT NULL')
+    )
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS events_rtree_delete')
+        op.execute('DROP TRIGGER IF EXISTS events_rtree_update')
+        op.execute('DROP TRIGGER IF EXISTS events_rtree_insert')
+        op.execute('DROP TABLE IF EXISTS events_rtree')
+    elif dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_events_location_during')
+        op.execute('DROP INDEX IF EXISTS ix_events_user_during')
@@ -0,0 +1,35 @@
+"""Add reminder delivery claims and a cross-org starts_at index
+
+Revision ID: 005_event_reminders
+Revises: 004_event_interval_index
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '005_event_reminders'
+down_revision = '004_event_interval_index'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_index('ix_events_starts_at', 'events', ['starts_at'], unique=False)
+
+    op.create_table('reminder_deliveries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('occurrence_start', sa.DateTime(), nullable=False),
+        sa.Column('minutes_before', sa.Integer(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('event_id', 'occurrence_start', 'minutes_before', name='_reminder_delivery_uc')
+    )
+    op.create_index(op.f('ix_reminder_deliveries_id'), 'reminder_deliveries', ['id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_reminder_deliveries_id'), table_name='reminder_deliveries')
+    op.drop_table('reminder_deliveries')
+    op.drop_index('ix_events_starts_at', table_name='events')
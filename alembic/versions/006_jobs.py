@@ -0,0 +1,61 @@
+"""Add background jobs table
+
+Revision ID: 006_jobs
+Revises: 005_event_reminders
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '006_jobs'
+down_revision = '005_event_reminders'
+branch_labels = None
+depends_on = None
+
+job_status = sa.Enum('queued', 'running', 'succeeded', 'failed', name='jobstatusenum')
+
+def upgrade() -> None:
+    op.create_table('jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('org_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('status', job_status, nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_by', sa.String(), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['org_id'], ['orgs.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_jobs_id'), 'jobs', ['id'], unique=False)
+    op.create_index(
+        'ix_jobs_queued', 'jobs', [sa.text('priority DESC'), 'run_at'], unique=False,
+        postgresql_where=sa.text("status = 'queued'"),
+        sqlite_where=sa.text("status = 'queued'")
+    )
+    op.create_index(
+        'ix_jobs_running_org', 'jobs', ['org_id'], unique=False,
+        postgresql_where=sa.text("status = 'running'"),
+        sqlite_where=sa.text("status = 'running'")
+    )
+    op.create_index('ix_jobs_org_created_at', 'jobs', ['org_id', 'created_at'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_org_created_at', table_name='jobs')
+    op.drop_index('ix_jobs_running_org', table_name='jobs')
+    op.drop_index('ix_jobs_queued', table_name='jobs')
+    op.drop_index(op.f('ix_jobs_id'), table_name='jobs')
+    op.drop_table('jobs')
+    job_status.drop(op.get_bind(), checkfirst=True)
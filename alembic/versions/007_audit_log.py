@@ -0,0 +1,39 @@
+"""Add audit log
+
+Revision ID: 007_audit_log
+Revises: 006_jobs
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '007_audit_log'
+down_revision = '006_jobs'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('audit_log',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('org_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('changes', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_audit_log_id'), 'audit_log', ['id'], unique=False)
+    op.create_index('ix_audit_log_org_created_at', 'audit_log', ['org_id', 'created_at'], unique=False)
+    op.create_index('ix_audit_log_org_entity', 'audit_log', ['org_id', 'entity', 'entity_id', 'created_at'], unique=False)
+    op.create_index('ix_audit_log_org_user', 'audit_log', ['org_id', 'user_id', 'created_at'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_audit_log_org_user', table_name='audit_log')
+    op.drop_index('ix_audit_log_org_entity', table_name='audit_log')
+    op.drop_index('ix_audit_log_org_created_at', table_name='audit_log')
+    op.drop_index(op.f('ix_audit_log_id'), table_name='audit_log')
+    op.drop_table('audit_log')
@@ -0,0 +1,48 @@
+"""Add delta sync versions and tombstones
+
+Revision ID: 008_delta_sync
+Revises: 007_audit_log
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '008_delta_sync'
+down_revision = '007_audit_log'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Existing rows start at version 0 and are sent by a full sync
+    op.add_column('orgs', sa.Column('sync_version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('orgs', sa.Column('sync_pruned_version', sa.Integer(), server_default='0', nullable=False))
+    for table in ('clients', 'cases', 'events'):
+        op.add_column(table, sa.Column('sync_version', sa.Integer(), server_default='0', nullable=False))
+        op.create_index(f'ix_{table}_org_sync_version', table, ['org_id', 'sync_version'], unique=False)
+    
+    op.create_table('sync_tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('org_id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['org_id'], ['orgs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sync_tombstones_id'), 'sync_tombstones', ['id'], unique=False)
+    op.create_index('ix_sync_tombstones_org_version', 'sync_tombstones', ['org_id', 'version'], unique=False)
+    op.create_index('ix_sync_tombstones_deleted_at', 'sync_tombstones', ['deleted_at'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_sync_tombstones_deleted_at', table_name='sync_tombstones')
+    op.drop_index('ix_sync_tombstones_org_version', table_name='sync_tombstones')
+    op.drop_index(op.f('ix_sync_tombstones_id'), table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+    for table in ('events', 'cases', 'clients'):
+        op.drop_index(f'ix_{table}_org_sync_version', table_name=table)
+        op.drop_column(table, 'sync_version')
+    op.drop_column('orgs', 'sync_pruned_version')
+    op.drop_column('orgs', 'sync_version')
@@ -0,0 +1,90 @@
+"""Add archive tables for closed cases
+
+Revision ID: 009_case_archive
+Revises: 008_delta_sync
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers
+revision = '009_case_archive'
+down_revision = '008_delta_sync'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Archival moves events by case
+    op.create_index('ix_events_case_id', 'events', ['case_id'], unique=False)
+    
+    op.create_table('cases_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('org_id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('case_number', sa.String(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        # Reuses the type created for cases
+        sa.Column('status', postgresql.ENUM('active', 'pending', 'closed', name='casestatusenum', create_type=False), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('sync_version', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+        sa.ForeignKeyConstraint(['org_id'], ['orgs.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('case_number')
+    )
+    op.create_index('ix_cases_archive_org_id', 'cases_archive', ['org_id', 'id'], unique=False)
+    
+    op.create_table('events_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('org_id', sa.Integer(), nullable=False),
+        sa.Column('case_id', sa.Integer(), nullable=True),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('type', sa.String(), nullable=True),
+        sa.Column('starts_at', sa.DateTime(), nullable=False),
+        sa.Column('ends_at', sa.DateTime(), nullable=True),
+        sa.Column('location', sa.String(), nullable=True),
+        sa.Column('rrule', sa.String(), nullable=True),
+        sa.Column('recurrence_until', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sync_version', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['case_id'], ['cases_archive.id'], ),
+        sa.ForeignKeyConstraint(['org_id'], ['orgs.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_events_archive_org_starts_at', 'events_archive', ['org_id', 'starts_at'], unique=False)
+    op.create_index('ix_events_archive_org_ends_at', 'events_archive', ['org_id', 'ends_at'], unique=False)
+    op.create_index('ix_events_archive_case_id', 'events_archive', ['case_id'], unique=False)
+    
+    op.create_table('event_exceptions_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('original_start', sa.DateTime(), nullable=False),
+        sa.Column('cancelled', sa.Boolean(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('starts_at', sa.DateTime(), nullable=True),
+        sa.Column('ends_at', sa.DateTime(), nullable=True),
+        sa.Column('location', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['event_id'], ['events_archive.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_event_exceptions_archive_event_id', 'event_exceptions_archive', ['event_id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_event_exceptions_archive_event_id', table_name='event_exceptions_archive')
+    op.drop_table('event_exceptions_archive')
+    op.drop_index('ix_events_archive_case_id', table_name='events_archive')
+    op.drop_index('ix_events_archive_org_ends_at', table_name='events_archive')
+    op.drop_index('ix_events_archive_org_starts_at', table_name='events_archive')
+    op.drop_table('events_archive')
+    op.drop_index('ix_cases_archive_org_id', table_name='cases_archive')
+    op.drop_table('cases_archive')
+    op.drop_index('ix_events_case_id', table_name='events')
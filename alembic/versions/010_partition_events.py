@@ -0,0 +1,132 @@
+"""Partition events by month on Postgres
+
+Revision ID: 010_partition_events
+Revises: 009_case_archive
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+import os
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '010_partition_events'
+down_revision = '009_case_archive'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 12
+
+EVENT_INDEXES = [
+    "CREATE INDEX ix_events_id ON events (id)",
+    "CREATE INDEX ix_events_org_starts_at ON events (org_id, starts_at)",
+    "CREATE INDEX ix_events_org_ends_at ON events (org_id, ends_at)",
+    "CREATE INDEX ix_events_starts_at ON events (starts_at)",
+    "CREATE INDEX ix_events_org_sync_version ON events (org_id, sync_version)",
+    "CREATE INDEX ix_events_case_id ON events (case_id)",
+    "CREATE INDEX ix_events_org_recurring ON events (org_id, starts_at) WHERE rrule IS NOT NULL",
+    """CREATE INDEX ix_events_user_during ON events USING gist (
+        user_id, tsrange(starts_at, COALESCE(ends_at, starts_at + interval '1 hour'), '[)'))""",
+    """CREATE INDEX ix_events_location_during ON events USING gist (
+        location, tsrange(starts_at, COALESCE(ends_at, starts_at + interval '1 hour'), '[)'))
+        WHERE location IS NOT NULL""",
+]
+
+EVENT_FOREIGN_KEYS = [
+    "ALTER TABLE events ADD CONSTRAINT events_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)",
+    "ALTER TABLE events ADD CONSTRAINT events_org_id_fkey FOREIGN KEY (org_id) REFERENCES orgs (id)",
+    "ALTER TABLE events ADD CONSTRAINT events_case_id_fkey FOREIGN KEY (case_id) REFERENCES cases (id)",
+]
+
+# Stands in for ON DELETE CASCADE of the dropped event_id foreign keys
+DELETE_TRIGGER = [
+    """CREATE OR REPLACE FUNCTION events_delete_dependents() RETURNS trigger AS $$
+    BEGIN
+        IF current_setting('app.moving_rows', true) IS DISTINCT FROM 'on'
+                AND NOT EXISTS (SELECT 1 FROM events WHERE id = OLD.id) THEN
+            DELETE FROM event_exceptions WHERE event_id = OLD.id;
+            DELETE FROM reminder_deliveries WHERE event_id = OLD.id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER events_delete_dependents AFTER DELETE ON events
+        FOR EACH ROW EXECUTE FUNCTION events_delete_dependents()""",
+]
+
+def _partition_events() -> bool:
+    # Same switch as PARTITION_EVENTS in app/partitions.py
+    return os.getenv("PARTITION_EVENTS", "true").lower() in ("1", "true", "yes")
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def _rebuild(partitioned: bool) -> None:
+    """Copy events into a new (partitioned or plain) table with its indexes"""
+    op.execute("ALTER TABLE events RENAME TO events_old")
+
+    op.execute(
+        "CREATE TABLE events (LIKE events_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        + (" PARTITION BY RANGE (starts_at)" if partitioned else "")
+    )
+    if partitioned:
+        op.execute("CREATE TABLE events_default PARTITION OF events DEFAULT")
+    op.execute("INSERT INTO events SELECT * FROM events_old")
+    op.execute("ALTER SEQUENCE events_id_seq OWNED BY events.id")
+    # Also drops its indexes, trigger and the event_id foreign keys of
+    # event_exceptions and reminder_deliveries
+    op.execute("DROP TABLE events_old CASCADE")
+
+    op.execute("ALTER TABLE events ADD PRIMARY KEY (id, starts_at)" if partitioned
+               else "ALTER TABLE events ADD PRIMARY KEY (id)")
+    for statement in EVENT_FOREIGN_KEYS + EVENT_INDEXES:
+        op.execute(sa.text(statement))
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or not _partition_events():
+        # SQLite, and Postgres with PARTITION_EVENTS=false, keep a single events table
+        return
+
+    _rebuild(partitioned=True)
+    for statement in DELETE_TRIGGER:
+        op.execute(sa.text(statement))
+
+    # One partition per month from the oldest event to MONTHS_AHEAD from now;
+    # each takes its rows out of events_default before it is attached
+    now = datetime.utcnow()
+    first = bind.execute(sa.text("SELECT min(starts_at) FROM events")).scalar() or now
+    month = datetime(first.year, first.month, 1)
+    until = _add_months(datetime(now.year, now.month, 1), MONTHS_AHEAD)
+    op.execute("SELECT set_config('app.moving_rows', 'on', true)")
+    while month <= until:
+        name = f"events_{month:%Y_%m}"
+        lo, hi = f"{month:%Y-%m-%d}", f"{_add_months(month, 1):%Y-%m-%d}"
+        op.execute(f"CREATE TABLE {name} (LIKE events INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        op.execute(f"INSERT INTO {name} SELECT * FROM events_default WHERE starts_at >= '{lo}' AND starts_at < '{hi}'")
+        op.execute(f"DELETE FROM events_default WHERE starts_at >= '{lo}' AND starts_at < '{hi}'")
+        op.execute(f"ALTER TABLE events ATTACH PARTITION {name} FOR VALUES FROM ('{lo}') TO ('{hi}')")
+        month = _add_months(month, 1)
+    op.execute("SELECT set_config('app.moving_rows', 'off', true)")
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or not bind.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('events'))"
+    )).scalar():
+        return
+
+    _rebuild(partitioned=False)
+    op.execute("DROP FUNCTION IF EXISTS events_delete_dependents()")
+    # Dependents of events deleted while the trigger stood in for the keys are gone already
+    op.create_foreign_key(
+        'event_exceptions_event_id_fkey', 'event_exceptions', 'events',
+        ['event_id'], ['id'], ondelete='CASCADE'
+    )
+    op.create_foreign_key(
+        'reminder_deliveries_event_id_fkey', 'reminder_deliveries', 'events',
+        ['event_id'], ['id'], ondelete='CASCADE'
+    )
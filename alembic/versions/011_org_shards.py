@@ -0,0 +1,31 @@
+"""Add the org shard map and moved-org fence
+
+Revision ID: 011_org_shards
+Revises: 010_partition_events
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '011_org_shards'
+down_revision = '010_partition_events'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('orgs', sa.Column('moved_to', sa.String(), nullable=True))
+    
+    # Orgs without a row stay on the default shard
+    op.create_table('org_shards',
+        sa.Column('org_id', sa.Integer(), nullable=False),
+        sa.Column('shard', sa.String(), nullable=False),
+        sa.Column('moved_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['org_id'], ['orgs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('org_id')
+    )
+
+def downgrade() -> None:
+    op.drop_table('org_shards')
+    op.drop_column('orgs', 'moved_to')
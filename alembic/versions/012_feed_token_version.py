@@ -0,0 +1,22 @@
+"""Add revocable calendar feed tokens
+
+Revision ID: 012_feed_token_version
+Revises: 011_org_shards
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '012_feed_token_version'
+down_revision = '011_org_shards'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Feed tokens carry this version; bumping it revokes the member's feed URLs
+    op.add_column('memberships', sa.Column('feed_version', sa.Integer(), server_default='0', nullable=False))
+
+def downgrade() -> None:
+    op.drop_column('memberships', 'feed_version')
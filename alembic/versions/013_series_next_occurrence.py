@@ -0,0 +1,29 @@
+"""Remember the next occurrence of recurring events for reminders
+
+Revision ID: 013_series_next_occurrence
+Revises: 012_feed_token_version
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '013_series_next_occurrence'
+down_revision = '012_feed_token_version'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # NULL until the reminder scheduler first expands the series
+    op.add_column('events', sa.Column('next_occurrence_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_events_next_occurrence', 'events', ['next_occurrence_at'],
+        unique=False,
+        postgresql_where=sa.text('rrule IS NOT NULL'),
+        sqlite_where=sa.text('rrule IS NOT NULL')
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_events_next_occurrence', table_name='events')
+    op.drop_column('events', 'next_occurrence_at')
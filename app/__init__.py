@@ -1 +1,6 @@
-# App package
\ No newline at end of file
+# App package
+
+from dotenv import load_dotenv
+
+# Once, before any module reads its settings from the environment
+load_dotenv()
@@ -0,0 +1,340 @@
+"""Org data archive export and bulk restore
+
+An archive is a gzipped tar stream holding one JSON-lines file per chunk of
+each table (``clients/00000.jsonl`` ...) followed by ``manifest.json``.
+
+Users are the org's current members, without password hashes; accounts a
+restore creates get an unusable password. Rows authored by someone who is no
+longer a member are attributed to an owner of the restored org.
+
+Usage:
+    python -m app.archive export --org-id 3 --output org-3.tar.gz
+    python -m app.archive restore org-3.tar.gz [--database-url URL]
+"""
+
+import argparse
+import io
+import json
+import tarfile
+import time
+from datetime import date, datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+from sqlalchemy import DateTime, create_engine, func, select, text
+from app.auth import unusable_password_hash
+from app.database import Base
+from app import models  # Register all tables on Base.metadata
+
+ARCHIVE_FORMAT = 1
+MANIFEST_NAME = "manifest.json"
+CHUNK_ROWS = 10000
+
+# Tables in restore order, with the foreign keys that need remapping
+TABLES = [
+    ("users", {}),
+    ("orgs", {}),
+    ("memberships", {"user_id": "users", "org_id": "orgs"}),
+    ("clients", {"user_id": "users", "org_id": "orgs"}),
+    ("cases", {"user_id": "users", "org_id": "orgs", "client_id": "clients"}),
+    ("events", {"user_id": "users", "org_id": "orgs", "case_id": "cases"}),
+    ("event_exceptions", {"event_id": "events"}),
+]
+# Columns never exported; next_occurrence_at is reminder bookkeeping recomputed after a restore
+EXCLUDED_COLUMNS = {"users": {"password_hash"}, "events": {"next_occurrence_at"}}
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only sink that lets tarfile output be drained piece by piece"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _org_filter(name: str, org_id: int):
+    """Row filter selecting one org's data from a table"""
+    table = Base.metadata.tables[name]
+    if name == "orgs":
+        return table.c.id == org_id
+    if name == "users":
+        memberships = Base.metadata.tables["memberships"]
+        return table.c.id.in_(select(memberships.c.user_id).where(memberships.c.org_id == org_id))
+    if name == "event_exceptions":
+        events = Base.metadata.tables["events"]
+        return table.c.event_id.in_(select(events.c.id).where(events.c.org_id == org_id))
+    return table.c.org_id == org_id
+
+
+def _add_member(tar: tarfile.TarFile, name: str, payload: bytes):
+    info = tarfile.TarInfo(name)
+    info.size = len(payload)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(payload))
+
+
+def iter_export(bind, org_id: int, chunk_rows: int = CHUNK_ROWS) -> Iterator[bytes]:
+    """Stream an org's data as a compressed archive
+
+    Rows are read with a server-side cursor and written chunk by chunk, so
+    memory use is bounded by ``chunk_rows`` regardless of org size.
+    """
+    buffer = _StreamBuffer()
+    manifest = {
+        "format": ARCHIVE_FORMAT,
+        "org_id": org_id,
+        "exported_at": datetime.utcnow().isoformat(),
+        "source_dialect": bind.dialect.name,
+        "tables": {},
+    }
+
+    with bind.connect() as conn:
+        conn = conn.execution_options(yield_per=chunk_rows)
+        tar = tarfile.open(fileobj=buffer, mode="w|gz")
+
+        for name, _ in TABLES:
+            table = Base.metadata.tables[name]
+            columns = [c for c in table.columns if c.name not in EXCLUDED_COLUMNS.get(name, ())]
+            entry = {"columns": [c.name for c in columns], "rows": 0, "chunks": []}
+            result = conn.execute(
+                select(*columns).where(_org_filter(name, org_id)).order_by(table.c.id)
+            )
+            for part in result.partitions(chunk_rows):
+                member = f"{name}/{len(entry['chunks']):05d}.jsonl"
+                payload = "".join(
+                    json.dumps(list(row), default=_json_default) + "\n" for row in part
+                ).encode()
+                _add_member(tar, member, payload)
+                entry["chunks"].append(member)
+                entry["rows"] += len(part)
+                yield buffer.drain()
+            manifest["tables"][name] = entry
+
+        _add_member(tar, MANIFEST_NAME, json.dumps(manifest, indent=2).encode())
+        tar.close()
+
+    yield buffer.drain()
+
+
+def export_org(bind, org_id: int, fileobj: BinaryIO, chunk_rows: int = CHUNK_ROWS):
+    """Write an org archive to a file object"""
+    for data in iter_export(bind, org_id, chunk_rows):
+        fileobj.write(data)
+
+
+def _copy_field(value) -> str:
+    if value is None:
+        return r"\N"
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _bulk_insert(conn, table, columns: List[str], rows: List[dict]):
+    """Insert rows with COPY on Postgres and multi-row inserts elsewhere"""
+    if not rows:
+        return
+
+    if conn.dialect.name == "postgresql":
+        cursor = conn.connection.cursor()
+        if hasattr(cursor, "copy_expert"):
+            data = io.StringIO("".join(
+                ",".join(_copy_field(row[c]) for c in columns) + "\n" for row in rows
+            ))
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                data,
+            )
+            return
+
+    datetime_columns = [c for c in columns if isinstance(table.c[c].type, DateTime)]
+    values = []
+    for row in rows:
+        value = {c: row[c] for c in columns}
+        for column in datetime_columns:
+            if value[column] is not None:
+                value[column] = datetime.fromisoformat(value[column])
+        values.append(value)
+    conn.execute(table.insert(), values)
+
+
+def _lock_table(conn, table):
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(f"LOCK TABLE {table.name} IN SHARE ROW EXCLUSIVE MODE"))
+
+
+def _reset_sequence(conn, table):
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"
+        ))
+
+
+def _claim_existing_users(conn, table, rows: List[dict], id_map: Dict[int, int]) -> List[dict]:
+    """Map archived users onto existing accounts with the same email"""
+    emails = [row["email"] for row in rows]
+    existing = dict(conn.execute(
+        select(table.c.email, table.c.id).where(table.c.email.in_(emails))
+    ).all())
+
+    remaining = []
+    for row in rows:
+        if row["email"] in existing:
+            id_map[row["id"]] = existing[row["email"]]
+        else:
+            remaining.append(row)
+    return remaining
+
+
+def _case_number_collisions(conn, tar: tarfile.TarFile, entry: dict) -> List[str]:
+    """Archived case numbers already used by a live or archived case in the target"""
+    position = entry["columns"].index("case_number")
+    taken = []
+    for member in entry["chunks"]:
+        numbers = [json.loads(line)[position] for line in tar.extractfile(member)]
+        for name in ("cases", "cases_archive"):
+            table = Base.metadata.tables[name]
+            taken.extend(conn.execute(
+                select(table.c.case_number).where(table.c.case_number.in_(numbers))
+            ).scalars())
+    return sorted(taken)
+
+
+def restore_archive(bind, fileobj: BinaryIO, org_name: Optional[str] = None) -> dict:
+    """Load an org archive into the database as a new organization
+
+    All primary keys are reassigned from the target tables' current maximum
+    and foreign keys are remapped, so the archive can be restored into a
+    database that already holds other orgs. Users are matched by email, and
+    authors missing from the archive become an owner of the restored org.
+    Case numbers must not already exist in the target, as they are unique
+    across orgs. The whole restore runs in one transaction.
+    """
+    started = time.perf_counter()
+
+    with tarfile.open(fileobj=fileobj, mode="r:gz") as tar:
+        manifest = json.load(tar.extractfile(MANIFEST_NAME))
+        if manifest.get("format") != ARCHIVE_FORMAT:
+            raise ValueError(f"Unsupported archive format: {manifest.get('format')}")
+
+        id_maps: Dict[str, Dict[int, int]] = {name: {} for name, _ in TABLES}
+        counts = {}
+        # Restored user id standing in for authors who are not members
+        fallback_user = None
+
+        with bind.begin() as conn:
+            # Case numbers are unique across the whole database, not per org
+            for name in ("cases", "cases_archive"):
+                _lock_table(conn, Base.metadata.tables[name])
+            taken = _case_number_collisions(conn, tar, manifest["tables"]["cases"])
+            if taken:
+                raise ValueError(
+                    f"{len(taken)} archived case numbers already exist in the target database: "
+                    + ", ".join(taken)
+                )
+
+            for name, foreign_keys in TABLES:
+                table = Base.metadata.tables[name]
+                entry = manifest["tables"][name]
+                # Hashes in archives written before they were excluded are not restored either
+                columns = [c for c in entry["columns"] if c in table.c and c not in EXCLUDED_COLUMNS.get(name, ())]
+                if name == "users":
+                    columns.append("password_hash")
+
+                _lock_table(conn, table)
+                next_id = conn.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+                inserted = 0
+
+                for member in entry["chunks"]:
+                    rows = [
+                        dict(zip(entry["columns"], json.loads(line)))
+                        for line in tar.extractfile(member)
+                    ]
+                    if name == "users":
+                        rows = _claim_existing_users(conn, table, rows, id_maps["users"])
+                        for row in rows:
+                            row["password_hash"] = unusable_password_hash()
+
+                    for row in rows:
+                        next_id += 1
+                        id_maps[name][row["id"]] = next_id
+                        row["id"] = next_id
+                        for column, target in foreign_keys.items():
+                            if row.get(column) is not None:
+                                try:
+                                    row[column] = id_maps[target][row[column]]
+                                except KeyError:
+                                    if target == "users" and fallback_user is not None:
+                                        row[column] = fallback_user
+                                        continue
+                                    raise ValueError(
+                                        f"{name}.{column} references missing {target} row {row[column]}"
+                                    )
+                        if name == "orgs" and org_name:
+                            row["name"] = org_name
+                        # An owner if there is one, else the first member
+                        if name == "memberships" and (fallback_user is None or row["role"] == "owner"):
+                            fallback_user = row["user_id"]
+
+                    _bulk_insert(conn, table, columns, rows)
+                    inserted += len(rows)
+
+                _reset_sequence(conn, table)
+                counts[name] = inserted
+
+    return {
+        "org_id": id_maps["orgs"][manifest["org_id"]],
+        "rows": counts,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or restore an organization archive")
+    parser.add_argument("--database-url", help="Target database (defaults to DATABASE_URL)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="Write an org archive")
+    export_cmd.add_argument("--org-id", type=int, required=True)
+    export_cmd.add_argument("--output", required=True)
+    export_cmd.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+
+    restore_cmd = commands.add_parser("restore", help="Load an org archive as a new org")
+    restore_cmd.add_argument("archive")
+    restore_cmd.add_argument("--org-name")
+
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        bind = create_engine(args.database_url.replace("postgres://", "postgresql://", 1))
+    else:
+        from app.database import engine as bind
+
+    if args.command == "export":
+        started = time.perf_counter()
+        with open(args.output, "wb") as f:
+            export_org(bind, args.org_id, f, args.chunk_rows)
+        print(f"✅ Exported org {args.org_id} to {args.output} in {time.perf_counter() - started:.1f}s")
+    else:
+        with open(args.archive, "rb") as f:
+            summary = restore_archive(bind, f, org_name=args.org_name)
+        print(f"✅ Restored as org {summary['org_id']} in {summary['seconds']}s: {summary['rows']}")
+
+
+if __name__ == "__main__":
+    main()
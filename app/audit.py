@@ -0,0 +1,202 @@
+"""Write-behind audit log of model changes
+
+Changed fields are captured from SQLAlchemy session events, so route
+handlers need no audit code. Records of a flush are kept on the session
+until it commits (dropped on rollback), then handed to ``audit_writer``.
+While the API runs, the writer buffers them in a bounded queue and inserts
+them in batches from a background thread. Without a running writer (CLI,
+job workers, shutdown) or when the queue is full, records are written
+synchronously instead of being dropped.
+"""
+
+import asyncio
+import enum
+import logging
+import os
+import queue
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import models
+
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_SECONDS = 1.0
+AUDITED_TABLES = {"users", "orgs", "memberships", "clients", "cases", "events", "event_exceptions"}
+REDACTED_FIELDS = {"password_hash"}
+# Bookkeeping columns bumped on every write (see app/sync.py and app/reminders.py)
+UNAUDITED_FIELDS = {"sync_version", "sync_pruned_version", "next_occurrence_at"}
+
+logger = logging.getLogger(__name__)
+
+
+def set_actor(db: Session, user_id: int, org_id: Optional[int]):
+    """Attribute changes made through this session to a user"""
+    db.info["audit_actor"] = (user_id, org_id)
+
+
+def _json_value(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool, list, dict)):
+        return value
+    return str(value)
+
+
+def _changes(obj, action: str) -> Dict[str, list]:
+    """Changed columns as {field: [old, new]}"""
+    state = inspect(obj)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        key = attr.key
+        if key in UNAUDITED_FIELDS:
+            continue
+        if action == "update":
+            history = state.attrs[key].history
+            if not history.has_changes():
+                continue
+            old = history.deleted[0] if history.deleted else None
+            new = history.added[0] if history.added else None
+        else:
+            value = state.dict.get(key)
+            if value is None:
+                continue
+            old, new = (None, value) if action == "create" else (value, None)
+
+        if key in REDACTED_FIELDS:
+            old, new = old and "***", new and "***"
+        changes[key] = [_json_value(old), _json_value(new)]
+    return changes
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Make column history keep the replaced value even when the attribute was
+# expired (e.g. after a commit); loaded rows, the usual case, cost nothing extra
+for _mapper in models.Base.registry.mappers:
+    if _mapper.local_table.name in AUDITED_TABLES:
+        for _attr in _mapper.column_attrs:
+            if _attr.key in UNAUDITED_FIELDS:
+                continue
+            event.listen(_attr.class_attribute, "set", _keep_old_value, active_history=True, retval=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session: Session, flush_context):
+    user_id, actor_org_id = session.info.get("audit_actor", (None, None))
+    pending = session.info.setdefault("audit_pending", [])
+    now = datetime.utcnow()
+
+    for action, objects in (("create", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            table = getattr(obj, "__tablename__", None)
+            if table not in AUDITED_TABLES:
+                continue
+            changes = _changes(obj, action)
+            if not changes:
+                continue
+            org_id = obj.id if table == "orgs" else getattr(obj, "org_id", None)
+            pending.append({
+                "org_id": org_id or actor_org_id,
+                "user_id": user_id,
+                "entity": table,
+                "entity_id": obj.id,
+                "action": action,
+                "changes": changes,
+                "created_at": now,
+            })
+
+
+@event.listens_for(Session, "after_commit")
+def _submit(session: Session):
+    records = session.info.pop("audit_pending", None)
+    if records:
+        audit_writer.submit(session.get_bind(), records)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session):
+    session.info.pop("audit_pending", None)
+
+
+def write_records(bind, records: List[dict]):
+    with bind.begin() as conn:
+        conn.execute(models.AuditLog.__table__.insert(), records)
+
+
+class AuditWriter:
+    """Bounded queue of audit records flushed in batches by a background thread"""
+
+    def __init__(self, maxsize: int = AUDIT_QUEUE_SIZE, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_seconds: float = AUDIT_FLUSH_SECONDS):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.Queue" = queue.Queue(maxsize)
+        self._stop = threading.Event()
+        self._thread = None
+        self._running = False
+
+    def submit(self, bind, records: List[dict]):
+        if not self._running:
+            write_records(bind, records)
+            return
+        for i, record in enumerate(records):
+            try:
+                self._queue.put_nowait((bind, record))
+            except queue.Full:
+                # Back-pressure on the writer instead of losing records
+                write_records(bind, records[i:])
+                return
+
+    async def start(self):
+        self._stop.clear()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="audit-writer")
+        self._thread.start()
+
+    async def stop(self):
+        self._running = False
+        self._stop.set()
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+        # Anything submitted while stopping is written synchronously
+        self._flush(self._take(None))
+
+    def _take(self, limit: Optional[int]) -> list:
+        batch = []
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: list):
+        by_bind = defaultdict(list)
+        for bind, record in batch:
+            by_bind[bind].append(record)
+        for bind, records in by_bind.items():
+            try:
+                write_records(bind, records)
+            except Exception:
+                logger.exception("Failed to write %s audit records", len(records))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                continue
+            self._flush([first] + self._take(self.batch_size - 1))
+
+
+audit_writer = AuditWriter()
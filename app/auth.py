@@ -1,31 +1,45 @@
 """Authentication utilities"""
 
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 import os
-from dotenv import load_dotenv
+import secrets
+from app.tracing import traced
 
-load_dotenv()
+# passlib/bcrypt and jose (with cryptography) are imported on first use, which
+# keeps them out of the cold start; see benchmarks/import_time.py
 
 # Configuration
 SECRET_KEY = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 12
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def pwd_context():
+    """The bcrypt password context"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Prefix of password hashes no password matches, e.g. accounts restored from an archive
+UNUSABLE_PASSWORD_PREFIX = "!"
+
+def unusable_password_hash() -> str:
+    return UNUSABLE_PASSWORD_PREFIX + secrets.token_urlsafe(16)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    if hashed_password.startswith(UNUSABLE_PASSWORD_PREFIX):
+        return False
+    return pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT token"""
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -36,10 +50,26 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+@traced("jwt.decode")
 def decode_token(token: str):
     """Decode and validate a JWT token"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError:
         return None
+
+def create_feed_token(user_id: int, org_id: int, version: int = 0) -> str:
+    """Create a token that only grants read access to a calendar feed
+
+    Calendar apps keep subscription URLs for good, so the token does not
+    expire; it stops working when the user leaves the org or the
+    membership's feed_version moves past ``version``.
+    """
+    from jose import jwt
+    return jwt.encode(
+        {"user_id": user_id, "org_id": org_id, "scope": "calendar", "ver": version},
+        SECRET_KEY,
+        algorithm=ALGORITHM
+    )
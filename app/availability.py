@@ -0,0 +1,159 @@
+"""Free/busy lookup and available-slot search across org members
+
+Busy time for a set of users is read with one range query over the events
+interval index (plus their recurring series, expanded inside the window)
+and merged per user with a sweep line. Common free slots come from one
+more sweep over the users' merged lists. Busy lists are cached per
+(org, window) and dropped when one of their owner's events changes.
+"""
+
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy.orm import Session, selectinload
+from app import models
+from app.conflicts import DEFAULT_EVENT_DURATION, effective_end, overlapping_singles
+from app.recurrence import expand
+
+MAX_WINDOW = timedelta(days=31)
+MAX_USERS = 50
+AVAILABILITY_TTL_SECONDS = 300
+MAX_CACHED_WINDOWS = 1000
+
+Interval = Tuple[datetime, datetime]
+
+
+def _sweep(intervals: Iterable[Interval]) -> List[Interval]:
+    """Union of start-ordered intervals; touching intervals are joined"""
+    merged: List[Interval] = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    return _sweep(sorted(intervals))
+
+
+def union_busy(busy_lists: Iterable[List[Interval]]) -> List[Interval]:
+    """Merge already merged per-user busy lists into one"""
+    return _sweep(heapq.merge(*busy_lists))
+
+
+def free_slots(busy: List[Interval], start: datetime, end: datetime,
+               duration: timedelta) -> List[Interval]:
+    """Gaps of at least ``duration`` in [start, end) between merged busy intervals"""
+    slots = []
+    cursor = start
+    for busy_start, busy_end in busy:
+        if busy_start - cursor >= duration:
+            slots.append((cursor, busy_start))
+        cursor = max(cursor, busy_end)
+    if end - cursor >= duration:
+        slots.append((cursor, end))
+    return slots
+
+
+def load_busy(db: Session, org_id: int, user_ids: Sequence[int],
+              start: datetime, end: datetime) -> Dict[int, List[Interval]]:
+    """Merged busy intervals per user, clipped to [start, end)"""
+    query = db.query(models.Event).filter(models.Event.user_id.in_(user_ids))
+    intervals: Dict[int, List[Interval]] = {user_id: [] for user_id in user_ids}
+
+    singles = overlapping_singles(query, db, org_id, start, end).with_entities(
+        models.Event.user_id, models.Event.starts_at, models.Event.ends_at
+    )
+    for user_id, starts_at, ends_at in singles:
+        intervals[user_id].append((starts_at, effective_end(starts_at, ends_at)))
+
+    series = query.options(selectinload(models.Event.exceptions)).filter(
+        models.Event.org_id == org_id,
+        models.Event.rrule.isnot(None),
+        models.Event.starts_at < end,
+        models.Event.recurrence_until.is_(None) |
+        (models.Event.recurrence_until >= start - DEFAULT_EVENT_DURATION)
+    )
+    for event in series:
+        for occurrence in expand(event, start - DEFAULT_EVENT_DURATION, end):
+            intervals[event.user_id].append(
+                (occurrence.starts_at, effective_end(occurrence.starts_at, occurrence.ends_at))
+            )
+
+    # The index lookup returns a superset, so clip and drop non-overlapping rows here
+    return {
+        user_id: merge_intervals(
+            (max(s, start), min(e, end)) for s, e in user_intervals if s < end and e > start
+        )
+        for user_id, user_intervals in intervals.items()
+    }
+
+
+class _Window:
+    def __init__(self):
+        self.busy: Dict[int, List[Interval]] = {}
+        self.loaded_at = time.monotonic()
+
+
+class AvailabilityCache:
+    """Busy lists per (org, window), kept per user
+
+    Requests for different sets of users over the same window share an
+    entry and only load the users not cached yet. An event write drops its
+    owner's lists for that org. Entries expire after ``ttl`` seconds so
+    that writes handled by other workers are picked up eventually.
+    """
+
+    def __init__(self, ttl: float = AVAILABILITY_TTL_SECONDS, max_windows: int = MAX_CACHED_WINDOWS):
+        self.ttl = ttl
+        self.max_windows = max_windows
+        self._windows: "OrderedDict[Tuple[int, datetime, datetime], _Window]" = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, org_id: int, start: datetime, end: datetime, user_ids: Sequence[int],
+            load: Callable[[List[int]], Dict[int, List[Interval]]]) -> Dict[int, List[Interval]]:
+        """Busy lists for ``user_ids``, loading the missing ones"""
+        key = (org_id, start, end)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or time.monotonic() - window.loaded_at >= self.ttl:
+                window = self._windows[key] = _Window()
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_windows:
+                self._windows.popitem(last=False)
+            busy = {user_id: window.busy[user_id] for user_id in user_ids if user_id in window.busy}
+            generation = self._generations.get(org_id, 0)
+
+        missing = [user_id for user_id in user_ids if user_id not in busy]
+        if missing:
+            loaded = load(missing)
+            busy.update(loaded)
+            with self._lock:
+                # Skip storing if an event changed while loading
+                if self._generations.get(org_id, 0) == generation:
+                    window.busy.update(loaded)
+
+        return busy
+
+    def invalidate(self, event):
+        """Drop cached busy lists of an event's owner after a write"""
+        with self._lock:
+            self._generations[event.org_id] = self._generations.get(event.org_id, 0) + 1
+            for (org_id, _, _), window in self._windows.items():
+                if org_id == event.org_id:
+                    window.busy.pop(event.user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+
+
+availability_cache = AvailabilityCache()
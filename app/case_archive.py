@@ -0,0 +1,189 @@
+"""Archival of closed cases into cold tables
+
+Closed cases untouched for ``--months`` whose events all lie before that
+cutoff are moved, with their events and occurrence exceptions, into
+``cases_archive``, ``events_archive`` and ``event_exceptions_archive``.
+Each batch is copied with ``INSERT ... SELECT`` and deleted in one
+transaction, so the live tables and their indexes only hold working data.
+Delta sync clients see archived rows as deleted.
+
+Archived rows keep their ids. Reopening a case through the API moves it
+and its events back (``restore_case``).
+
+Usage:
+    python -m app.case_archive [--months 12] [--batch-size 100] [--dry-run]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import and_, delete, exists, func, insert, literal, or_, select
+from sqlalchemy.orm import Session
+from app import models
+from app.models import CaseStatusEnum
+from app.sync import next_version
+
+ARCHIVE_AFTER_MONTHS = 12
+BATCH_SIZE = 100
+
+
+def _copy(conn, source, target, where, **overrides):
+    """INSERT INTO target SELECT the shared columns FROM source"""
+    columns = [c.name for c in target.columns if c.name in source.c]
+    extra = {name: value for name, value in overrides.items() if name in target.c}
+    names = [name for name in columns if name not in extra] + list(extra)
+    selected = [source.c[name] for name in columns if name not in extra]
+    selected += [literal(value, type_=target.c[name].type) for name, value in extra.items()]
+    conn.execute(insert(target).from_select(names, select(*selected).where(where)))
+
+
+def _tombstones(conn, org_cases: Dict[int, List[int]], events_by_case: Dict[int, List[int]]):
+    """Report moved rows as deleted to delta sync clients"""
+    now = datetime.utcnow()
+    rows = []
+    for org_id in sorted(org_cases):
+        version = next_version(conn, org_id)
+        for case_id in org_cases[org_id]:
+            rows.append({"org_id": org_id, "entity": "cases", "entity_id": case_id,
+                         "version": version, "deleted_at": now})
+            rows.extend({"org_id": org_id, "entity": "events", "entity_id": event_id,
+                         "version": version, "deleted_at": now}
+                        for event_id in events_by_case.get(case_id, []))
+    if rows:
+        conn.execute(insert(models.SyncTombstone.__table__), rows)
+
+
+def archivable_cases(conn, cutoff: datetime):
+    """Closed cases last updated before ``cutoff`` with no event after it"""
+    cases = models.Case.__table__
+    events = models.Event.__table__
+    recent_event = exists().where(
+        events.c.case_id == cases.c.id,
+        or_(
+            events.c.starts_at >= cutoff,
+            events.c.ends_at >= cutoff,
+            and_(events.c.rrule.isnot(None),
+                 or_(events.c.recurrence_until.is_(None), events.c.recurrence_until >= cutoff))
+        )
+    )
+    query = select(cases.c.id, cases.c.org_id).where(
+        cases.c.status == CaseStatusEnum.closed,
+        cases.c.updated_at < cutoff,
+        ~recent_event
+    )
+    if conn.dialect.name == "sqlite":
+        # SQLite reuses max(rowid) + 1, so keep the newest rows in place
+        # or a moved id could be taken before the case is restored
+        query = query.where(
+            cases.c.id < select(func.max(cases.c.id)).scalar_subquery(),
+            ~exists().where(events.c.case_id == cases.c.id,
+                            events.c.id >= select(func.max(events.c.id)).scalar_subquery())
+        )
+    return query
+
+
+def archive_batch(conn, cutoff: datetime, limit: int = BATCH_SIZE) -> int:
+    """Move one batch of archivable cases; returns the number of cases moved"""
+    cases = models.Case.__table__
+    events = models.Event.__table__
+    exceptions = models.EventException.__table__
+
+    batch = archivable_cases(conn, cutoff).order_by(cases.c.id).limit(limit)
+    if conn.dialect.name == "postgresql":
+        # Cases being edited right now are left for the next run
+        batch = batch.with_for_update(skip_locked=True)
+
+    org_cases: Dict[int, List[int]] = {}
+    for case_id, org_id in conn.execute(batch):
+        org_cases.setdefault(org_id, []).append(case_id)
+    case_ids = [case_id for ids in org_cases.values() for case_id in ids]
+    if not case_ids:
+        return 0
+
+    events_by_case: Dict[int, List[int]] = {}
+    for event_id, case_id in conn.execute(select(events.c.id, events.c.case_id).where(events.c.case_id.in_(case_ids))):
+        events_by_case.setdefault(case_id, []).append(event_id)
+    event_ids = [event_id for ids in events_by_case.values() for event_id in ids]
+
+    now = datetime.utcnow()
+    _copy(conn, cases, models.ArchivedCase.__table__, cases.c.id.in_(case_ids), archived_at=now)
+    if event_ids:
+        _copy(conn, events, models.ArchivedEvent.__table__, events.c.id.in_(event_ids), archived_at=now)
+        _copy(conn, exceptions, models.ArchivedEventException.__table__, exceptions.c.event_id.in_(event_ids))
+        conn.execute(delete(exceptions).where(exceptions.c.event_id.in_(event_ids)))
+        conn.execute(delete(models.ReminderDelivery.__table__).where(
+            models.ReminderDelivery.__table__.c.event_id.in_(event_ids)
+        ))
+        conn.execute(delete(events).where(events.c.id.in_(event_ids)))
+    conn.execute(delete(cases).where(cases.c.id.in_(case_ids)))
+
+    _tombstones(conn, org_cases, events_by_case)
+    return len(case_ids)
+
+
+def archive_closed_cases(bind, months: int = ARCHIVE_AFTER_MONTHS, batch_size: int = BATCH_SIZE) -> int:
+    """Archive all eligible cases, one transaction per batch"""
+    cutoff = datetime.utcnow() - timedelta(days=30 * months)
+    total = 0
+    while True:
+        with bind.begin() as conn:
+            moved = archive_batch(conn, cutoff, batch_size)
+        total += moved
+        if moved < batch_size:
+            return total
+
+
+def restore_case(db: Session, archived: models.ArchivedCase):
+    """Move an archived case and its events back into the live tables
+
+    Runs in the session's transaction; the caller commits.
+    """
+    conn = db.connection()
+    archived_events = models.ArchivedEvent.__table__
+    archived_exceptions = models.ArchivedEventException.__table__
+    case_id, org_id = archived.id, archived.org_id
+    db.expunge(archived)
+
+    event_ids = select(archived_events.c.id).where(archived_events.c.case_id == case_id)
+    # Restored rows get a new version so delta sync clients fetch them again
+    version = next_version(conn, org_id)
+    _copy(conn, models.ArchivedCase.__table__, models.Case.__table__,
+          models.ArchivedCase.__table__.c.id == case_id, sync_version=version)
+    _copy(conn, archived_events, models.Event.__table__,
+          archived_events.c.case_id == case_id, sync_version=version)
+    _copy(conn, archived_exceptions, models.EventException.__table__,
+          archived_exceptions.c.event_id.in_(event_ids))
+
+    conn.execute(delete(archived_exceptions).where(archived_exceptions.c.event_id.in_(event_ids)))
+    conn.execute(delete(archived_events).where(archived_events.c.case_id == case_id))
+    conn.execute(delete(models.ArchivedCase.__table__).where(models.ArchivedCase.__table__.c.id == case_id))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move old closed cases into the archive tables")
+    parser.add_argument("--months", type=int, default=ARCHIVE_AFTER_MONTHS,
+                        help="Archive cases closed and untouched for this long")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the cases that would move")
+    args = parser.parse_args(argv)
+
+    from app.database import engine
+
+    if args.dry_run:
+        cutoff = datetime.utcnow() - timedelta(days=30 * args.months)
+        with engine.connect() as conn:
+            count = conn.execute(
+                select(func.count()).select_from(archivable_cases(conn, cutoff).subquery())
+            ).scalar()
+        print(f"{count} cases would be archived")
+        return
+
+    started = time.perf_counter()
+    moved = archive_closed_cases(engine, args.months, args.batch_size)
+    print(f"✅ Archived {moved} cases in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
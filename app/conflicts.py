@@ -0,0 +1,163 @@
+"""Scheduling-conflict detection for events
+
+Two events conflict when their half-open intervals [starts_at, ends_at)
+overlap and they share a user or a location within an org. Candidates come
+from an interval index so the check does not scan a lawyer's whole
+calendar: a GiST index over ``tsrange`` on Postgres and an R*Tree on
+SQLite (both created with the events table, see ``EVENT_INTERVAL_DDL``).
+Candidates are then checked exactly in Python.
+"""
+
+import calendar
+import os
+import weakref
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Column, Integer, MetaData, Table, func, inspect, literal_column, or_, select
+from sqlalchemy.orm import Session, selectinload
+from app import models
+from app.recurrence import expand
+
+# Must match the one hour used by EVENT_INTERVAL_DDL
+DEFAULT_EVENT_DURATION = timedelta(hours=1)
+# How far ahead a new recurring event is checked
+CONFLICT_HORIZON = timedelta(days=90)
+CONFLICT_MODES = ("warn", "reject")
+DEFAULT_CONFLICT_MODE = os.getenv("EVENT_CONFLICT_MODE", "warn")
+
+events_rtree = Table(
+    "events_rtree", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("starts_min", Integer),
+    Column("ends_max", Integer),
+)
+
+_rtree_available = weakref.WeakKeyDictionary()
+
+Interval = Tuple[datetime, datetime]
+
+
+@dataclass
+class Conflict:
+    event: object
+    reason: str  # "user" or "location"
+
+    @property
+    def recurrence_id(self) -> Optional[datetime]:
+        return getattr(self.event, "recurrence_id", None)
+
+
+def effective_end(starts_at: datetime, ends_at: Optional[datetime]) -> datetime:
+    return ends_at if ends_at and ends_at > starts_at else starts_at + DEFAULT_EVENT_DURATION
+
+
+def event_intervals(event) -> List[Interval]:
+    """Intervals an event occupies; the next CONFLICT_HORIZON for a series"""
+    if not event.rrule:
+        return [(event.starts_at, effective_end(event.starts_at, event.ends_at))]
+    return [
+        (o.starts_at, effective_end(o.starts_at, o.ends_at))
+        for o in expand(event, event.starts_at, event.starts_at + CONFLICT_HORIZON)
+    ]
+
+
+def _minutes(value: datetime, round_up: bool = False) -> int:
+    seconds = calendar.timegm(value.timetuple())
+    return -(-seconds // 60) if round_up else seconds // 60
+
+
+def _has_rtree(db: Session) -> bool:
+    engine = db.get_bind().engine
+    if engine not in _rtree_available:
+        _rtree_available[engine] = inspect(engine).has_table("events_rtree")
+    return _rtree_available[engine]
+
+
+def overlapping_singles(query, db: Session, org_id: int, lo: datetime, hi: datetime):
+    """Narrow a query to single events that may overlap [lo, hi) using the interval index"""
+    query = query.filter(models.Event.rrule.is_(None))
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        # Same expression as the GiST indexes so the planner can use them
+        during = func.tsrange(
+            models.Event.starts_at,
+            func.coalesce(models.Event.ends_at, models.Event.starts_at + literal_column("interval '1 hour'")),
+            literal_column("'[)'")
+        )
+        return query.filter(
+            models.Event.org_id == org_id,
+            during.op("&&")(func.tsrange(lo, hi, literal_column("'[)'")))
+        )
+
+    if dialect == "sqlite" and _has_rtree(db):
+        # "+ 0" keeps SQLite from preferring the org indexes over the R*Tree
+        return query.filter(
+            models.Event.org_id + 0 == org_id,
+            models.Event.id.in_(
+                select(events_rtree.c.id).where(
+                    events_rtree.c.starts_min < _minutes(hi, round_up=True),
+                    events_rtree.c.ends_max > _minutes(lo)
+                )
+            )
+        )
+
+    return query.filter(
+        models.Event.org_id == org_id,
+        models.Event.starts_at < hi,
+        or_(models.Event.ends_at > lo, models.Event.starts_at > lo - DEFAULT_EVENT_DURATION)
+    )
+
+
+def _overlaps_any(intervals: List[Interval], starts: List[datetime], longest: timedelta,
+                  start: datetime, end: datetime) -> bool:
+    """Whether [start, end) overlaps any of the start-sorted intervals"""
+    i = bisect_left(starts, end) - 1
+    while i >= 0 and intervals[i][0] > start - longest:
+        if intervals[i][1] > start:
+            return True
+        i -= 1
+    return False
+
+
+def find_conflicts(db: Session, event, exclude_id: Optional[int] = None) -> List[Conflict]:
+    """Events of the same user or at the same location overlapping ``event``"""
+    intervals = sorted(event_intervals(event))
+    if not intervals:
+        return []
+
+    lo = intervals[0][0]
+    hi = max(end for _, end in intervals)
+    starts = [start for start, _ in intervals]
+    longest = max(end - start for start, end in intervals)
+
+    same_owner = models.Event.user_id == event.user_id
+    if event.location:
+        same_owner = same_owner | (models.Event.location == event.location)
+
+    query = db.query(models.Event).filter(same_owner)
+    if exclude_id is not None:
+        query = query.filter(models.Event.id != exclude_id)
+
+    candidates = overlapping_singles(query, db, event.org_id, lo, hi).all()
+
+    # Recurring series are expanded only inside the envelope
+    series = query.options(selectinload(models.Event.exceptions)).filter(
+        models.Event.org_id == event.org_id,
+        models.Event.rrule.isnot(None),
+        models.Event.starts_at < hi,
+        models.Event.recurrence_until.is_(None) | (models.Event.recurrence_until >= lo - DEFAULT_EVENT_DURATION)
+    ).all()
+    for s in series:
+        candidates.extend(expand(s, lo - DEFAULT_EVENT_DURATION, hi))
+
+    conflicts = []
+    for candidate in sorted(candidates, key=lambda c: c.starts_at):
+        candidate_end = effective_end(candidate.starts_at, candidate.ends_at)
+        if _overlaps_any(intervals, starts, longest, candidate.starts_at, candidate_end):
+            reason = "user" if candidate.user_id == event.user_id else "location"
+            conflicts.append(Conflict(candidate, reason))
+    return conflicts
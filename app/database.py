@@ -1,12 +1,11 @@
 """Database configuration and session management"""
 
+from starlette.requests import Request
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from app import latency
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
 
@@ -14,14 +13,40 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_engine = None
+
+def get_engine():
+    """The default engine, created on first use rather than at import"""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(DATABASE_URL)
+        SessionLocal.configure(bind=_engine)
+        # Simulated network latency on all engines, for benchmarks (DB_LATENCY_MS)
+        latency.install_from_env()
+    return _engine
+
+def __getattr__(name):
+    # `from app.database import engine` creates it on first use
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
-def get_db():
-    """Dependency to get DB session"""
-    db = SessionLocal()
+def get_db(request: Request):
+    """Dependency to get DB session on the shard of the request's org (see app/shards.py)"""
+    from app.shards import shard_map
+    db = shard_map.session_for(request) if shard_map.sharded else SessionLocal(bind=get_engine())
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_directory_db():
+    """Dependency to get DB session on the directory of users, orgs and memberships"""
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
     finally:
@@ -6,14 +6,22 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.auth import decode_token
 from app import models
+from app.audit import set_actor
+from app.shards import OrgMoved
+from app.tracing import traced
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+@traced()
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ):
     """Get the current authenticated user"""
+    return user_from_token(token, db)
+
+def user_from_token(token: str, db: Session):
+    """Resolve an API access token to its user, with the token's org and role attached"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -28,6 +36,10 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
     
+    # Scoped tokens (e.g. calendar feeds) are not valid for the API
+    if payload.get("scope") is not None:
+        raise credentials_exception
+    
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if user is None:
         raise credentials_exception
@@ -35,9 +47,11 @@ async def get_current_user(
     # Add org_id and role to user object for convenience
     user.current_org_id = payload.get("org_id")
     user.current_role = payload.get("role")
+    set_actor(db, user.id, user.current_org_id)
     
     return user
 
+@traced()
 async def get_current_org(
     current_user = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -49,4 +63,18 @@ async def get_current_org(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Organization not found"
         )
+    if org.moved_to is not None:
+        # Stale copy on the org's old shard
+        raise OrgMoved(org.id, org.moved_to)
     return org
+
+async def get_current_admin(
+    current_user = Depends(get_current_user)
+):
+    """Require an owner or admin role in the current organization"""
+    if current_user.current_role not in (models.RoleEnum.owner.value, models.RoleEnum.admin.value):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
@@ -0,0 +1,168 @@
+"""Memory diagnostics for finding leaks in a running worker
+
+Wraps ``tracemalloc`` (start, stop, numbered snapshots and their diff by
+file and line) and reports what usually holds on to memory in this app:
+live SQLAlchemy sessions with the size of their identity maps, and the
+connection pools of every shard. All of it describes the worker process
+that answers the request; with several workers, repeat the calls until the
+same ``pid`` answers.
+"""
+
+import gc
+import os
+import resource
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import session as orm_session
+
+# Bearer token required by the /api/diagnostics routes, which are disabled when unset
+DIAGNOSTICS_TOKEN = os.getenv("DIAGNOSTICS_TOKEN")
+MAX_SNAPSHOTS = 10
+
+# Allocations made by tracemalloc itself and by the import machinery
+_NOISE = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class SnapshotNotFound(KeyError):
+    pass
+
+
+class Tracer:
+    """tracemalloc state and the snapshots taken in this process"""
+
+    def __init__(self, max_snapshots: int = MAX_SNAPSHOTS):
+        self.max_snapshots = max_snapshots
+        self.snapshots: Dict[int, tuple] = {}
+        self._next_id = 1
+
+    def status(self) -> dict:
+        traced, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_bytes": traced,
+            "peak_bytes": peak,
+            "overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+            "snapshots": [self._describe(i) for i in self.snapshots],
+        }
+
+    def start(self, frames: int = 1) -> dict:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        tracemalloc.start(frames)
+        return self.status()
+
+    def stop(self) -> dict:
+        """Stop tracing; snapshots taken so far are kept"""
+        tracemalloc.stop()
+        return self.status()
+
+    def take(self) -> dict:
+        """Snapshot current allocations, dropping the oldest beyond ``max_snapshots``"""
+        snapshot = tracemalloc.take_snapshot().filter_traces(_NOISE)
+        stats = snapshot.statistics("filename")
+        size, count = sum(stat.size for stat in stats), sum(stat.count for stat in stats)
+        snapshot_id = self._next_id
+        self._next_id += 1
+        self.snapshots[snapshot_id] = (datetime.utcnow(), snapshot, size, count)
+        while len(self.snapshots) > self.max_snapshots:
+            del self.snapshots[min(self.snapshots)]
+        return self._describe(snapshot_id)
+
+    def _get(self, snapshot_id: int):
+        if snapshot_id not in self.snapshots:
+            raise SnapshotNotFound(snapshot_id)
+        return self.snapshots[snapshot_id][1]
+
+    def _describe(self, snapshot_id: int) -> dict:
+        taken_at, _, size, count = self.snapshots[snapshot_id]
+        return {"id": snapshot_id, "taken_at": taken_at.isoformat(), "size": size, "count": count}
+
+    def diff(self, old_id: int, new_id: int, group_by: str = "lineno", limit: int = 25) -> List[dict]:
+        """Largest changes between two snapshots, grouped by file or line"""
+        new, old = self._get(new_id), self._get(old_id)
+        changes = []
+        for stat in new.compare_to(old, group_by)[:limit]:
+            frame = stat.traceback[0]
+            changes.append({
+                "file": frame.filename,
+                "line": frame.lineno if group_by != "filename" else None,
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff,
+                "size": stat.size,
+                "count": stat.count,
+                "traceback": [f"{f.filename}:{f.lineno}" for f in stat.traceback] if group_by == "traceback" else None,
+            })
+        return changes
+
+
+tracer = Tracer()
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def session_report(limit: int = 20) -> dict:
+    """Live sessions and the mapped objects their identity maps hold"""
+    sessions = list(orm_session._sessions.values())
+    by_class: Dict[str, int] = {}
+    largest = []
+    for session in sessions:
+        for obj in session.identity_map.values():
+            name = type(obj).__name__
+            by_class[name] = by_class.get(name, 0) + 1
+        largest.append({
+            "identity_map": len(session.identity_map),
+            "new": len(session.new),
+            "dirty": len(session.dirty),
+            "in_transaction": session.in_transaction(),
+            "bind": str(session.bind.url) if session.bind is not None else None,
+        })
+    largest.sort(key=lambda s: s["identity_map"], reverse=True)
+    return {
+        "open": len(sessions),
+        "in_transaction": sum(1 for s in largest if s["in_transaction"]),
+        "identity_map_total": sum(by_class.values()),
+        "identity_map_by_class": dict(sorted(by_class.items(), key=lambda item: -item[1])),
+        "largest": largest[:limit],
+    }
+
+
+def pool_report() -> Dict[str, dict]:
+    """Connection pool state of every shard's engine"""
+    from app.shards import shard_map
+
+    pools = {}
+    for name, engine in shard_map.engines().items():
+        pool = engine.pool
+        state = {"class": type(pool).__name__, "status": pool.status()}
+        for attribute in ("size", "checkedin", "checkedout", "overflow"):
+            if hasattr(pool, attribute):
+                state[attribute] = getattr(pool, attribute)()
+        pools[name] = state
+    return pools
+
+
+def memory_report() -> dict:
+    return {
+        "pid": os.getpid(),
+        "rss_bytes": _rss_bytes(),
+        # Kilobytes on Linux
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "gc": {"counts": gc.get_count(), "objects": len(gc.get_objects())},
+        "tracemalloc": tracer.status(),
+        "sessions": session_report(),
+        "pools": pool_report(),
+    }
@@ -0,0 +1,132 @@
+"""Liveness and readiness probes
+
+``/health/live`` only says the process is serving requests. ``/health/ready``
+checks what a request needs, for every database shard: a connection from
+the app's own pool answering ``SELECT 1``, a pool that is not saturated, and
+a schema at the revision app/migrate.py migrates to. Each check reports its
+latency. The result is cached for HEALTH_CACHE_SECONDS, and concurrent probes
+wait for one run, so frequent load balancer checks cost the database at most
+one round of queries per interval.
+
+A saturated pool fails readiness without asking it for a connection, since
+that would wait up to the pool timeout.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "5"))
+# Share of the pool's connections (with overflow) in use above which the app is not ready
+POOL_SATURATION_LIMIT = float(os.getenv("POOL_SATURATION_LIMIT", "0.9"))
+
+
+def _timed(check: Callable[[], dict]) -> dict:
+    started = time.perf_counter()
+    try:
+        result = check()
+    except Exception as e:
+        result = {"status": "fail", "error": f"{type(e).__name__}: {e}"}
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def check_pool(engine, limit: float = POOL_SATURATION_LIMIT) -> dict:
+    pool = engine.pool
+    result = {"status": "ok", "class": type(pool).__name__}
+    if not hasattr(pool, "checkedout"):
+        # Null, static and per-thread pools never make a request wait
+        return result
+    in_use = pool.checkedout()
+    result["checked_out"] = in_use
+    max_overflow = getattr(pool, "_max_overflow", -1)
+    if max_overflow >= 0:
+        capacity = pool.size() + max_overflow
+        result["capacity"] = capacity
+        result["saturation"] = round(in_use / capacity, 3)
+        if in_use >= capacity * limit:
+            result["status"] = "fail"
+    return result
+
+
+def check_database(engine) -> dict:
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return {"status": "ok"}
+
+
+@lru_cache(maxsize=None)
+def _target_revisions() -> Tuple[str, ...]:
+    from app.migrate import alembic_config, target_revisions
+    return target_revisions(alembic_config())
+
+
+def check_migrations(engine) -> dict:
+    from app.migrate import current_revisions
+
+    with engine.connect() as conn:
+        current = current_revisions(conn)
+    expected = _target_revisions()
+    return {
+        "status": "ok" if set(expected) <= set(current) else "fail",
+        "current": list(current),
+        "expected": list(expected),
+    }
+
+
+def _default_engines() -> Dict[str, object]:
+    from app.shards import shard_map
+    return shard_map.engines()
+
+
+class ReadinessProbe:
+    """Runs the readiness checks at most once per ttl seconds"""
+
+    def __init__(self, engines: Callable[[], Dict[str, object]] = _default_engines, ttl: float = HEALTH_CACHE_SECONDS):
+        self.engines = engines
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._result: Optional[dict] = None
+        self._expires = 0.0
+
+    def run_checks(self) -> dict:
+        checks = {}
+        engines = _timed(lambda: {"status": "ok", "engines": self.engines()})
+        if engines["status"] == "fail":
+            # No database configured, e.g. in minimal mode
+            checks["database"] = engines
+        for shard, engine in engines.get("engines", {}).items():
+            suffix = "" if shard == "default" else f":{shard}"
+            pool = checks[f"pool{suffix}"] = _timed(lambda: check_pool(engine))
+            if pool["status"] == "fail":
+                checks[f"database{suffix}"] = {"status": "skipped", "reason": "pool saturated", "latency_ms": 0.0}
+                continue
+            database = checks[f"database{suffix}"] = _timed(lambda: check_database(engine))
+            if database["status"] == "ok":
+                checks[f"migrations{suffix}"] = _timed(lambda: check_migrations(engine))
+        ready = all(check["status"] == "ok" for check in checks.values())
+        return {
+            "status": "ready" if ready else "not_ready",
+            "checks": checks,
+            "checked_at": datetime.utcnow().isoformat(),
+        }
+
+    def result(self) -> dict:
+        """The cached result, checking again once it is older than ttl (blocks; call from a thread)"""
+        with self._lock:
+            if self._result is None or time.monotonic() >= self._expires:
+                self._result = self.run_checks()
+                self._expires = time.monotonic() + self.ttl
+            return self._result
+
+    def invalidate(self):
+        with self._lock:
+            self._result = None
+
+
+readiness = ReadinessProbe()
@@ -0,0 +1,181 @@
+"""iCalendar feed rendering and per-user feed cache"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+PRODID = "-//AvukatAjanda//Calendar Feed//TR"
+FEED_TTL_SECONDS = 900
+FEED_HISTORY_DAYS = 180
+MAX_CACHED_FEEDS = 1000
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+def _fold(line: str) -> str:
+    """Fold a content line at 75 octets as required by RFC 5545"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+
+    parts = []
+    current = b""
+    for char in line:
+        char_bytes = char.encode("utf-8")
+        limit = 75 if not parts else 74
+        if len(current) + len(char_bytes) > limit:
+            parts.append(current.decode("utf-8"))
+            current = b""
+        current += char_bytes
+    parts.append(current.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+def _format_time(value: datetime) -> str:
+    # Timestamps are stored as naive UTC
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+def _vevent(event, title, starts_at, ends_at, location, extra=()) -> str:
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:event-{event.id}@avukatajanda.com",
+        f"DTSTAMP:{_format_time(event.created_at or event.starts_at)}",
+        f"DTSTART:{_format_time(starts_at)}",
+    ]
+    if ends_at:
+        lines.append(f"DTEND:{_format_time(ends_at)}")
+    lines.append(f"SUMMARY:{_escape(title)}")
+    if location:
+        lines.append(f"LOCATION:{_escape(location)}")
+    if event.type:
+        lines.append(f"CATEGORIES:{_escape(event.type)}")
+    lines.extend(extra)
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+def render_event(event) -> str:
+    """Render an event, plus overrides of edited occurrences for a series"""
+    rrule = getattr(event, "rrule", None)
+    if not rrule:
+        return _vevent(event, event.title, event.starts_at, event.ends_at, event.location)
+
+    exceptions = event.exceptions
+    extra = [f"RRULE:{rrule}"] + [
+        f"EXDATE:{_format_time(e.original_start)}" for e in exceptions if e.cancelled
+    ]
+    blocks = [_vevent(event, event.title, event.starts_at, event.ends_at, event.location, extra)]
+
+    duration = event.ends_at - event.starts_at if event.ends_at else None
+    for e in exceptions:
+        if e.cancelled:
+            continue
+        starts_at = e.starts_at or e.original_start
+        ends_at = e.ends_at or (starts_at + duration if duration is not None else None)
+        blocks.append(_vevent(
+            event, e.title or event.title, starts_at, ends_at, e.location or event.location,
+            [f"RECURRENCE-ID:{_format_time(e.original_start)}"]
+        ))
+    return "".join(blocks)
+
+def render_calendar(vevents: Iterable[str], name: str = "AvukatAjanda") -> bytes:
+    """Wrap rendered VEVENT blocks into a VCALENDAR document"""
+    header = (
+        "BEGIN:VCALENDAR\r\n"
+        "VERSION:2.0\r\n"
+        f"PRODID:{PRODID}\r\n"
+        "CALSCALE:GREGORIAN\r\n"
+        f"{_fold('X-WR-CALNAME:' + _escape(name))}\r\n"
+    )
+    return (header + "".join(vevents) + "END:VCALENDAR\r\n").encode("utf-8")
+
+def feed_window_start() -> datetime:
+    """Oldest event start included in subscription feeds"""
+    return datetime.utcnow() - timedelta(days=FEED_HISTORY_DAYS)
+
+def in_feed_window(event) -> bool:
+    """Whether an event (or any part of its series) belongs in a feed"""
+    window_start = feed_window_start()
+    if getattr(event, "rrule", None):
+        return event.recurrence_until is None or event.recurrence_until >= window_start
+    return event.starts_at >= window_start
+
+
+class _Feed:
+    def __init__(self, vevents: Dict[int, str]):
+        self.vevents = vevents
+        self.body: Optional[bytes] = None
+        self.etag: Optional[str] = None
+        self.loaded_at = time.monotonic()
+
+    def build(self) -> Tuple[bytes, str]:
+        if self.body is None:
+            self.body = render_calendar(self.vevents[event_id] for event_id in sorted(self.vevents))
+            self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+        return self.body, self.etag
+
+
+class FeedCache:
+    """Per-user rendered feeds, patched in place as events change
+
+    A feed is loaded from the database once, then individual VEVENT blocks
+    are replaced or dropped on event writes, so a poll only re-joins cached
+    strings. Feeds expire after ``ttl`` seconds so that writes handled by
+    other workers are picked up eventually.
+    """
+
+    def __init__(self, ttl: float = FEED_TTL_SECONDS, max_feeds: int = MAX_CACHED_FEEDS):
+        self.ttl = ttl
+        self.max_feeds = max_feeds
+        self._feeds: "OrderedDict[Tuple[int, int], _Feed]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, org_id: int, load: Callable[[], Iterable]) -> Tuple[bytes, str]:
+        """Return (body, etag) for a user's feed, loading events on a miss"""
+        key = (user_id, org_id)
+        with self._lock:
+            feed = self._feeds.get(key)
+            if feed and time.monotonic() - feed.loaded_at < self.ttl:
+                self._feeds.move_to_end(key)
+                return feed.build()
+
+        feed = _Feed({event.id: render_event(event) for event in load()})
+        with self._lock:
+            self._feeds[key] = feed
+            self._feeds.move_to_end(key)
+            while len(self._feeds) > self.max_feeds:
+                self._feeds.popitem(last=False)
+            return feed.build()
+
+    def upsert_event(self, event):
+        """Apply a created or updated event to its owner's cached feed"""
+        with self._lock:
+            feed = self._feeds.get((event.user_id, event.org_id))
+            if feed is None:
+                return
+            if in_feed_window(event):
+                feed.vevents[event.id] = render_event(event)
+            else:
+                feed.vevents.pop(event.id, None)
+            feed.body = None
+
+    def remove_event(self, event):
+        """Drop a deleted event from its owner's cached feed"""
+        with self._lock:
+            feed = self._feeds.get((event.user_id, event.org_id))
+            if feed is not None and feed.vevents.pop(event.id, None) is not None:
+                feed.body = None
+
+    def clear(self):
+        with self._lock:
+            self._feeds.clear()
+
+
+feed_cache = FeedCache()
@@ -0,0 +1,317 @@
+"""Database-backed background job queue
+
+Jobs are rows in the ``jobs`` table; no broker is needed. Workers claim the
+highest-priority due job with ``SELECT ... FOR UPDATE SKIP LOCKED`` on
+Postgres. On SQLite, where writers are serialized anyway, the claim is a
+single conditional UPDATE. At most ``JOBS_PER_ORG`` jobs of one org run at
+a time. Failed jobs are retried with exponential backoff, and jobs of
+workers that stopped heartbeating are requeued.
+
+Usage:
+    python -m app.jobs worker [--processes 4] [--burst]
+
+The API also runs one in-process worker thread unless JOBS_IN_PROCESS=false.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+from app import audit, models, sync  # noqa: F401 - audit and sync register session listeners
+from app.models import JobStatusEnum
+
+JOBS_PER_ORG = int(os.getenv("JOBS_PER_ORG", "2"))
+JOBS_IN_PROCESS = os.getenv("JOBS_IN_PROCESS", "true").lower() in ("1", "true", "yes")
+JOBS_OUTPUT_DIR = os.getenv("JOBS_OUTPUT_DIR", "./job_output")
+POLL_SECONDS = 1.0
+CLAIM_BATCH = 10
+# A running job whose worker has not heartbeaten for this long is requeued
+LEASE_SECONDS = 300
+RETRY_BASE_SECONDS = 10
+RETRY_MAX_SECONDS = 3600
+# pg_try_advisory_xact_lock namespace serializing claims within an org
+ORG_LOCK_NAMESPACE = 7310151
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS: Dict[str, Callable[[models.Job, Session], Optional[dict]]] = {}
+
+
+def job_handler(kind: str):
+    """Register a function run for jobs of ``kind``; it returns the job result"""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(db: Session, kind: str, payload: Optional[dict] = None, org_id: Optional[int] = None,
+            user_id: Optional[int] = None, priority: int = 0, max_attempts: int = 5,
+            run_at: Optional[datetime] = None) -> models.Job:
+    """Add a job to the queue and commit it"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = models.Job(
+        kind=kind, payload=payload or {}, org_id=org_id, user_id=user_id,
+        priority=priority, max_attempts=max_attempts, run_at=run_at or datetime.utcnow()
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff with jitter after the given number of attempts"""
+    seconds = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return timedelta(seconds=seconds * random.uniform(1.0, 1.25))
+
+
+class Worker:
+    """Claims and runs jobs one at a time"""
+
+    def __init__(self, bind=None, name: Optional[str] = None, per_org: int = JOBS_PER_ORG,
+                 poll_seconds: float = POLL_SECONDS, lease_seconds: float = LEASE_SECONDS):
+        if bind is None:
+            from app.database import engine
+            bind = engine
+        self.bind = bind
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self.per_org = per_org
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self._session_factory = sessionmaker(bind=bind)
+        self._last_reap = 0.0
+
+    def _running_in_org(self, org_id):
+        job = models.Job.__table__
+        return select(func.count()).select_from(job).where(
+            job.c.org_id == org_id,
+            job.c.status == JobStatusEnum.running
+        ).scalar_subquery()
+
+    def claim(self) -> Optional[int]:
+        """Mark the next due job as running by this worker and return its id"""
+        job = models.Job.__table__
+        now = datetime.utcnow()
+        saturated = select(job.c.org_id).where(
+            job.c.status == JobStatusEnum.running,
+            job.c.org_id.isnot(None)
+        ).group_by(job.c.org_id).having(func.count() >= self.per_org)
+
+        candidates = select(job.c.id, job.c.org_id).where(
+            job.c.status == JobStatusEnum.queued,
+            job.c.run_at <= now,
+            or_(job.c.org_id.is_(None), job.c.org_id.notin_(saturated))
+        ).order_by(job.c.priority.desc(), job.c.run_at, job.c.id).limit(CLAIM_BATCH)
+
+        postgres = self.bind.dialect.name == "postgresql"
+        if postgres:
+            candidates = candidates.with_for_update(skip_locked=True)
+
+        with self.bind.begin() as conn:
+            for job_id, org_id in conn.execute(candidates).all():
+                claim = update(job).where(job.c.id == job_id, job.c.status == JobStatusEnum.queued)
+                if org_id is not None:
+                    # Count and claim atomically per org: Postgres serializes
+                    # claimers with an advisory lock, SQLite runs one writer at a time
+                    if postgres and not conn.execute(
+                        select(func.pg_try_advisory_xact_lock(ORG_LOCK_NAMESPACE, org_id))
+                    ).scalar():
+                        continue
+                    claim = claim.where(self._running_in_org(org_id) < self.per_org)
+
+                claimed = conn.execute(claim.values(
+                    status=JobStatusEnum.running,
+                    attempts=job.c.attempts + 1,
+                    locked_by=self.name,
+                    locked_at=now,
+                    started_at=now,
+                    error=None
+                ))
+                if claimed.rowcount:
+                    return job_id
+        return None
+
+    def reap(self) -> int:
+        """Requeue running jobs whose worker stopped heartbeating"""
+        job = models.Job.__table__
+        now = datetime.utcnow()
+        stale = update(job).where(
+            job.c.status == JobStatusEnum.running,
+            job.c.locked_at < now - timedelta(seconds=self.lease_seconds)
+        )
+        with self.bind.begin() as conn:
+            failed = conn.execute(stale.where(job.c.attempts >= job.c.max_attempts).values(
+                status=JobStatusEnum.failed, locked_by=None, finished_at=now,
+                error="Worker stopped responding"
+            )).rowcount
+            requeued = conn.execute(stale.values(
+                status=JobStatusEnum.queued, locked_by=None, run_at=now,
+                error="Worker stopped responding"
+            )).rowcount
+        return failed + requeued
+
+    def _finish(self, job_id: int, **values):
+        """Record the outcome unless the job was reaped and claimed by someone else"""
+        job = models.Job.__table__
+        with self.bind.begin() as conn:
+            conn.execute(update(job).where(
+                job.c.id == job_id,
+                job.c.locked_by == self.name
+            ).values(locked_by=None, **values))
+
+    def _heartbeat(self, job_id: int, done: threading.Event):
+        job = models.Job.__table__
+        while not done.wait(self.lease_seconds / 3):
+            with self.bind.begin() as conn:
+                conn.execute(update(job).where(
+                    job.c.id == job_id,
+                    job.c.locked_by == self.name
+                ).values(locked_at=datetime.utcnow()))
+
+    def execute(self, job_id: int):
+        """Run a claimed job and record success, a retry, or failure"""
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, done), daemon=True)
+        heartbeat.start()
+
+        try:
+            with self._session_factory() as db:
+                job = db.get(models.Job, job_id)
+                if job is None:
+                    return
+                handler = JOB_HANDLERS.get(job.kind)
+                attempts, max_attempts = job.attempts, job.max_attempts
+                try:
+                    if handler is None:
+                        raise LookupError(f"No handler registered for job kind {job.kind}")
+                    result = handler(job, db)
+                except Exception as e:
+                    db.rollback()
+                    logger.exception("Job %s (%s) failed on attempt %s", job_id, job.kind, attempts)
+                    error = f"{type(e).__name__}: {e}"
+                    if attempts < max_attempts and handler is not None:
+                        self._finish(job_id, status=JobStatusEnum.queued, error=error,
+                                     run_at=datetime.utcnow() + retry_delay(attempts))
+                    else:
+                        self._finish(job_id, status=JobStatusEnum.failed, error=error,
+                                     finished_at=datetime.utcnow())
+                    return
+
+            self._finish(job_id, status=JobStatusEnum.succeeded, result=result,
+                         finished_at=datetime.utcnow())
+        finally:
+            done.set()
+
+    def run_once(self) -> bool:
+        """Claim and run one job; False when none is due"""
+        if time.monotonic() - self._last_reap >= self.lease_seconds / 2:
+            self._last_reap = time.monotonic()
+            self.reap()
+
+        job_id = self.claim()
+        if job_id is None:
+            return False
+        self.execute(job_id)
+        return True
+
+    def run(self, stop: threading.Event, burst: bool = False):
+        """Work until ``stop`` is set, or until the queue is empty with ``burst``"""
+        while not stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception:
+                logger.exception("Job worker iteration failed")
+            if burst:
+                return
+            stop.wait(self.poll_seconds)
+
+
+class InProcessWorker:
+    """Worker thread started with the API (see JOBS_IN_PROCESS)"""
+
+    def __init__(self, bind=None, name: str = "job-worker"):
+        self.bind = bind
+        self.name = name
+        self._stop = threading.Event()
+        self._thread = None
+
+    async def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=Worker(self.bind).run, args=(self._stop,), daemon=True, name=self.name)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+
+job_worker = InProcessWorker()
+
+
+@job_handler("org_export")
+def export_org_job(job: models.Job, db: Session) -> dict:
+    """Write an org archive into JOBS_OUTPUT_DIR"""
+    from app.archive import export_org
+
+    os.makedirs(JOBS_OUTPUT_DIR, exist_ok=True)
+    filename = f"org-{job.org_id}-job-{job.id}.tar.gz"
+    path = os.path.join(JOBS_OUTPUT_DIR, filename)
+    with open(path + ".part", "wb") as f:
+        export_org(db.get_bind(), job.org_id, f)
+    os.replace(path + ".part", path)
+    return {"file": filename, "bytes": os.path.getsize(path)}
+
+
+def _work(burst: bool):
+    from app.database import engine
+    # Forked workers must not share the parent's pooled connections
+    engine.dispose(close=False)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    Worker().run(stop, burst=burst)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run background job workers")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker_cmd = commands.add_parser("worker", help="Claim and run queued jobs")
+    worker_cmd.add_argument("--processes", type=int, default=1)
+    worker_cmd.add_argument("--burst", action="store_true", help="Exit once no job is due")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.processes == 1:
+        _work(args.burst)
+        return
+
+    processes = [multiprocessing.Process(target=_work, args=(args.burst,)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
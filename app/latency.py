@@ -0,0 +1,102 @@
+"""Simulated database network latency
+
+Local SQLite answers in microseconds, so extra queries look free; against a
+remote Postgres every round trip costs milliseconds. With DB_LATENCY_MS set,
+every engine (including shard engines) sleeps that long, plus normally
+distributed DB_JITTER_MS, before each statement. With DB_LATENCY_PER=roundtrip
+commits, rollbacks and new connections pay too, the latter
+DB_CONNECT_ROUND_TRIPS times for the TCP, TLS and auth handshake. The pool's
+reset-on-return is free: the Connection has already ended its transaction,
+and psycopg2 sends nothing to roll back an idle connection.
+
+The delay blocks the calling thread like a real driver, so an ``async``
+endpoint querying synchronously also stalls the event loop. It runs inside
+the timing of app/queries.py, which makes it visible in ``Server-Timing``.
+Tests and benchmarks use ``inject_latency``; ``benchmarks/bench_load.py
+--db-latency`` passes the settings to the server it starts.
+"""
+
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+DB_LATENCY_MS = float(os.getenv("DB_LATENCY_MS", "0"))
+DB_JITTER_MS = float(os.getenv("DB_JITTER_MS", "0"))
+DB_LATENCY_PER = os.getenv("DB_LATENCY_PER", "statement")
+DB_CONNECT_ROUND_TRIPS = int(os.getenv("DB_CONNECT_ROUND_TRIPS", "3"))
+MODES = ("statement", "roundtrip")
+
+
+class LatencyInjector:
+    """Sleeps on an engine's (or all engines') database round trips"""
+
+    def __init__(self, latency_ms: float, jitter_ms: float = 0.0, per: str = "statement",
+                 connect_round_trips: int = DB_CONNECT_ROUND_TRIPS, seed: Optional[int] = None):
+        if per not in MODES:
+            raise ValueError(f"per must be one of {', '.join(MODES)}")
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.per = per
+        self.connect_round_trips = connect_round_trips
+        self.rng = random.Random(seed)
+        self.round_trips = 0
+        self.slept = 0.0
+        self._listeners = []
+
+    def delay(self, round_trips: int = 1):
+        for _ in range(round_trips):
+            seconds = max(0.0, self.rng.gauss(self.latency, self.jitter) if self.jitter else self.latency)
+            self.round_trips += 1
+            self.slept += seconds
+            time.sleep(seconds)
+
+    def _statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.delay()
+
+    def _transaction_end(self, conn):
+        self.delay()
+
+    def _connect(self, dbapi_connection, connection_record):
+        self.delay(self.connect_round_trips)
+
+    def install(self, target=Engine) -> "LatencyInjector":
+        """Listen on an engine, or on every engine by default"""
+        pool_target = target.pool if isinstance(target, Engine) else Pool
+        self._listeners = [(target, "before_cursor_execute", self._statement)]
+        if self.per == "roundtrip":
+            self._listeners += [
+                (target, "commit", self._transaction_end),
+                (target, "rollback", self._transaction_end),
+                (pool_target, "connect", self._connect),
+            ]
+        for listener in self._listeners:
+            event.listen(*listener)
+        return self
+
+    def uninstall(self):
+        for listener in self._listeners:
+            event.remove(*listener)
+        self._listeners = []
+
+
+@contextmanager
+def inject_latency(latency_ms: float, jitter_ms: float = 0.0, per: str = "statement", target=Engine,
+                   seed: Optional[int] = None) -> Iterator[LatencyInjector]:
+    """Simulate network latency within a block; yields the injector and its counters"""
+    injector = LatencyInjector(latency_ms, jitter_ms, per, seed=seed).install(target)
+    try:
+        yield injector
+    finally:
+        injector.uninstall()
+
+
+def install_from_env() -> Optional[LatencyInjector]:
+    if DB_LATENCY_MS <= 0 and DB_JITTER_MS <= 0:
+        return None
+    return LatencyInjector(DB_LATENCY_MS, DB_JITTER_MS, DB_LATENCY_PER).install()
@@ -1,12 +1,32 @@
 """Minimal FastAPI app for Render deployment"""
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from datetime import datetime
 import os
+import time
+from app import metrics
+from app.health import readiness
+from app.profiling import ProfilingMiddleware
+from app.queries import QueryStatsMiddleware
+from app.tracing import TracingMiddleware, instrument_fastapi
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background services registered by the full API
+    services = getattr(app.state, "background_services", [])
+    for service in services:
+        await service.start()
+    yield
+    for service in reversed(services):
+        await service.stop()
+
+STARTED = time.monotonic()
 
 # Create app
-app = FastAPI(title="AvukatAjanda API", version="2.0.0")
+app = FastAPI(title="AvukatAjanda API", version="2.0.0", lifespan=lifespan)
 
 # CORS
 origins = os.getenv("CORS_ORIGIN", "*").split(",")
@@ -17,6 +37,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(TracingMiddleware)
+# Outermost, so the time spent in other middleware is included
+app.add_middleware(metrics.MetricsMiddleware)
+# Spans for the dependencies, endpoint and serialization of traced requests
+instrument_fastapi()
 
 @app.get("/")
 def root():
@@ -31,23 +58,41 @@ def root():
 def ping():
     return {"ok": True, "timestamp": datetime.utcnow().isoformat()}
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(request: Request):
+    if metrics.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {metrics.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/health")
+@app.get("/api/health")
 def health_check():
     try:
-        # Basic health check
+        # Basic health check; the database state comes from the cached readiness probe
+        database = {check: result for check, result in readiness.result()["checks"].items()
+                    if check.startswith("database")}
         return {
             "status": "healthy",
-            "database": "not_connected",  # Will fix later
+            "database": "connected" if all(r["status"] == "ok" for r in database.values()) else "unavailable",
             "version": "2.0.0",
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
         raise HTTPException(status_code=503, detail={"error": str(e), "status": "unhealthy"})
 
+@app.get("/health/live")
+def liveness():
+    return {"status": "alive", "pid": os.getpid(), "uptime_s": round(time.monotonic() - STARTED, 3)}
+
+@app.get("/health/ready")
+def readiness_check():
+    result = readiness.result()
+    return JSONResponse(result, status_code=200 if result["status"] == "ready" else 503)
+
 # Try to import full app features
 try:
     from app.database import get_db
-    from app.routers import auth, clients, cases, events, stats
+    from app.routers import auth, clients, cases, events, stats, orgs, jobs, audit, stream, sync, diagnostics
     
     # Add routers
     app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
@@ -55,9 +100,42 @@ try:
     app.include_router(cases.router, prefix="/api/cases", tags=["Cases"])
     app.include_router(events.router, prefix="/api/events", tags=["Events"])
     app.include_router(stats.router, prefix="/api/stats", tags=["Statistics"])
+    app.include_router(orgs.router, prefix="/api/orgs", tags=["Organizations"])
+    app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"])
+    app.include_router(audit.router, prefix="/api/audit", tags=["Audit"])
+    app.include_router(stream.router, prefix="/api/stream", tags=["Stream"])
+    app.include_router(sync.router, prefix="/api/sync", tags=["Sync"])
+    app.include_router(diagnostics.router, prefix="/api/diagnostics", tags=["Diagnostics"], include_in_schema=False)
+    
+    from app.audit import audit_writer
+    from app.jobs import JOBS_IN_PROCESS, InProcessWorker, job_worker
+    from app.partitions import PartitionMaintainer, partition_maintainer
+    from app.reminders import REMINDERS_ENABLED, ReminderScheduler, reminder_scheduler, shard_schedulers
+    from app.shards import OrgMoved, org_moved_handler, shard_map
+    from app.stream import change_hub
+    
+    app.add_exception_handler(OrgMoved, org_moved_handler)
+    
+    # Started in order and stopped in reverse, so the audit writer drains last
+    app.state.background_services = [audit_writer, change_hub, partition_maintainer, metrics.metrics_flusher] + (
+        ([reminder_scheduler] if REMINDERS_ENABLED else []) +
+        ([job_worker] if JOBS_IN_PROCESS else [])
+    )
+    # Further database shards get their own partition maintainer, scheduler and worker
+    for name in shard_map.names[1:]:
+        shard_engine = shard_map.engine(name)
+        app.state.background_services.append(PartitionMaintainer(bind=shard_engine))
+        if REMINDERS_ENABLED:
+            shard_schedulers[shard_engine] = ReminderScheduler(bind=shard_engine)
+            app.state.background_services.append(shard_schedulers[shard_engine])
+        if JOBS_IN_PROCESS:
+            app.state.background_services.append(InProcessWorker(bind=shard_engine, name=f"job-worker-{name}"))
     
     print("✅ Full API loaded successfully")
 except ImportError as e:
+    # Only a missing third-party dependency means minimal mode; a broken app module should fail loudly
+    if (e.name or "").split(".")[0] == "app":
+        raise
     print(f"⚠️ Running in minimal mode: {e}")
     
     # Add mock endpoints for testing
@@ -0,0 +1,240 @@
+"""Request metrics in the Prometheus text format
+
+``MetricsMiddleware`` counts requests by status, tracks requests in flight
+and records latency histograms per route template
+(``/api/cases/{case_id}``), so ids in paths never create new series. A
+route's series are created on its first request with preallocated bucket
+counters; after that a request costs two clock reads, a bisect and a few
+integer increments. Streaming responses are timed until their last chunk.
+
+Each worker process counts on its own. With several workers, point
+METRICS_DIR at a directory they share and that is emptied on deploy: every
+worker writes its snapshot there each METRICS_FLUSH_SECONDS and
+``GET /metrics`` adds them up. Counters of exited workers are kept so totals
+never go down; in-flight gauges only include live workers.
+"""
+
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+# Bearer token required by GET /metrics when set
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "<unmatched>"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RouteStats:
+    __slots__ = ("buckets", "sum", "count", "statuses")
+
+    def __init__(self):
+        # One slot per bucket plus +Inf, not cumulative
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.statuses: Dict[int, int] = {}
+
+    def observe(self, seconds: float, status: int):
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+class Registry:
+    """Per-process metrics, updated from the event loop only"""
+
+    def __init__(self):
+        # route template -> method -> stats
+        self.routes: Dict[str, Dict[str, RouteStats]] = {}
+        self.in_progress: Dict[str, int] = {}
+
+    def stats(self, route: str, method: str) -> RouteStats:
+        by_method = self.routes.get(route)
+        if by_method is None:
+            by_method = self.routes[route] = {}
+        stats = by_method.get(method)
+        if stats is None:
+            stats = by_method[method] = RouteStats()
+        return stats
+
+    def snapshot(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "routes": [
+                [route, method, stats.buckets, stats.sum, stats.count,
+                 {str(code): n for code, n in stats.statuses.items()}]
+                for route, by_method in self.routes.items()
+                for method, stats in by_method.items()
+            ],
+            "in_progress": dict(self.in_progress),
+        }
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware feeding ``registry``"""
+
+    def __init__(self, app, registry: Registry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        in_progress = self.registry.in_progress
+        in_progress[method] = in_progress.get(method, 0) + 1
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress[method] -= 1
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            self.registry.stats(path, method).observe(time.perf_counter() - started, status)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _load_snapshots(directory: str, own: dict) -> List[dict]:
+    """Snapshots of all workers, with this one's taken live"""
+    snapshots = [own]
+    for name in os.listdir(directory):
+        if not name.endswith(".json") or name == f"{own['pid']}.json":
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            # Partly written or removed meanwhile
+            continue
+    return snapshots
+
+
+def render(registry: Registry = registry, directory: Optional[str] = METRICS_DIR) -> str:
+    """All workers' metrics in the Prometheus text exposition format"""
+    own = registry.snapshot()
+    snapshots = _load_snapshots(directory, own) if directory else [own]
+
+    merged: Dict[tuple, list] = {}
+    in_progress: Dict[str, int] = {}
+    for snapshot in snapshots:
+        for route, method, buckets, total, count, statuses in snapshot["routes"]:
+            entry = merged.get((route, method))
+            if entry is None:
+                entry = merged[(route, method)] = [[0] * len(buckets), 0.0, 0, {}]
+            entry[0] = [a + b for a, b in zip(entry[0], buckets)]
+            entry[1] += total
+            entry[2] += count
+            for code, n in statuses.items():
+                entry[3][code] = entry[3].get(code, 0) + n
+        if snapshot is own or _pid_alive(snapshot["pid"]):
+            for method, n in snapshot["in_progress"].items():
+                in_progress[method] = in_progress.get(method, 0) + n
+
+    lines = [
+        "# HELP http_requests_total Requests by route template, method and status",
+        "# TYPE http_requests_total counter",
+    ]
+    for (route, method), (_, _, _, statuses) in sorted(merged.items()):
+        labels = f'method="{method}",route="{_escape(route)}"'
+        for code, n in sorted(statuses.items()):
+            lines.append(f'http_requests_total{{{labels},status="{code}"}} {n}')
+
+    lines += [
+        "# HELP http_request_duration_seconds Request latency by route template and method",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (route, method), (buckets, total, count, _) in sorted(merged.items()):
+        labels = f'method="{method}",route="{_escape(route)}"'
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+            cumulative += n
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {total}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {count}")
+
+    lines += [
+        "# HELP http_requests_in_progress Requests being handled by live workers",
+        "# TYPE http_requests_in_progress gauge",
+    ]
+    for method, n in sorted(in_progress.items()):
+        lines.append(f'http_requests_in_progress{{method="{method}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+
+def write_snapshot(registry: Registry = registry, directory: Optional[str] = METRICS_DIR):
+    """Publish this worker's metrics for the others to aggregate"""
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(path + ".tmp", path)
+
+
+class MetricsFlusher:
+    """Writes this worker's snapshot to METRICS_DIR periodically"""
+
+    def __init__(self, registry: Registry = registry, directory: Optional[str] = METRICS_DIR,
+                 interval: float = METRICS_FLUSH_SECONDS):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._task = None
+
+    async def start(self):
+        if self.directory and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        write_snapshot(self.registry, self.directory)
+
+    async def _run(self):
+        while True:
+            write_snapshot(self.registry, self.directory)
+            await asyncio.sleep(self.interval)
+
+
+metrics_flusher = MetricsFlusher()
@@ -0,0 +1,138 @@
+"""Database migrations at boot
+
+The Dockerfile, start.sh and docker-compose.yml run this before uvicorn
+instead of ``alembic upgrade head``:
+
+    python -m app.migrate [--database-url ...] [--target 001_initial@head]
+
+It reads ``alembic_version`` with one query and, when the database is
+already at the target, exits without running Alembic's environment or
+importing the models. Otherwise migrators are serialized across instances
+and workers, by a Postgres advisory lock or a file lock next to a SQLite
+database, and the revision is read again once the lock is held, so only the
+first instance migrates and the others just wait for it. The time spent,
+including waiting for the lock, is reported either way.
+
+``001`` (add org support) is a superseded second root in alembic/versions,
+so the target is the head of the ``001_initial`` line rather than ``head``.
+"""
+
+import argparse
+import fcntl
+import logging
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Tuple
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.pool import NullPool
+
+ROOT = Path(__file__).parent.parent
+MIGRATION_TARGET = "001_initial@head"
+# pg_advisory_lock key held while migrating
+MIGRATION_LOCK_ID = 7310153
+
+
+def alembic_config() -> Config:
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "alembic"))
+    return config
+
+
+def target_revisions(config: Config, target: str = MIGRATION_TARGET) -> Tuple[str, ...]:
+    """Revision ids the target resolves to in the migration scripts"""
+    return tuple(sorted(r.revision for r in ScriptDirectory.from_config(config).get_revisions(target)))
+
+
+def current_revisions(conn: Connection) -> Tuple[str, ...]:
+    """Revisions in alembic_version; empty before the first migration"""
+    return tuple(sorted(MigrationContext.configure(conn).get_current_heads()))
+
+
+@contextmanager
+def migration_lock(conn: Connection) -> Iterator[None]:
+    """Held by one migrator at a time: an advisory lock on Postgres, a file lock beside a SQLite file"""
+    if conn.dialect.name == "postgresql":
+        # Session level, so it outlives the transactions of the migration
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_ID})
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.rollback()
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_ID})
+            conn.commit()
+    elif conn.dialect.name == "sqlite" and conn.engine.url.database not in (None, "", ":memory:"):
+        with open(f"{conn.engine.url.database}.migrate.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+    else:
+        yield
+
+
+def migrate(database_url: str, target: str = MIGRATION_TARGET) -> dict:
+    """Upgrade the database to target unless it is there already"""
+    started = time.perf_counter()
+    config = alembic_config()
+    wanted = target_revisions(config, target)
+    engine = create_engine(database_url, poolclass=NullPool)
+    try:
+        with engine.connect() as conn:
+            before = current_revisions(conn)
+            # An extra head from the superseded 001 root does not need migrating
+            if set(wanted) <= set(before):
+                return {"from": before, "to": before, "migrated": False, "lock_wait": 0.0,
+                        "seconds": time.perf_counter() - started}
+            conn.rollback()
+
+            waiting = time.perf_counter()
+            with migration_lock(conn):
+                lock_wait = time.perf_counter() - waiting
+                # Another instance may have migrated while this one waited
+                before = current_revisions(conn)
+                if not set(wanted) <= set(before):
+                    config.attributes["connection"] = conn
+                    # Leave the caller's logging alone
+                    config.attributes["configure_logger"] = False
+                    command.upgrade(config, target)
+                    conn.commit()
+                after = current_revisions(conn)
+                conn.commit()
+    finally:
+        engine.dispose()
+    return {"from": before, "to": after, "migrated": before != after, "lock_wait": lock_wait,
+            "seconds": time.perf_counter() - started}
+
+
+def _revisions(revisions: Tuple[str, ...]) -> str:
+    return ", ".join(revisions) or "an empty database"
+
+
+def main(argv=None):
+    from app.database import DATABASE_URL
+
+    parser = argparse.ArgumentParser(description="Migrate the database unless it is current")
+    parser.add_argument("--database-url", default=DATABASE_URL, help="default: DATABASE_URL (run once per shard)")
+    parser.add_argument("--target", default=MIGRATION_TARGET)
+    args = parser.parse_args(argv)
+
+    # Alembic's "Running upgrade" lines, as alembic.ini would print them
+    logging.basicConfig(format="%(levelname)-5.5s [%(name)s] %(message)s")
+    logging.getLogger("alembic").setLevel(logging.INFO)
+    result = migrate(args.database_url, args.target)
+    waited = f", {result['lock_wait']:.2f}s of it waiting for another migrator" if result["lock_wait"] >= 0.01 else ""
+    if result["migrated"]:
+        print(f"✅ Migrated {_revisions(result['from'])} to {_revisions(result['to'])} "
+              f"in {result['seconds']:.2f}s{waited}")
+    else:
+        print(f"✅ Schema at {_revisions(result['to'])}, nothing to migrate ({result['seconds']:.2f}s{waited})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 """SQLAlchemy models for the application"""
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, UniqueConstraint, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, ForeignKeyConstraint, DateTime, Enum, UniqueConstraint, Text, Index, Boolean, JSON, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -17,6 +17,12 @@ class CaseStatusEnum(str, enum.Enum):
     pending = "pending"
     closed = "closed"
 
+class JobStatusEnum(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
 class User(Base):
     __tablename__ = "users"
     
@@ -39,6 +45,11 @@ class Org(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Delta sync counter (see app/sync.py) and the newest version whose tombstones were pruned
+    sync_version = Column(Integer, default=0, nullable=False)
+    sync_pruned_version = Column(Integer, default=0, nullable=False)
+    # Set on a database shard's copy once the org moved away (see app/shards.py)
+    moved_to = Column(String, nullable=True)
     
     # Relationships
     memberships = relationship("Membership", back_populates="org", cascade="all, delete-orphan")
@@ -53,6 +64,8 @@ class Membership(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     org_id = Column(Integer, ForeignKey("orgs.id", ondelete="CASCADE"), nullable=False)
     role = Column(Enum(RoleEnum), default=RoleEnum.lawyer, nullable=False)
+    # Version in the member's calendar feed tokens; bumped to revoke them
+    feed_version = Column(Integer, default=0, server_default="0", nullable=False)
     
     # Relationships
     user = relationship("User", back_populates="memberships")
@@ -62,6 +75,14 @@ class Membership(Base):
         UniqueConstraint('user_id', 'org_id', name='_user_org_uc'),
     )
 
+class OrgShard(Base):
+    """Database shard of an org; orgs without a row live on the default one"""
+    __tablename__ = "org_shards"
+    
+    org_id = Column(Integer, ForeignKey("orgs.id", ondelete="CASCADE"), primary_key=True)
+    shard = Column(String, nullable=False)
+    moved_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
 class Client(Base):
     __tablename__ = "clients"
     
@@ -74,11 +95,16 @@ class Client(Base):
     address = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    sync_version = Column(Integer, default=0, nullable=False)
     
     # Relationships
     user = relationship("User", back_populates="clients")
     org = relationship("Org", back_populates="clients")
     cases = relationship("Case", back_populates="client")
+    
+    __table_args__ = (
+        Index('ix_clients_org_sync_version', 'org_id', 'sync_version'),
+    )
 
 class Case(Base):
     __tablename__ = "cases"
@@ -92,12 +118,17 @@ class Case(Base):
     status = Column(Enum(CaseStatusEnum), default=CaseStatusEnum.active, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    sync_version = Column(Integer, default=0, nullable=False)
     
     # Relationships
     user = relationship("User", back_populates="cases")
     org = relationship("Org", back_populates="cases")
     client = relationship("Client", back_populates="cases")
     events = relationship("Event", back_populates="case")
+    
+    __table_args__ = (
+        Index('ix_cases_org_sync_version', 'org_id', 'sync_version'),
+    )
 
 class Event(Base):
     __tablename__ = "events"
@@ -111,9 +142,272 @@ class Event(Base):
     starts_at = Column(DateTime, nullable=False)
     ends_at = Column(DateTime, nullable=True)
     location = Column(String, nullable=True)
+    rrule = Column(String, nullable=True)
+    recurrence_until = Column(DateTime, nullable=True)  # End of the last occurrence, NULL if unbounded
+    # Series only: no occurrence starts between the scheduler's last look and this; NULL after a change
+    next_occurrence_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    sync_version = Column(Integer, default=0, nullable=False)
     
     # Relationships
     user = relationship("User", back_populates="events")
     org = relationship("Org", back_populates="events")
     case = relationship("Case", back_populates="events")
+    exceptions = relationship("EventException", back_populates="event", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Calendar range queries filter on both ends of the interval
+        Index('ix_events_org_starts_at', 'org_id', 'starts_at'),
+        Index('ix_events_org_ends_at', 'org_id', 'ends_at'),
+        # Reminder scheduling looks across all orgs
+        Index('ix_events_starts_at', 'starts_at'),
+        Index('ix_events_org_sync_version', 'org_id', 'sync_version'),
+        # Case archival moves events by case
+        Index('ix_events_case_id', 'case_id'),
+        Index(
+            'ix_events_org_recurring', 'org_id', 'starts_at',
+            postgresql_where=rrule.isnot(None),
+            sqlite_where=rrule.isnot(None)
+        ),
+        # Reminder refreshes load only the series due soon
+        Index(
+            'ix_events_next_occurrence', 'next_occurrence_at',
+            postgresql_where=rrule.isnot(None),
+            sqlite_where=rrule.isnot(None)
+        ),
+    )
+
+# Interval indexes for scheduling-conflict lookups (see app/conflicts.py).
+# Events without ends_at are treated as one hour long.
+EVENT_INTERVAL_DDL = {
+    "sqlite": [
+        # Minute-granularity R*Tree, rounded outwards so lookups are a superset
+        "CREATE VIRTUAL TABLE IF NOT EXISTS events_rtree USING rtree_i32(id, starts_min, ends_max)",
+        """CREATE TRIGGER IF NOT EXISTS events_rtree_insert AFTER INSERT ON events BEGIN
+            INSERT INTO events_rtree (id, starts_min, ends_max) VALUES (
+                new.id,
+                CAST(strftime('%s', new.starts_at) AS INTEGER) / 60,
+                MAX(CAST(strftime('%s', new.starts_at) AS INTEGER) / 60,
+                    (CAST(strftime('%s', COALESCE(new.ends_at, datetime(new.starts_at, '+1 hour'))) AS INTEGER) + 59) / 60)
+            );
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS events_rtree_update AFTER UPDATE OF starts_at, ends_at ON events BEGIN
+            UPDATE events_rtree SET
+                starts_min = CAST(strftime('%s', new.starts_at) AS INTEGER) / 60,
+                ends_max = MAX(CAST(strftime('%s', new.starts_at) AS INTEGER) / 60,
+                    (CAST(strftime('%s', COALESCE(new.ends_at, datetime(new.starts_at, '+1 hour'))) AS INTEGER) + 59) / 60)
+            WHERE id = new.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS events_rtree_delete AFTER DELETE ON events BEGIN
+            DELETE FROM events_rtree WHERE id = old.id;
+        END""",
+    ],
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS btree_gist",
+        """CREATE INDEX IF NOT EXISTS ix_events_user_during ON events USING gist (
+            user_id, tsrange(starts_at, COALESCE(ends_at, starts_at + interval '1 hour'), '[)'))""",
+        """CREATE INDEX IF NOT EXISTS ix_events_location_during ON events USING gist (
+            location, tsrange(starts_at, COALESCE(ends_at, starts_at + interval '1 hour'), '[)'))
+            WHERE location IS NOT NULL""",
+    ],
+}
+
+@event.listens_for(Event.__table__, "after_create")
+def _create_event_interval_index(target, connection, **kw):
+    from app.partitions import events_partitioned, partition_events
+    if events_partitioned(connection.dialect):
+        # Rebuilt partitioned with all its indexes, see app/partitions.py
+        partition_events(connection)
+        return
+    for statement in EVENT_INTERVAL_DDL.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+def _references_events(ddl, target, bind, dialect, **kw) -> bool:
+    """Foreign keys to events only exist while it is not partitioned"""
+    from app.partitions import events_partitioned
+    return not events_partitioned(dialect)
+
+class EventException(Base):
+    """Edited or cancelled occurrence of a recurring event"""
+    __tablename__ = "event_exceptions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(Integer, nullable=False)
+    original_start = Column(DateTime, nullable=False)
+    cancelled = Column(Boolean, default=False, nullable=False)
+    title = Column(String, nullable=True)
+    starts_at = Column(DateTime, nullable=True)
+    ends_at = Column(DateTime, nullable=True)
+    location = Column(String, nullable=True)
+    
+    # Relationships
+    event = relationship("Event", back_populates="exceptions")
+    
+    __table_args__ = (
+        ForeignKeyConstraint(['event_id'], ['events.id'], ondelete="CASCADE").ddl_if(callable_=_references_events),
+        UniqueConstraint('event_id', 'original_start', name='_event_occurrence_uc'),
+    )
+
+class ReminderDelivery(Base):
+    """Claim for a sent reminder, so each one is delivered by a single worker"""
+    __tablename__ = "reminder_deliveries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(Integer, nullable=False)
+    occurrence_start = Column(DateTime, nullable=False)
+    minutes_before = Column(Integer, nullable=False)
+    sent_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        ForeignKeyConstraint(['event_id'], ['events.id'], ondelete="CASCADE").ddl_if(callable_=_references_events),
+        UniqueConstraint('event_id', 'occurrence_start', 'minutes_before', name='_reminder_delivery_uc'),
+    )
+
+class Job(Base):
+    """Background job claimed and run by app.jobs workers"""
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    org_id = Column(Integer, ForeignKey("orgs.id", ondelete="CASCADE"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=True)
+    status = Column(Enum(JobStatusEnum), default=JobStatusEnum.queued, nullable=False)
+    priority = Column(Integer, default=0, nullable=False)  # Higher runs first
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=5, nullable=False)
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # Not claimed before this
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime, nullable=True)  # Heartbeat of the running worker
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # Claim order, over queued jobs only
+        Index(
+            'ix_jobs_queued', priority.desc(), run_at,
+            postgresql_where=status == JobStatusEnum.queued,
+            sqlite_where=status == JobStatusEnum.queued
+        ),
+        # Per-org concurrency counts
+        Index(
+            'ix_jobs_running_org', 'org_id',
+            postgresql_where=status == JobStatusEnum.running,
+            sqlite_where=status == JobStatusEnum.running
+        ),
+        Index('ix_jobs_org_created_at', 'org_id', 'created_at'),
+    )
+
+class AuditLog(Base):
+    """Field-level record of a change, written by app.audit"""
+    __tablename__ = "audit_log"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # Plain ids rather than foreign keys so entries outlive what they describe
+    org_id = Column(Integer, nullable=True)
+    user_id = Column(Integer, nullable=True)
+    entity = Column(String, nullable=False)  # Table name
+    entity_id = Column(Integer, nullable=False)
+    action = Column(String, nullable=False)  # create, update or delete
+    changes = Column(JSON, nullable=False)  # {field: [old, new]}
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index('ix_audit_log_org_created_at', 'org_id', 'created_at'),
+        Index('ix_audit_log_org_entity', 'org_id', 'entity', 'entity_id', 'created_at'),
+        Index('ix_audit_log_org_user', 'org_id', 'user_id', 'created_at'),
+    )
+
+class SyncTombstone(Base):
+    """Deleted client, case or event, kept so delta sync can report it"""
+    __tablename__ = "sync_tombstones"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    org_id = Column(Integer, ForeignKey("orgs.id", ondelete="CASCADE"), nullable=False)
+    entity = Column(String, nullable=False)  # Table name
+    entity_id = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index('ix_sync_tombstones_org_version', 'org_id', 'version'),
+        Index('ix_sync_tombstones_deleted_at', 'deleted_at'),
+    )
+
+# Cold copies of closed cases and their events, moved by app.case_archive.
+# Rows keep their ids, so they can be moved back when a case is reopened.
+class ArchivedCase(Base):
+    """Closed case moved out of ``cases``"""
+    __tablename__ = "cases_archive"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    org_id = Column(Integer, ForeignKey("orgs.id"), nullable=False)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    case_number = Column(String, unique=True, nullable=False)
+    title = Column(String, nullable=False)
+    status = Column(Enum(CaseStatusEnum), nullable=False)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    sync_version = Column(Integer, default=0, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    client = relationship("Client")
+    events = relationship("ArchivedEvent", back_populates="case")
+    
+    __table_args__ = (
+        Index('ix_cases_archive_org_id', 'org_id', 'id'),
+    )
+
+class ArchivedEvent(Base):
+    """Event of an archived case"""
+    __tablename__ = "events_archive"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    org_id = Column(Integer, ForeignKey("orgs.id"), nullable=False)
+    case_id = Column(Integer, ForeignKey("cases_archive.id"), nullable=True)
+    title = Column(String, nullable=False)
+    type = Column(String, nullable=True)
+    starts_at = Column(DateTime, nullable=False)
+    ends_at = Column(DateTime, nullable=True)
+    location = Column(String, nullable=True)
+    rrule = Column(String, nullable=True)
+    recurrence_until = Column(DateTime, nullable=True)
+    created_at = Column(DateTime)
+    sync_version = Column(Integer, default=0, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    case = relationship("ArchivedCase", back_populates="events")
+    exceptions = relationship("ArchivedEventException", back_populates="event", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index('ix_events_archive_org_starts_at', 'org_id', 'starts_at'),
+        Index('ix_events_archive_org_ends_at', 'org_id', 'ends_at'),
+        Index('ix_events_archive_case_id', 'case_id'),
+    )
+
+class ArchivedEventException(Base):
+    """Occurrence exception of an archived event"""
+    __tablename__ = "event_exceptions_archive"
+    
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey("events_archive.id", ondelete="CASCADE"), nullable=False)
+    original_start = Column(DateTime, nullable=False)
+    cancelled = Column(Boolean, default=False, nullable=False)
+    title = Column(String, nullable=True)
+    starts_at = Column(DateTime, nullable=True)
+    ends_at = Column(DateTime, nullable=True)
+    location = Column(String, nullable=True)
+    
+    # Relationships
+    event = relationship("ArchivedEvent", back_populates="exceptions")
+    
+    __table_args__ = (
+        Index('ix_event_exceptions_archive_event_id', 'event_id'),
+    )
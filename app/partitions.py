@@ -0,0 +1,234 @@
+"""Monthly range partitioning of ``events`` on Postgres
+
+On Postgres ``events`` is partitioned by ``starts_at`` into one table per
+month (``events_2026_10``) plus ``events_default``, which takes rows
+outside the created months so inserts never fail. Queries bounded on
+``starts_at`` only scan the months they cover. Partitions for the next
+PARTITION_MONTHS_AHEAD months are created by migration 010, then kept
+ahead by ``partition_maintainer`` while the API runs, or by:
+
+    python -m app.partitions ensure [--months-ahead 12]
+
+Postgres needs the partition key in every unique constraint, so the
+primary key is (id, starts_at) and event_exceptions / reminder_deliveries
+cannot reference events through a foreign key; a delete trigger removes
+them instead. Lookups by id probe the id index of each partition.
+
+SQLite keeps a single events table.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import weakref
+from datetime import datetime
+from typing import List, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.schema import AddConstraint, CreateIndex
+
+PARTITION_EVENTS = os.getenv("PARTITION_EVENTS", "true").lower() in ("1", "true", "yes")
+PARTITION_MONTHS_AHEAD = 12
+MAINTENANCE_SECONDS = 24 * 3600
+# pg_advisory_xact_lock key serializing partition maintenance
+PARTITION_LOCK_ID = 7310152
+
+logger = logging.getLogger(__name__)
+
+# partitioned_engine() results by engine
+_layouts: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+# Replaces ON DELETE CASCADE of the foreign keys partitioning rules out.
+# A row moved to another partition by an UPDATE also fires AFTER DELETE, so
+# dependents are only removed when the id is really gone; rows moved out of
+# events_default by create_partition are skipped through app.moving_rows.
+DELETE_TRIGGER_DDL = [
+    """CREATE OR REPLACE FUNCTION events_delete_dependents() RETURNS trigger AS $$
+    BEGIN
+        IF current_setting('app.moving_rows', true) IS DISTINCT FROM 'on'
+                AND NOT EXISTS (SELECT 1 FROM events WHERE id = OLD.id) THEN
+            DELETE FROM event_exceptions WHERE event_id = OLD.id;
+            DELETE FROM reminder_deliveries WHERE event_id = OLD.id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER events_delete_dependents AFTER DELETE ON events
+        FOR EACH ROW EXECUTE FUNCTION events_delete_dependents()""",
+]
+
+
+def events_partitioned(dialect) -> bool:
+    """Whether create_all and migration 010 partition events on this dialect"""
+    return dialect.name == "postgresql" and PARTITION_EVENTS
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"events_{month:%Y_%m}"
+
+
+def partitioned(conn) -> bool:
+    """Whether ``events`` is a partitioned table on this connection"""
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('events'))"
+    )).scalar()
+
+
+def partitioned_engine(bind) -> bool:
+    """Whether events is partitioned in bind's database, read from the catalog once per engine
+
+    Queries go by this rather than PARTITION_EVENTS, which only decides how
+    the table is created and may have changed since.
+    """
+    if bind.dialect.name != "postgresql":
+        return False
+    engine = bind.engine
+    if engine not in _layouts:
+        with engine.connect() as conn:
+            _layouts[engine] = partitioned(conn)
+    return _layouts[engine]
+
+
+def existing_partitions(conn) -> Set[str]:
+    return set(conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'events'::regclass"
+    )).scalars())
+
+
+def create_partition(conn, month: datetime):
+    """Add the partition of one month, moving its rows out of events_default"""
+    name = partition_name(month)
+    bounds = {"lo": month, "hi": add_months(month, 1)}
+    conn.execute(text(f"CREATE TABLE {name} (LIKE events INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(
+        f"INSERT INTO {name} SELECT * FROM events_default WHERE starts_at >= :lo AND starts_at < :hi"
+    ), bounds)
+    conn.execute(text("SELECT set_config('app.moving_rows', 'on', true)"))
+    conn.execute(text("DELETE FROM events_default WHERE starts_at >= :lo AND starts_at < :hi"), bounds)
+    conn.execute(text("SELECT set_config('app.moving_rows', 'off', true)"))
+    # Attaching builds the parent's indexes on the new table
+    conn.execute(text(
+        f"ALTER TABLE events ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['lo']:%Y-%m-%d}') TO ('{bounds['hi']:%Y-%m-%d}')"
+    ))
+
+
+def ensure_partitions(bind, months_ahead: int = PARTITION_MONTHS_AHEAD,
+                      since: Optional[datetime] = None) -> List[str]:
+    """Create missing monthly partitions up to ``months_ahead``; returns their names"""
+    created = []
+    with bind.begin() as conn:
+        if not partitioned(conn):
+            return created
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_ID})
+        existing = existing_partitions(conn)
+        month = month_start(since or datetime.utcnow())
+        until = add_months(month_start(datetime.utcnow()), months_ahead)
+        while month <= until:
+            if partition_name(month) not in existing:
+                create_partition(conn, month)
+                created.append(partition_name(month))
+            month = add_months(month, 1)
+    return created
+
+
+def partition_events(conn, months_ahead: int = PARTITION_MONTHS_AHEAD):
+    """Rebuild a freshly created plain events table as a partitioned one"""
+    from app import models
+    from app.models import EVENT_INTERVAL_DDL
+
+    table = models.Event.__table__
+    conn.execute(text("ALTER TABLE events RENAME TO events_unpartitioned"))
+    conn.execute(text(
+        "CREATE TABLE events (LIKE events_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (starts_at)"
+    ))
+    conn.execute(text("CREATE TABLE events_default PARTITION OF events DEFAULT"))
+    conn.execute(text("INSERT INTO events SELECT * FROM events_unpartitioned"))
+    conn.execute(text("ALTER SEQUENCE events_id_seq OWNED BY events.id"))
+    # Also drops foreign keys that point at the old table
+    conn.execute(text("DROP TABLE events_unpartitioned CASCADE"))
+
+    conn.execute(text("ALTER TABLE events ADD PRIMARY KEY (id, starts_at)"))
+    for constraint in table.foreign_key_constraints:
+        conn.execute(AddConstraint(constraint))
+    for index in table.indexes:
+        conn.execute(CreateIndex(index))
+    for statement in EVENT_INTERVAL_DDL["postgresql"] + DELETE_TRIGGER_DDL:
+        conn.exec_driver_sql(statement)
+
+    first = conn.execute(text("SELECT min(starts_at) FROM events")).scalar() or datetime.utcnow()
+    month = month_start(first)
+    until = add_months(month_start(datetime.utcnow()), months_ahead)
+    while month <= until:
+        create_partition(conn, month)
+        month = add_months(month, 1)
+    _layouts.pop(conn.engine, None)
+
+
+class PartitionMaintainer:
+    """Keeps future event partitions created while the API runs"""
+
+    def __init__(self, bind=None, months_ahead: int = PARTITION_MONTHS_AHEAD):
+        self.bind = bind
+        self.months_ahead = months_ahead
+        self._task = None
+
+    async def start(self):
+        if self.bind is None:
+            from app.database import engine
+            self.bind = engine
+        if self.bind.dialect.name == "postgresql" and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                created = await asyncio.to_thread(ensure_partitions, self.bind, self.months_ahead)
+                if created:
+                    logger.info("Created event partitions %s", ", ".join(created))
+            except Exception:
+                logger.exception("Event partition maintenance failed")
+            await asyncio.sleep(MAINTENANCE_SECONDS)
+
+
+partition_maintainer = PartitionMaintainer()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain monthly events partitions (Postgres)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ensure_cmd = commands.add_parser("ensure", help="Create missing future partitions")
+    ensure_cmd.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    args = parser.parse_args(argv)
+
+    from app.database import engine
+    created = ensure_partitions(engine, args.months_ahead)
+    print(f"✅ Created {len(created)} partitions" + (f": {', '.join(created)}" if created else ""))
+
+
+if __name__ == "__main__":
+    main()
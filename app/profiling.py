@@ -0,0 +1,218 @@
+"""On-demand profiling of single requests
+
+A request is profiled when an owner or admin sends ``X-Profile: 1`` (saved)
+or ``X-Profile: inline`` (the profile replaces the response body), or when
+it is picked by PROFILE_SAMPLE_RATE. While it runs a sampler thread records
+the stacks of all busy threads, so work handed to the threadpool by sync
+endpoints and dependencies is included; requests running at the same time
+in the process can show up too. Profiles are written to PROFILE_DIR in the
+speedscope format (https://www.speedscope.app); on-demand requests get the
+file name in the ``X-Profile`` response header.
+
+Overhead is bounded: at most PROFILE_MAX_CONCURRENT requests per process are
+profiled at once (others get ``X-Profile: busy``), sampling stops after
+PROFILE_MAX_SECONDS, and the sampler slows down whenever its own CPU time
+exceeds PROFILE_MAX_OVERHEAD of the elapsed time.
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+PROFILE_MAX_OVERHEAD = float(os.getenv("PROFILE_MAX_OVERHEAD", "0.05"))
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "1"))
+MAX_INTERVAL = 0.1
+ADMIN_ROLES = ("owner", "admin")
+
+# Functions a thread sits in while it has nothing to do
+IDLE_FRAMES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"), ("queue.py", "get"),
+}
+
+FrameKey = Tuple[str, str, int]
+
+
+class Sampler(threading.Thread):
+    """Samples the stacks of all other busy threads until stopped"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, max_seconds: float = PROFILE_MAX_SECONDS,
+                 max_overhead: float = PROFILE_MAX_OVERHEAD):
+        super().__init__(daemon=True, name="profile-sampler")
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.max_overhead = max_overhead
+        self.frames: Dict[FrameKey, int] = {}
+        # thread name -> (stacks of frame indices, weights in seconds)
+        self.samples: Dict[str, Tuple[List[List[int]], List[float]]] = {}
+        self.elapsed = 0.0
+        self._stopped = threading.Event()
+
+    def _frame(self, code) -> int:
+        key = (code.co_filename, code.co_qualname, code.co_firstlineno)
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def _sample(self, weight: float):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            stacks, weights = self.samples.setdefault(names.get(ident, str(ident)), ([], []))
+            stacks.append(stack)
+            weights.append(weight)
+
+    def run(self):
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        last = started
+        while not self._stopped.wait(self.interval):
+            now = time.perf_counter()
+            self._sample(now - last)
+            last = now
+            self.elapsed = now - started
+            if self.elapsed > self.max_seconds:
+                break
+            if time.thread_time() - cpu_started > self.max_overhead * self.elapsed:
+                self.interval = min(self.interval * 2, MAX_INTERVAL)
+        self.elapsed = time.perf_counter() - started
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def speedscope(self, name: str) -> dict:
+        frames = [None] * len(self.frames)
+        for (file, function, line), index in self.frames.items():
+            frames[index] = {"name": function, "file": file, "line": line}
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "avukatajanda",
+            "shared": {"frames": frames},
+            "profiles": [
+                {"type": "sampled", "name": thread, "unit": "seconds", "startValue": 0,
+                 "endValue": self.elapsed, "samples": stacks, "weights": weights}
+                for thread, (stacks, weights) in self.samples.items()
+            ],
+        }
+
+
+def _is_admin(scope) -> bool:
+    from app.auth import decode_token
+
+    for key, value in scope["headers"]:
+        if key == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            payload = decode_token(token) if scheme.lower() == "bearer" else None
+            return bool(payload) and payload.get("scope") is None and payload.get("role") in ADMIN_ROLES
+    return False
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware profiling requests on demand or by sampling"""
+
+    def __init__(self, app, directory: str = PROFILE_DIR, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 max_concurrent: int = PROFILE_MAX_CONCURRENT, interval: float = PROFILE_INTERVAL):
+        self.app = app
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_concurrent = max_concurrent
+        self.interval = interval
+        self._active = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = None
+        requested = _header(scope, b"x-profile")
+        on_demand = bool(requested) and _is_admin(scope)
+        if on_demand:
+            mode = "inline" if requested == "inline" else "save"
+        elif self.sample_rate and random.random() < self.sample_rate:
+            mode = "save"
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        if self._active >= self.max_concurrent:
+            await self.app(scope, receive, self._tagged(send, b"busy") if on_demand else send)
+            return
+
+        self._active += 1
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{os.getpid()}.speedscope.json"
+        sampler = Sampler(interval=self.interval)
+        sampler.start()
+        status = 500
+
+        async def discard(message):
+            # The profile is sent instead of the response
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        try:
+            if mode == "inline":
+                await self.app(scope, receive, discard)
+            else:
+                await self.app(scope, receive, self._tagged(send, name.encode()) if on_demand else send)
+        finally:
+            sampler.stop()
+            self._active -= 1
+
+        route = getattr(scope.get("route"), "path", scope["path"])
+        if mode == "inline":
+            profile = sampler.speedscope(f"{scope['method']} {route} ({status})")
+            body = json.dumps(profile).encode()
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profiled-status", str(status).encode()),
+            ]})
+            await send({"type": "http.response.body", "body": body})
+        else:
+            profile = sampler.speedscope(f"{scope['method']} {route}")
+            await asyncio.get_running_loop().run_in_executor(None, self._save, profile, name)
+
+    @staticmethod
+    def _tagged(send, value: bytes):
+        """``send`` adding the X-Profile header to the response"""
+        async def tagged(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile", value)]}
+            await send(message)
+        return tagged
+
+    def _save(self, profile: dict, name: str):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, name), "w") as f:
+            json.dump(profile, f)
@@ -0,0 +1,156 @@
+"""Per-request SQL query accounting and N+1 detection
+
+Engine ``before/after_cursor_execute`` events count the statements a request
+runs, including lazy loads triggered while the response is serialized, and
+their database time. ``QueryStatsMiddleware`` opens the tally for each
+request and reports it in the ``X-DB-Queries`` and ``Server-Timing``
+headers and in a log line. A statement shape (the SQL text, with expanded
+``IN`` lists collapsed) repeated N_PLUS_ONE_THRESHOLD times in one request
+is logged as a likely N+1.
+
+Routes can declare a budget with ``@query_budget(n)``. Over budget, or on
+an N+1, the request is logged as a warning; with QUERY_BUDGET_STRICT (set
+by the tests) it raises ``QueryBudgetExceeded`` so the test fails.
+"""
+
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)")
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """Statement shapes run at least ``threshold`` times"""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def shape(statement: str) -> str:
+    return _IN_LIST.sub("(?)", statement)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    started = conn.info.get("query_started")
+    if started:
+        stats.seconds += time.perf_counter() - started.pop()
+    stats.count += 1
+    stats.shapes[statement] += 1
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Tally the statements run in this context (and threads started from it)"""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def query_budget(limit: int):
+    """Declare the most statements a route should need"""
+    def decorate(endpoint):
+        endpoint.query_budget = limit
+        return endpoint
+    return decorate
+
+
+def _collapse(stats: QueryStats):
+    # Statements are keyed by their raw text while counting; IN lists of
+    # different lengths are merged only when reporting
+    merged = Counter()
+    for statement, n in stats.shapes.items():
+        merged[shape(statement)] += n
+    stats.shapes = merged
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware reporting each request's statements"""
+
+    def __init__(self, app, strict: bool = QUERY_BUDGET_STRICT, threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.strict = strict
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and stats.count:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.count).encode()))
+                headers.append((b"server-timing", f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"'.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+        self._check(scope, stats)
+
+    def _check(self, scope, stats: QueryStats):
+        if not stats.count:
+            return
+        route = scope.get("route")
+        path = getattr(route, "path", scope["path"])
+        logger.debug("%s %s: %d queries in %.1f ms", scope["method"], path, stats.count, stats.seconds * 1000,
+                     extra={"db_queries": stats.count, "db_ms": round(stats.seconds * 1000, 1)})
+
+        problems = []
+        budget = getattr(getattr(route, "endpoint", None), "query_budget", None)
+        if budget is not None and stats.count > budget:
+            problems.append(f"{stats.count} queries, budget {budget}")
+        _collapse(stats)
+        for statement, n in stats.repeated(self.threshold):
+            problems.append(f"N+1: {n}x {statement[:200]}")
+        if not problems:
+            return
+        message = f"{scope['method']} {path}: " + "; ".join(problems)
+        if self.strict:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
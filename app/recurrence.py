@@ -0,0 +1,253 @@
+"""Recurring event rules and lazy occurrence expansion
+
+Supports the RRULE subset the calendar UI produces: FREQ (DAILY, WEEKLY,
+MONTHLY, YEARLY), INTERVAL, COUNT or UNTIL, and BYDAY for weekly rules.
+Occurrences are generated lazily, so open-ended series are never
+materialized; only the part overlapping the requested window is walked.
+"""
+
+import calendar
+import heapq
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+MAX_COUNT = 1000
+# How far ahead open-ended series count towards "upcoming" totals
+UPCOMING_HORIZON = timedelta(days=365)
+# Consecutive empty periods before giving up (e.g. FREQ=MONTHLY on the 31st)
+MAX_EMPTY_PERIODS = 1000
+
+
+@dataclass
+class RecurrenceRule:
+    freq: str
+    interval: int = 1
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+    byday: List[int] = field(default_factory=list)
+
+
+def _parse_until(value: str) -> datetime:
+    if len(value) == 8:
+        # A date UNTIL includes the whole day
+        return datetime.strptime(value, "%Y%m%d") + timedelta(days=1) - timedelta(seconds=1)
+    return datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+
+
+def parse_rrule(text: str) -> RecurrenceRule:
+    """Parse an RRULE value such as ``FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10``"""
+    if text.upper().startswith("RRULE:"):
+        text = text[6:]
+
+    parts = {}
+    for part in filter(None, text.strip().upper().split(";")):
+        key, sep, value = part.partition("=")
+        if not sep or not value:
+            raise ValueError(f"Malformed RRULE part: {part}")
+        parts[key] = value
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError("RRULE FREQ must be one of " + ", ".join(FREQUENCIES))
+    rule = RecurrenceRule(freq=freq)
+
+    try:
+        if "INTERVAL" in parts:
+            rule.interval = int(parts.pop("INTERVAL"))
+        if "COUNT" in parts:
+            rule.count = int(parts.pop("COUNT"))
+        if "UNTIL" in parts:
+            rule.until = _parse_until(parts.pop("UNTIL"))
+    except ValueError:
+        raise ValueError("Invalid INTERVAL, COUNT or UNTIL in RRULE")
+
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValueError("BYDAY is only supported for weekly rules")
+        days = parts.pop("BYDAY").split(",")
+        if any(day not in WEEKDAYS for day in days):
+            raise ValueError("BYDAY must list plain weekdays such as MO,WE")
+        rule.byday = sorted({WEEKDAYS.index(day) for day in days})
+
+    if parts:
+        raise ValueError("Unsupported RRULE parts: " + ", ".join(sorted(parts)))
+    if rule.interval < 1:
+        raise ValueError("RRULE INTERVAL must be positive")
+    if rule.count is not None and not 1 <= rule.count <= MAX_COUNT:
+        raise ValueError(f"RRULE COUNT must be between 1 and {MAX_COUNT}")
+    if rule.count is not None and rule.until is not None:
+        raise ValueError("RRULE cannot have both COUNT and UNTIL")
+
+    return rule
+
+
+def _add_months(dtstart: datetime, months: int) -> Optional[datetime]:
+    month_index = dtstart.month - 1 + months
+    year, month = dtstart.year + month_index // 12, month_index % 12 + 1
+    if dtstart.day > calendar.monthrange(year, month)[1]:
+        return None
+    return dtstart.replace(year=year, month=month)
+
+
+def _period(rule: RecurrenceRule, dtstart: datetime, n: int) -> List[datetime]:
+    """Occurrence starts in the n-th period of the rule"""
+    if rule.freq == "DAILY":
+        return [dtstart + timedelta(days=n * rule.interval)]
+    if rule.freq == "WEEKLY":
+        week = dtstart - timedelta(days=dtstart.weekday()) + timedelta(weeks=n * rule.interval)
+        days = rule.byday or [dtstart.weekday()]
+        return [week + timedelta(days=day) for day in days]
+
+    months = n * rule.interval * (12 if rule.freq == "YEARLY" else 1)
+    start = _add_months(dtstart, months)
+    return [start] if start else []
+
+
+def _first_period(rule: RecurrenceRule, dtstart: datetime, after: datetime) -> int:
+    """Index of a period at or before the one containing ``after``"""
+    if after <= dtstart:
+        return 0
+    if rule.freq == "DAILY":
+        return (after - dtstart).days // rule.interval
+    if rule.freq == "WEEKLY":
+        week = dtstart - timedelta(days=dtstart.weekday())
+        return (after - week).days // (7 * rule.interval)
+    months = (after.year - dtstart.year) * 12 + after.month - dtstart.month
+    if rule.freq == "YEARLY":
+        months //= 12
+    return max(months // rule.interval - 1, 0)
+
+
+def iter_starts(rule: RecurrenceRule, dtstart: datetime, after: Optional[datetime] = None) -> Iterator[datetime]:
+    """Lazily yield occurrence starts, optionally only those at or after ``after``
+
+    Without COUNT the walk jumps straight to the period containing ``after``;
+    with COUNT it has to count from the beginning, which MAX_COUNT bounds.
+    """
+    n = 0 if after is None or rule.count is not None else _first_period(rule, dtstart, after)
+    produced = 0
+    empty = 0
+
+    while empty < MAX_EMPTY_PERIODS:
+        starts = [s for s in _period(rule, dtstart, n) if s >= dtstart]
+        empty = 0 if starts else empty + 1
+        for start in starts:
+            if rule.until is not None and start > rule.until:
+                return
+            produced += 1
+            if after is None or start >= after:
+                yield start
+            if rule.count is not None and produced >= rule.count:
+                return
+        n += 1
+
+
+def series_end(rule: RecurrenceRule, starts_at: datetime, ends_at: Optional[datetime]) -> Optional[datetime]:
+    """Latest instant covered by the series, or None when it is unbounded"""
+    duration = ends_at - starts_at if ends_at else timedelta(0)
+    if rule.until is not None:
+        return rule.until + duration
+    if rule.count is not None:
+        last = starts_at
+        for last in iter_starts(rule, starts_at):
+            pass
+        return last + duration
+    return None
+
+
+def is_occurrence(rule: RecurrenceRule, dtstart: datetime, start: datetime) -> bool:
+    """Whether ``start`` is one of the series' occurrence starts"""
+    return next(iter_starts(rule, dtstart, after=start), None) == start
+
+
+class Occurrence:
+    """One instance of a recurring event, shaped like an ``Event`` row"""
+
+    def __init__(self, event, recurrence_id: datetime, exception=None):
+        self.id = event.id
+        self.user_id = event.user_id
+        self.org_id = event.org_id
+        self.case_id = event.case_id
+        self.case = event.case
+        self.type = event.type
+        self.rrule = event.rrule
+        self.created_at = event.created_at
+        self.archived_at = getattr(event, "archived_at", None)
+        self.recurrence_id = recurrence_id
+
+        duration = event.ends_at - event.starts_at if event.ends_at else None
+        self.title = event.title
+        self.location = event.location
+        self.starts_at = recurrence_id
+        self.ends_at = recurrence_id + duration if duration is not None else None
+
+        if exception is not None:
+            self.title = exception.title or self.title
+            self.location = exception.location or self.location
+            if exception.starts_at:
+                self.starts_at = exception.starts_at
+                self.ends_at = self.starts_at + duration if duration is not None else None
+            if exception.ends_at:
+                self.ends_at = exception.ends_at
+
+
+def _in_window(starts_at, ends_at, start, end, include_ongoing) -> bool:
+    if end is not None and starts_at >= end:
+        return False
+    if starts_at >= start:
+        return True
+    return include_ongoing and ends_at is not None and ends_at > start
+
+
+def expand(event, start: datetime, end: Optional[datetime] = None,
+           include_ongoing: bool = True) -> Iterator[Occurrence]:
+    """Lazily yield a series' occurrences in [start, end), ordered by start
+
+    Cancelled occurrences are skipped; edited ones are taken from the
+    event's stored exceptions and merged in at their new time.
+    """
+    rule = parse_rrule(event.rrule)
+    exceptions: Dict[datetime, object] = {e.original_start: e for e in event.exceptions}
+    duration = event.ends_at - event.starts_at if event.ends_at else timedelta(0)
+    scan_from = start
+    if include_ongoing and start - datetime.min > duration:
+        scan_from = start - duration
+
+    def regular():
+        for occurrence_start in iter_starts(rule, event.starts_at, after=scan_from):
+            if end is not None and occurrence_start >= end:
+                return
+            if occurrence_start in exceptions:
+                continue
+            occurrence = Occurrence(event, occurrence_start)
+            if _in_window(occurrence.starts_at, occurrence.ends_at, start, end, include_ongoing):
+                yield occurrence
+
+    edited = sorted(
+        (
+            occurrence for occurrence in (
+                Occurrence(event, e.original_start, e)
+                for e in exceptions.values() if not e.cancelled
+            )
+            if _in_window(occurrence.starts_at, occurrence.ends_at, start, end, include_ongoing)
+        ),
+        key=lambda o: o.starts_at
+    )
+
+    return heapq.merge(regular(), edited, key=lambda o: o.starts_at)
+
+
+def merge_occurrences(singles: Iterable, series: Iterable, start: datetime,
+                      end: Optional[datetime] = None, include_ongoing: bool = True) -> Iterator:
+    """Merge start-ordered single events with the expansions of recurring ones"""
+    streams = [iter(singles)] + [expand(event, start, end, include_ongoing) for event in series]
+    return heapq.merge(*streams, key=lambda e: e.starts_at)
+
+
+def count_occurrences(series: Iterable, start: datetime, end: datetime,
+                      include_ongoing: bool = True) -> int:
+    """Count occurrences of recurring events inside a bounded window"""
+    return sum(1 for event in series for _ in expand(event, start, end, include_ongoing))
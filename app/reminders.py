@@ -0,0 +1,392 @@
+"""Event reminders delivered by a background scheduler
+
+The app lifespan starts ``reminder_scheduler``. It keeps the reminders due in
+the next few minutes in a heap ordered by fire time, refills it from the
+database every ``refresh_seconds`` and patches it in place when this worker
+creates, updates or deletes an event. Reminders are handed to a pluggable
+sink chosen with ``REMINDER_SINK``: ``log``, ``file:<path>`` or
+``package.module:factory`` for SMTP/SMS senders.
+
+A refresh only loads the recurring series due soon: the leader stores each
+series' next occurrence in ``events.next_occurrence_at``, and any change to
+a series or its exceptions clears it, so refreshes cost as much as the
+reminders in the window rather than every series ever created.
+
+Only one worker fires reminders. On Postgres the leader holds a session
+advisory lock; every delivery is also claimed in ``reminder_deliveries``
+first, so a reminder is not sent twice even across a leader change.
+"""
+
+import asyncio
+import heapq
+import importlib
+import itertools
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, event, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload, sessionmaker
+from app import models
+from app.recurrence import expand
+
+REMINDER_MINUTES = [int(m) for m in os.getenv("REMINDER_MINUTES", "60").split(",") if m.strip()]
+REMINDER_SINK = os.getenv("REMINDER_SINK", "log")
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "true").lower() in ("1", "true", "yes")
+REFRESH_SECONDS = 60
+# How far ahead reminders are kept in memory; must exceed the refresh interval
+HORIZON = timedelta(minutes=5)
+# Reminders missed by at most this much (restart, failover) are still sent
+GRACE = timedelta(minutes=5)
+# pg_advisory_lock key held by the leader
+LEADER_LOCK_ID = 7310150
+
+logger = logging.getLogger(__name__)
+
+ReminderKey = Tuple[int, datetime, int]
+
+
+@dataclass(frozen=True)
+class Reminder:
+    event_id: int
+    user_id: int
+    org_id: int
+    title: str
+    starts_at: datetime
+    location: Optional[str]
+    minutes_before: int
+
+    @property
+    def fire_at(self) -> datetime:
+        return self.starts_at - timedelta(minutes=self.minutes_before)
+
+    @property
+    def key(self) -> ReminderKey:
+        return (self.event_id, self.starts_at, self.minutes_before)
+
+
+def event_reminders(event, start: datetime, end: datetime,
+                    minutes: Optional[List[int]] = None) -> List[Reminder]:
+    """Reminders of an event, or of its occurrences, firing in [start, end)"""
+    minutes = minutes or REMINDER_MINUTES
+    if event.rrule:
+        occurrences = expand(event, start, end + timedelta(minutes=max(minutes)), include_ongoing=False)
+    else:
+        occurrences = [event]
+
+    reminders = []
+    for occurrence in occurrences:
+        for minutes_before in minutes:
+            reminder = Reminder(event.id, event.user_id, event.org_id, occurrence.title,
+                                occurrence.starts_at, occurrence.location, minutes_before)
+            if start <= reminder.fire_at < end:
+                reminders.append(reminder)
+    return reminders
+
+
+@event.listens_for(Session, "before_flush")
+def _reset_next_occurrence(session: Session, flush_context, instances):
+    """Have the scheduler expand changed series again"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.EventException):
+            # An edited occurrence may now start before the stored one
+            obj = obj.event
+        if isinstance(obj, models.Event) and obj not in session.deleted and obj.next_occurrence_at is not None:
+            obj.next_occurrence_at = None
+
+
+def next_occurrence(series, start: datetime) -> Optional[datetime]:
+    """Start of a series' first occurrence at or after ``start``, edited ones included"""
+    occurrence = next(expand(series, start, include_ongoing=False), None)
+    return occurrence.starts_at if occurrence is not None else None
+
+
+class LogSink:
+    """Writes reminders to the application log"""
+
+    def deliver(self, reminder: Reminder):
+        logger.info("Reminder for user %s: %s at %s", reminder.user_id, reminder.title, reminder.starts_at)
+
+
+class FileSink:
+    """Appends reminders to a JSON-lines file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def deliver(self, reminder: Reminder):
+        line = json.dumps({**asdict(reminder), "fire_at": reminder.fire_at}, default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+def load_sink(spec: str):
+    """Build a sink from ``log``, ``file:<path>`` or ``package.module:factory``"""
+    if spec == "log":
+        return LogSink()
+    if spec.startswith("file:"):
+        return FileSink(spec[5:])
+    module, sep, name = spec.partition(":")
+    if not sep:
+        raise ValueError(f"Unknown reminder sink: {spec}")
+    return getattr(importlib.import_module(module), name)()
+
+
+class ReminderScheduler:
+    """In-process reminder heap with incremental updates and leader election
+
+    Heap entries are never removed in place: updating an event replaces its
+    entries in ``_pending`` and popped entries that are no longer there are
+    skipped.
+    """
+
+    def __init__(self, bind=None, sink=None, minutes: Optional[List[int]] = None,
+                 refresh_seconds: float = REFRESH_SECONDS, horizon: timedelta = HORIZON,
+                 grace: timedelta = GRACE):
+        self.bind = bind
+        self.sink = sink
+        self.minutes = minutes or REMINDER_MINUTES
+        self.refresh_seconds = refresh_seconds
+        self.horizon = horizon
+        self.grace = grace
+        self.is_leader = False
+
+        self._heap: List[Tuple[datetime, int, Reminder]] = []
+        self._pending: Dict[ReminderKey, Reminder] = {}
+        self._fired: Dict[ReminderKey, datetime] = {}
+        self._touched = set()
+        self._sequence = itertools.count()
+        self._loaded_until: Optional[datetime] = None
+        self._leader_conn = None
+        self._session_factory = None
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        if self.bind is None:
+            from app.database import engine
+            self.bind = engine
+        self.sink = self.sink or load_sink(REMINDER_SINK)
+        self._session_factory = sessionmaker(bind=self.bind)
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._resign)
+        self._replace_all([])
+        self._loaded_until = None
+
+    def upsert_event(self, event):
+        """Reschedule an event's reminders after a create or update"""
+        if self.is_leader and self._loaded_until is not None:
+            reminders = event_reminders(event, datetime.utcnow() - self.grace, self._loaded_until, self.minutes)
+            self._loop.call_soon_threadsafe(self._replace_event, event.id, reminders)
+
+    def remove_event(self, event):
+        """Drop a deleted event's reminders"""
+        if self.is_leader and self._loaded_until is not None:
+            self._loop.call_soon_threadsafe(self._replace_event, event.id, [])
+
+    def _push(self, reminder: Reminder):
+        self._pending[reminder.key] = reminder
+        heapq.heappush(self._heap, (reminder.fire_at, next(self._sequence), reminder))
+
+    def _replace_event(self, event_id: int, reminders: List[Reminder]):
+        self._touched.add(event_id)
+        for key in [key for key in self._pending if key[0] == event_id]:
+            del self._pending[key]
+        for reminder in reminders:
+            if reminder.key not in self._fired:
+                self._push(reminder)
+        self._wakeup.set()
+
+    def _replace_all(self, reminders: List[Reminder]):
+        self._pending = {r.key: r for r in reminders if r.key not in self._fired}
+        self._heap = [(r.fire_at, next(self._sequence), r) for r in self._pending.values()]
+        heapq.heapify(self._heap)
+
+    def _elect(self) -> bool:
+        """Take or confirm leadership"""
+        if self.bind.dialect.name != "postgresql":
+            # Single-node databases; delivery claims still prevent duplicates
+            return True
+
+        if self._leader_conn is not None:
+            try:
+                self._leader_conn.exec_driver_sql("SELECT 1")
+                return True
+            except Exception:
+                self._resign()
+
+        conn = self.bind.connect().execution_options(isolation_level="AUTOCOMMIT")
+        if conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": LEADER_LOCK_ID}).scalar():
+            self._leader_conn = conn
+            return True
+        conn.close()
+        return False
+
+    def _resign(self):
+        if self._leader_conn is None:
+            return
+        try:
+            self._leader_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LEADER_LOCK_ID})
+            self._leader_conn.close()
+        except Exception:
+            pass
+        self._leader_conn = None
+
+    def _load(self, start: datetime, end: datetime) -> List[Reminder]:
+        """Reminders firing in [start, end) from the database"""
+        earliest = start + timedelta(minutes=min(self.minutes))
+        latest = end + timedelta(minutes=max(self.minutes))
+        with self._session_factory() as db:
+            singles = db.query(models.Event).filter(
+                models.Event.rrule.is_(None),
+                models.Event.starts_at >= earliest,
+                models.Event.starts_at < latest
+            ).all()
+            # Series whose next occurrence is unknown or due before latest
+            series = db.query(models.Event).options(
+                selectinload(models.Event.exceptions),
+                joinedload(models.Event.case)
+            ).filter(
+                models.Event.rrule.isnot(None),
+                models.Event.next_occurrence_at.is_(None) | (models.Event.next_occurrence_at < latest),
+                models.Event.starts_at < latest,
+                models.Event.recurrence_until.is_(None) | (models.Event.recurrence_until >= earliest)
+            ).all()
+            reminders = [r for event in singles + series for r in event_reminders(event, start, end, self.minutes)]
+            self._store_next_occurrences(db, series, start)
+            return reminders
+
+    def _store_next_occurrences(self, db, series: list, start: datetime):
+        """Record where each series goes on, so later refreshes skip it until then
+
+        A Core update skips the ORM flush hooks, and matching sync_version
+        leaves alone series changed since they were loaded.
+        """
+        events = models.Event.__table__
+        changed = []
+        for event in series:
+            following = next_occurrence(event, start)
+            if following is not None and following != event.next_occurrence_at:
+                changed.append({"event_id": event.id, "version": event.sync_version, "following": following})
+        if changed:
+            db.execute(update(events).where(
+                events.c.id == bindparam("event_id"), events.c.sync_version == bindparam("version")
+            ).values(next_occurrence_at=bindparam("following")), changed)
+            db.commit()
+
+    async def _refresh(self):
+        now = datetime.utcnow()
+        until = now + self.horizon
+        self._touched = set()
+        loaded = await asyncio.to_thread(self._load, now - self.grace, until)
+
+        # Events changed on this worker while loading keep their newer entries
+        kept = [r for r in self._pending.values() if r.event_id in self._touched]
+        self._replace_all(kept + [r for r in loaded if r.event_id not in self._touched])
+        self._loaded_until = until
+        self._fired = {k: t for k, t in self._fired.items() if t >= now - self.grace}
+
+    def _deliver(self, reminder: Reminder) -> bool:
+        """Claim and send a reminder if its event still has it; False if sending failed"""
+        with self._session_factory() as db:
+            event = db.query(models.Event).filter(models.Event.id == reminder.event_id).first()
+            current = None
+            if event is not None:
+                current = next((
+                    r for r in event_reminders(event, reminder.fire_at, reminder.fire_at + timedelta(seconds=1),
+                                               [reminder.minutes_before])
+                    if r.key == reminder.key
+                ), None)
+            if current is None:
+                return True
+
+            claim = models.ReminderDelivery(
+                event_id=current.event_id,
+                occurrence_start=current.starts_at,
+                minutes_before=current.minutes_before
+            )
+            db.add(claim)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker already sent it
+                db.rollback()
+                return True
+
+            try:
+                self.sink.deliver(current)
+            except Exception:
+                logger.exception("Reminder delivery failed for event %s", current.event_id)
+                # Release the claim so a retry within the grace period can send it
+                db.delete(claim)
+                db.commit()
+                return False
+            return True
+
+    async def _fire_due(self):
+        now = datetime.utcnow()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, reminder = heapq.heappop(self._heap)
+            if self._pending.get(reminder.key) is not reminder:
+                continue
+            del self._pending[reminder.key]
+            self._fired[reminder.key] = reminder.fire_at
+            if not await asyncio.to_thread(self._deliver, reminder):
+                del self._fired[reminder.key]
+
+    async def _run(self):
+        next_refresh = 0.0
+        while True:
+            try:
+                if self._loop.time() >= next_refresh:
+                    next_refresh = self._loop.time() + self.refresh_seconds
+                    self.is_leader = await asyncio.to_thread(self._elect)
+                    if self.is_leader:
+                        await self._refresh()
+                    else:
+                        self._replace_all([])
+                        self._loaded_until = None
+                if self.is_leader:
+                    await self._fire_due()
+            except Exception:
+                logger.exception("Reminder scheduler iteration failed")
+
+            self._wakeup.clear()
+            timeout = next_refresh - self._loop.time()
+            if self._heap:
+                timeout = min(timeout, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+
+reminder_scheduler = ReminderScheduler()
+# Schedulers of further database shards by engine, added by the app (see app/shards.py)
+shard_schedulers: Dict[object, ReminderScheduler] = {}
+
+
+def scheduler_for(bind) -> ReminderScheduler:
+    """Scheduler of the shard a session is bound to"""
+    return shard_schedulers.get(bind, reminder_scheduler)
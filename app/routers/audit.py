@@ -0,0 +1,56 @@
+"""Audit log routes"""
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+from app.database import get_db
+from app import models, schemas
+from app.audit import AUDITED_TABLES
+from app.deps import get_current_admin, get_current_org
+from app.scheduling import naive_utc
+
+router = APIRouter()
+
+@router.get("/", response_model=List[schemas.AuditLogResponse])
+async def list_audit_log(
+    entity: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    current_user = Depends(get_current_admin),
+    current_org = Depends(get_current_org),
+    db: Session = Depends(get_db)
+):
+    """Who changed what in the current organization, newest first"""
+    if entity is not None and entity not in AUDITED_TABLES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'entity' must be one of " + ", ".join(sorted(AUDITED_TABLES))
+        )
+    if entity_id is not None and entity is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'entity_id' requires 'entity'"
+        )
+    
+    query = db.query(models.AuditLog).filter(models.AuditLog.org_id == current_org.id)
+    
+    if entity:
+        query = query.filter(models.AuditLog.entity == entity)
+    if entity_id is not None:
+        query = query.filter(models.AuditLog.entity_id == entity_id)
+    if user_id is not None:
+        query = query.filter(models.AuditLog.user_id == user_id)
+    # created_at is naive UTC
+    if from_:
+        query = query.filter(models.AuditLog.created_at >= naive_utc(from_))
+    if to:
+        query = query.filter(models.AuditLog.created_at < naive_utc(to))
+    
+    return query.order_by(
+        models.AuditLog.created_at.desc(), models.AuditLog.id.desc()
+    ).offset(skip).limit(limit).all()
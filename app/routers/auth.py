@@ -3,17 +3,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_directory_db
 from app import models, schemas
 from app.auth import verify_password, get_password_hash, create_access_token
 from app.deps import get_current_user
+from app.queries import query_budget
 
 router = APIRouter()
 
 @router.post("/register", response_model=schemas.Token)
 async def register(
     user_data: schemas.UserRegister,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_directory_db)
 ):
     """Register a new user"""
     # Check if email already exists
@@ -63,7 +64,7 @@ async def register(
 @router.post("/login", response_model=schemas.Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_directory_db)
 ):
     """Login and get access token"""
     # Find user by email
@@ -98,19 +99,24 @@ async def login(
     
     return {"access_token": access_token, "token_type": "bearer"}
 
+def _membership_query(db: Session, user_id: int):
+    """A user's memberships"""
+    return db.query(models.Membership).filter(
+        models.Membership.user_id == user_id
+    )
+
 @router.get("/me", response_model=schemas.MeResponse)
+@query_budget(4)
 async def get_me(
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_directory_db)
 ):
     """Get current user information"""
     # Get user with memberships
     user = db.query(models.User).filter(models.User.id == current_user.id).first()
     
     # Get memberships with org data
-    memberships = db.query(models.Membership).filter(
-        models.Membership.user_id == user.id
-    ).all()
+    memberships = _membership_query(db, user.id).all()
     
     # Get current org
     current_org = db.query(models.Org).filter(
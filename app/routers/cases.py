@@ -5,39 +5,62 @@ from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from app.database import get_db
 from app import models, schemas
+from app.case_archive import restore_case
 from app.deps import get_current_user, get_current_org
+from app.queries import query_budget
 
 router = APIRouter()
 
+def _case_query(db: Session, model, org_id: int, q: Optional[str], status: Optional[schemas.CaseStatusEnum]):
+    """Filtered cases of an org from the live or the archive table"""
+    query = db.query(model).options(
+        joinedload(model.client)
+    ).filter(
+        model.org_id == org_id
+    )
+    
+    # Search filter
+    if q:
+        query = query.filter(
+            model.title.contains(q) |
+            model.case_number.contains(q)
+        )
+    
+    # Status filter
+    if status:
+        query = query.filter(model.status == status)
+    
+    return query
+
+def _case_number_taken(db: Session, case_number: str) -> bool:
+    """Case numbers stay unique across live and archived cases"""
+    return any(
+        db.query(model.id).filter(model.case_number == case_number).first()
+        for model in (models.Case, models.ArchivedCase)
+    )
+
 @router.get("/", response_model=List[schemas.CaseResponse])
+@query_budget(4)
 async def list_cases(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     q: Optional[str] = None,
     status: Optional[schemas.CaseStatusEnum] = None,
+    include_archived: bool = False,
     current_user = Depends(get_current_user),
     current_org = Depends(get_current_org),
     db: Session = Depends(get_db)
 ):
     """List all cases for the current organization"""
-    query = db.query(models.Case).options(
-        joinedload(models.Case.client)
-    ).filter(
-        models.Case.org_id == current_org.id
-    )
-    
-    # Search filter
-    if q:
-        query = query.filter(
-            models.Case.title.contains(q) |
-            models.Case.case_number.contains(q)
-        )
+    query = _case_query(db, models.Case, current_org.id, q, status)
+    cases = query.offset(skip).limit(limit).all()
     
-    # Status filter
-    if status:
-        query = query.filter(models.Case.status == status)
+    # Archived cases are listed after the live ones
+    if include_archived and len(cases) < limit:
+        live_total = skip + len(cases) if cases else query.count()
+        archived = _case_query(db, models.ArchivedCase, current_org.id, q, status)
+        cases += archived.offset(max(skip - live_total, 0)).limit(limit - len(cases)).all()
     
-    cases = query.offset(skip).limit(limit).all()
     return cases
 
 @router.post("/", response_model=schemas.CaseResponse)
@@ -61,11 +84,7 @@ async def create_case(
         )
     
     # Check if case number already exists
-    existing_case = db.query(models.Case).filter(
-        models.Case.case_number == case_data.case_number
-    ).first()
-    
-    if existing_case:
+    if _case_number_taken(db, case_data.case_number):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Case number already exists"
@@ -90,6 +109,7 @@ async def create_case(
 @router.get("/{case_id}", response_model=schemas.CaseResponse)
 async def get_case(
     case_id: int,
+    include_archived: bool = False,
     current_user = Depends(get_current_user),
     current_org = Depends(get_current_org),
     db: Session = Depends(get_db)
@@ -102,6 +122,14 @@ async def get_case(
         models.Case.org_id == current_org.id
     ).first()
     
+    if not case and include_archived:
+        case = db.query(models.ArchivedCase).options(
+            joinedload(models.ArchivedCase.client)
+        ).filter(
+            models.ArchivedCase.id == case_id,
+            models.ArchivedCase.org_id == current_org.id
+        ).first()
+    
     if not case:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -124,6 +152,22 @@ async def update_case(
         models.Case.org_id == current_org.id
     ).first()
     
+    if not case:
+        archived = db.query(models.ArchivedCase).filter(
+            models.ArchivedCase.id == case_id,
+            models.ArchivedCase.org_id == current_org.id
+        ).first()
+        
+        if archived:
+            if case_data.status in (None, schemas.CaseStatusEnum.closed):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Case is archived; reopen it by changing its status"
+                )
+            # Reopening brings the case and its events back
+            restore_case(db, archived)
+            case = db.query(models.Case).filter(models.Case.id == case_id).first()
+    
     if not case:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -145,11 +189,7 @@ async def update_case(
     
     # If updating case_number, check uniqueness
     if case_data.case_number and case_data.case_number != case.case_number:
-        existing_case = db.query(models.Case).filter(
-            models.Case.case_number == case_data.case_number
-        ).first()
-        
-        if existing_case:
+        if _case_number_taken(db, case_data.case_number):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Case number already exists"
@@ -6,21 +6,14 @@ from typing import List, Optional
 from app.database import get_db
 from app import models, schemas
 from app.deps import get_current_user, get_current_org
+from app.queries import query_budget
 
 router = APIRouter()
 
-@router.get("/", response_model=List[schemas.ClientResponse])
-async def list_clients(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=100),
-    q: Optional[str] = None,
-    current_user = Depends(get_current_user),
-    current_org = Depends(get_current_org),
-    db: Session = Depends(get_db)
-):
-    """List all clients for the current organization"""
+def _client_query(db: Session, org_id: int, q: Optional[str]):
+    """Clients of an org, optionally matching a search"""
     query = db.query(models.Client).filter(
-        models.Client.org_id == current_org.id
+        models.Client.org_id == org_id
     )
     
     # Search filter
@@ -31,7 +24,20 @@ async def list_clients(
             models.Client.phone.contains(q)
         )
     
-    clients = query.offset(skip).limit(limit).all()
+    return query
+
+@router.get("/", response_model=List[schemas.ClientResponse])
+@query_budget(3)
+async def list_clients(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    q: Optional[str] = None,
+    current_user = Depends(get_current_user),
+    current_org = Depends(get_current_org),
+    db: Session = Depends(get_db)
+):
+    """List all clients for the current organization"""
+    clients = _client_query(db, current_org.id, q).offset(skip).limit(limit).all()
     return clients
 
 @router.post("/", response_model=schemas.ClientResponse)
@@ -0,0 +1,57 @@
+"""Diagnostics routes for operators: memory and recent traces"""
+
+import tracemalloc
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from typing import Optional
+from app import diagnostics
+from app.diagnostics import SnapshotNotFound, tracer
+from app.tracing import exporter
+
+def require_diagnostics_token(request: Request):
+    """Routes exist only with DIAGNOSTICS_TOKEN set and require it as a bearer token"""
+    if not diagnostics.DIAGNOSTICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if request.headers.get("authorization") != f"Bearer {diagnostics.DIAGNOSTICS_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid diagnostics token")
+
+router = APIRouter(dependencies=[Depends(require_diagnostics_token)])
+
+@router.get("/memory")
+def memory():
+    """Process memory, tracemalloc state, open sessions and connection pools"""
+    return diagnostics.memory_report()
+
+@router.post("/tracemalloc/start")
+def start_tracing(frames: int = Query(1, ge=1, le=50)):
+    """Start tracing allocations, keeping ``frames`` frames of each traceback"""
+    return tracer.start(frames)
+
+@router.post("/tracemalloc/stop")
+def stop_tracing():
+    return tracer.stop()
+
+@router.post("/tracemalloc/snapshots", status_code=status.HTTP_201_CREATED)
+def take_snapshot():
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="tracemalloc is not running")
+    return tracer.take()
+
+@router.get("/tracemalloc/diff")
+def diff_snapshots(
+    from_: int = Query(..., alias="from"),
+    to: Optional[int] = None,
+    group_by: str = Query("lineno", pattern="^(filename|lineno|traceback)$"),
+    limit: int = Query(25, ge=1, le=500)
+):
+    """Largest allocation changes from one snapshot to another (default: the latest)"""
+    if to is None:
+        to = max(tracer.snapshots, default=from_)
+    try:
+        return {"from": from_, "to": to, "changes": tracer.diff(from_, to, group_by, limit)}
+    except SnapshotNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Snapshot {e.args[0]} not found")
+
+@router.get("/traces")
+def recent_traces(limit: int = Query(20, ge=1, le=1000)):
+    """Last traced requests of this worker as an OTLP/JSON export request"""
+    return exporter.recent(limit)
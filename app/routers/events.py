@@ -1,52 +1,181 @@
 """Event management routes"""
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List, Optional
-from datetime import datetime
-from app.database import get_db
+from datetime import datetime, timedelta
+from itertools import islice
+import heapq
+from app.database import get_db, get_directory_db
 from app import models, schemas
+from app.auth import create_feed_token, decode_token
+from app.availability import MAX_USERS, MAX_WINDOW, availability_cache, free_slots, load_busy, union_busy
+from app.conflicts import DEFAULT_CONFLICT_MODE, find_conflicts
 from app.deps import get_current_user, get_current_org
+from app.ical import feed_cache, feed_window_start
+from app.partitions import partitioned_engine
+from app.queries import query_budget
+from app.recurrence import Occurrence, is_occurrence, merge_occurrences, parse_rrule, series_end
+from app.reminders import scheduler_for
+from app.scheduling import earliest_overlapping, naive_utc, naive_utc_fields, overlaps_range
 
 router = APIRouter()
 
+def _apply_recurrence(event):
+    """Validate the event's RRULE and store where its series ends"""
+    if not event.rrule:
+        event.rrule = None
+        event.recurrence_until = None
+        return
+    
+    try:
+        rule = parse_rrule(event.rrule)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    event.recurrence_until = series_end(rule, event.starts_at, event.ends_at)
+
+def _check_conflicts(db: Session, event, on_conflict: Optional[str], exclude_id: Optional[int] = None):
+    """Find scheduling conflicts, raising 409 when they should be rejected"""
+    conflicts = [
+        {
+            "id": c.event.id,
+            "title": c.event.title,
+            "starts_at": c.event.starts_at,
+            "ends_at": c.event.ends_at,
+            "location": c.event.location,
+            "recurrence_id": c.recurrence_id,
+            "reason": c.reason
+        }
+        for c in find_conflicts(db, event, exclude_id=exclude_id)
+    ]
+    
+    if conflicts and (on_conflict or DEFAULT_CONFLICT_MODE) == "reject":
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "Event conflicts with existing events",
+                "conflicts": [schemas.EventConflict(**c).model_dump(mode="json") for c in conflicts]
+            }
+        )
+    return conflicts
+
+def _publish_change(db: Session, event, deleted: bool = False):
+    """Update in-process caches and the shard's reminder scheduler after an event write"""
+    availability_cache.invalidate(event)
+    scheduler = scheduler_for(db.get_bind())
+    if deleted:
+        feed_cache.remove_event(event)
+        scheduler.remove_event(event)
+    else:
+        feed_cache.upsert_event(event)
+        scheduler.upsert_event(event)
+
+def _event_query(db: Session, model, org_id: int, q: Optional[str]):
+    """Events of an org with their case and client, from the live or the archive table"""
+    case_model = models.Case if model is models.Event else models.ArchivedCase
+    query = db.query(model).options(
+        joinedload(model.case).joinedload(case_model.client)
+    ).filter(
+        model.org_id == org_id
+    )
+    
+    # Search filter
+    if q:
+        query = query.filter(
+            model.title.contains(q) |
+            model.location.contains(q)
+        )
+    
+    return query
+
+def _singles_in_window(query, model, upcoming: Optional[bool], from_: Optional[datetime],
+                       to: Optional[datetime], window_start: datetime):
+    """Start-ordered single (non-recurring) events of the query in the window"""
+    singles = query.filter(model.rrule.is_(None))
+    if upcoming:
+        singles = singles.filter(model.starts_at >= window_start)
+    elif from_:
+        singles = singles.filter(
+            (model.ends_at > from_) | (model.starts_at >= from_)
+        )
+    if to:
+        singles = singles.filter(overlaps_range(window_start, to, model) if from_ else model.starts_at < to)
+    return singles.order_by(model.starts_at)
+
+def _list_window(db: Session, model, org_id: int, q: Optional[str], upcoming: Optional[bool],
+                 from_: Optional[datetime], to: Optional[datetime], skip: int, limit: int) -> list:
+    """One page of start-ordered events from the live or the archive table"""
+    query = _event_query(db, model, org_id, q)
+    
+    # Without a window, recurring events are returned as their series row
+    if not (upcoming or from_ or to):
+        query = query.order_by(model.starts_at)
+        return query.offset(skip).limit(limit).all()
+    
+    # Upcoming lists events starting from now; a range also includes ongoing ones
+    include_ongoing = not upcoming
+    window_start = from_ or datetime.min
+    if upcoming:
+        window_start = max(window_start, datetime.utcnow())
+    
+    # Single events in the window
+    singles = _singles_in_window(query, model, upcoming, from_, to, window_start)
+    if from_ and not upcoming and model is models.Event and partitioned_engine(db.get_bind()):
+        singles = singles.filter(model.starts_at >= earliest_overlapping(db, org_id, from_))
+    singles = singles.limit(skip + limit).all()
+    
+    # Recurring series that may have occurrences in the window
+    series = query.options(selectinload(model.exceptions)).filter(
+        model.rrule.isnot(None),
+        model.recurrence_until.is_(None) | (model.recurrence_until >= window_start)
+    )
+    if to:
+        series = series.filter(model.starts_at < to)
+    
+    # Expand lazily and stop once the requested page is filled
+    events = merge_occurrences(singles, series.all(), window_start, to, include_ongoing)
+    return list(islice(events, skip, skip + limit))
+
 @router.get("/", response_model=List[schemas.EventResponse])
+@query_budget(8)
 async def list_events(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     q: Optional[str] = None,
     upcoming: Optional[bool] = None,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    include_archived: bool = False,
     current_user = Depends(get_current_user),
     current_org = Depends(get_current_org),
     db: Session = Depends(get_db)
 ):
     """List all events for the current organization"""
-    query = db.query(models.Event).options(
-        joinedload(models.Event.case).joinedload(models.Case.client)
-    ).filter(
-        models.Event.org_id == current_org.id
-    )
-    
-    # Search filter
-    if q:
-        query = query.filter(
-            models.Event.title.contains(q) |
-            models.Event.location.contains(q)
+    from_, to = naive_utc(from_), naive_utc(to)
+    if from_ and to and from_ >= to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'from' must be before 'to'"
         )
     
-    # Upcoming filter
-    if upcoming:
-        query = query.filter(models.Event.starts_at >= datetime.utcnow())
-    
-    # Order by start date
-    query = query.order_by(models.Event.starts_at)
+    if not include_archived:
+        return _list_window(db, models.Event, current_org.id, q, upcoming, from_, to, skip, limit)
     
-    events = query.offset(skip).limit(limit).all()
-    return events
+    # Merge both tables' first skip + limit events, then page
+    pages = [
+        _list_window(db, model, current_org.id, q, upcoming, from_, to, 0, skip + limit)
+        for model in (models.Event, models.ArchivedEvent)
+    ]
+    return list(islice(heapq.merge(*pages, key=lambda e: e.starts_at), skip, skip + limit))
 
 @router.post("/", response_model=schemas.EventResponse)
 async def create_event(
     event_data: schemas.EventCreate,
+    on_conflict: Optional[str] = Query(None, pattern="^(warn|reject)$"),
     current_user = Depends(get_current_user),
     current_org = Depends(get_current_org),
     db: Session = Depends(get_db)
@@ -68,22 +197,179 @@ async def create_event(
     new_event = models.Event(
         user_id=current_user.id,
         org_id=current_org.id,
-        **event_data.dict()
+        **naive_utc_fields(event_data.dict())
     )
+    _apply_recurrence(new_event)
+    conflicts = _check_conflicts(db, new_event, on_conflict)
+    
     db.add(new_event)
     db.commit()
     db.refresh(new_event)
+    _publish_change(db, new_event)
     
     # Load relationships
     new_event = db.query(models.Event).options(
         joinedload(models.Event.case).joinedload(models.Case.client)
     ).filter(models.Event.id == new_event.id).first()
+    new_event.conflicts = conflicts
     
     return new_event
 
+@router.get("/availability", response_model=schemas.AvailabilityResponse)
+async def get_availability(
+    users: str = Query(..., description="Comma-separated user ids"),
+    from_: datetime = Query(..., alias="from"),
+    to: datetime = Query(...),
+    duration: int = Query(30, ge=1, le=1440, description="Slot length in minutes"),
+    current_user = Depends(get_current_user),
+    current_org = Depends(get_current_org),
+    db: Session = Depends(get_db)
+):
+    """Busy times of the given org members and the slots when all of them are free"""
+    from_, to = naive_utc(from_), naive_utc(to)
+    try:
+        user_ids = sorted({int(u) for u in users.split(",") if u.strip()})
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'users' must be a comma-separated list of user ids"
+        )
+    
+    if not 1 <= len(user_ids) <= MAX_USERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {MAX_USERS} users are required"
+        )
+    
+    if from_ >= to or to - from_ > MAX_WINDOW:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"'from' must be before 'to' and the window at most {MAX_WINDOW.days} days"
+        )
+    
+    members = {user_id for (user_id,) in db.query(models.Membership.user_id).filter(
+        models.Membership.org_id == current_org.id,
+        models.Membership.user_id.in_(user_ids)
+    )}
+    if len(members) != len(user_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Users not found or don't belong to your organization"
+        )
+    
+    busy = availability_cache.get(
+        current_org.id, from_, to, user_ids,
+        lambda missing: load_busy(db, current_org.id, missing, from_, to)
+    )
+    slots = free_slots(union_busy(busy[u] for u in user_ids), from_, to, timedelta(minutes=duration))
+    
+    return {
+        "starts_at": from_,
+        "ends_at": to,
+        "duration_minutes": duration,
+        "users": [
+            {"user_id": u, "busy": [{"starts_at": s, "ends_at": e} for s, e in busy[u]]}
+            for u in user_ids
+        ],
+        "slots": [{"starts_at": s, "ends_at": e} for s, e in slots]
+    }
+
+def _feed_membership(directory: Session, user_id: int, org_id: int) -> Optional[models.Membership]:
+    return directory.query(models.Membership).filter(
+        models.Membership.user_id == user_id,
+        models.Membership.org_id == org_id
+    ).first()
+
+def _feed_url(request: Request, membership: models.Membership) -> dict:
+    token = create_feed_token(membership.user_id, membership.org_id, membership.feed_version)
+    return {"url": f"{request.url_for('get_feed')}?token={token}"}
+
+@router.get("/feed")
+async def get_feed_url(
+    request: Request,
+    current_user = Depends(get_current_user),
+    current_org = Depends(get_current_org),
+    directory: Session = Depends(get_directory_db)
+):
+    """Get the iCalendar subscription URL for the current user"""
+    membership = _feed_membership(directory, current_user.id, current_org.id)
+    if membership is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not a member of this organization"
+        )
+    return _feed_url(request, membership)
+
+@router.post("/feed/rotate")
+async def rotate_feed_url(
+    request: Request,
+    current_user = Depends(get_current_user),
+    current_org = Depends(get_current_org),
+    directory: Session = Depends(get_directory_db)
+):
+    """Revoke the current user's feed URLs and return a new one"""
+    membership = _feed_membership(directory, current_user.id, current_org.id)
+    if membership is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not a member of this organization"
+        )
+    membership.feed_version += 1
+    directory.commit()
+    return _feed_url(request, membership)
+
+@router.get("/feed.ics")
+async def get_feed(
+    token: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    directory: Session = Depends(get_directory_db)
+):
+    """iCalendar feed of the user's events, for calendar app subscriptions"""
+    payload = decode_token(token)
+    if payload is None or payload.get("scope") != "calendar":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid feed token"
+        )
+    
+    user_id = payload["user_id"]
+    org_id = payload["org_id"]
+    
+    # Revoked when the user leaves the org or rotates the feed URL
+    membership = _feed_membership(directory, user_id, org_id)
+    if membership is None or membership.feed_version != payload.get("ver", 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid feed token"
+        )
+    
+    def load_events():
+        return db.query(models.Event).options(
+            selectinload(models.Event.exceptions)
+        ).filter(
+            models.Event.user_id == user_id,
+            models.Event.org_id == org_id,
+            (models.Event.starts_at >= feed_window_start()) | (
+                models.Event.rrule.isnot(None) & (
+                    models.Event.recurrence_until.is_(None) |
+                    (models.Event.recurrence_until >= feed_window_start())
+                )
+            )
+        ).all()
+    
+    body, etag = feed_cache.get(user_id, org_id, load_events)
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=300"}
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=body, media_type="text/calendar; charset=utf-8", headers=headers)
+
 @router.get("/{event_id}", response_model=schemas.EventResponse)
 async def get_event(
     event_id: int,
+    include_archived: bool = False,
     current_user = Depends(get_current_user),
     current_org = Depends(get_current_org),
     db: Session = Depends(get_db)
@@ -96,6 +382,14 @@ async def get_event(
         models.Event.org_id == current_org.id
     ).first()
     
+    if not event and include_archived:
+        event = db.query(models.ArchivedEvent).options(
+            joinedload(models.ArchivedEvent.case).joinedload(models.ArchivedCase.client)
+        ).filter(
+            models.ArchivedEvent.id == event_id,
+            models.ArchivedEvent.org_id == current_org.id
+        ).first()
+    
     if not event:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -108,6 +402,7 @@ async def get_event(
 async def update_event(
     event_id: int,
     event_data: schemas.EventUpdate,
+    on_conflict: Optional[str] = Query(None, pattern="^(warn|reject)$"),
     current_user = Depends(get_current_user),
     current_org = Depends(get_current_org),
     db: Session = Depends(get_db)
@@ -139,17 +434,29 @@ async def update_event(
                 )
     
     # Update fields
-    update_data = event_data.dict(exclude_unset=True)
+    schedule = (event.rrule, event.starts_at)
+    update_data = naive_utc_fields(event_data.dict(exclude_unset=True))
     for field, value in update_data.items():
         setattr(event, field, value)
+    _apply_recurrence(event)
+    
+    # Exceptions refer to original occurrence starts of the old schedule
+    if (event.rrule, event.starts_at) != schedule:
+        event.exceptions.clear()
+    
+    conflicts = []
+    if {"starts_at", "ends_at", "location", "rrule"} & update_data.keys():
+        conflicts = _check_conflicts(db, event, on_conflict, exclude_id=event.id)
     
     db.commit()
     db.refresh(event)
+    _publish_change(db, event)
     
     # Load relationships
     event = db.query(models.Event).options(
         joinedload(models.Event.case).joinedload(models.Case.client)
     ).filter(models.Event.id == event_id).first()
+    event.conflicts = conflicts
     
     return event
 
@@ -174,5 +481,75 @@ async def delete_event(
     
     db.delete(event)
     db.commit()
+    _publish_change(db, event, deleted=True)
     
     return {"message": "Event deleted successfully"}
+
+def _get_occurrence_exception(db: Session, event_id: int, org_id: int, recurrence_id: datetime):
+    """Load a series and the (possibly new) exception row for one of its occurrences"""
+    event = db.query(models.Event).filter(
+        models.Event.id == event_id,
+        models.Event.org_id == org_id
+    ).first()
+    
+    if not event:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found"
+        )
+    
+    if not event.rrule or not is_occurrence(parse_rrule(event.rrule), event.starts_at, recurrence_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Occurrence not found"
+        )
+    
+    exception = next((e for e in event.exceptions if e.original_start == recurrence_id), None)
+    if exception is None:
+        exception = models.EventException(original_start=recurrence_id, cancelled=False)
+        event.exceptions.append(exception)
+    
+    return event, exception
+
+@router.put("/{event_id}/occurrences/{recurrence_id}", response_model=schemas.EventResponse)
+async def update_occurrence(
+    event_id: int,
+    recurrence_id: datetime,
+    occurrence_data: schemas.EventOccurrenceUpdate,
+    current_user = Depends(get_current_user),
+    current_org = Depends(get_current_org),
+    db: Session = Depends(get_db)
+):
+    """Edit a single occurrence of a recurring event"""
+    recurrence_id = naive_utc(recurrence_id)
+    event, exception = _get_occurrence_exception(db, event_id, current_org.id, recurrence_id)
+    
+    update_data = naive_utc_fields(occurrence_data.dict(exclude_unset=True))
+    for field, value in update_data.items():
+        setattr(exception, field, value)
+    exception.cancelled = False
+    
+    db.commit()
+    db.refresh(event)
+    _publish_change(db, event)
+    
+    return Occurrence(event, recurrence_id, exception)
+
+@router.delete("/{event_id}/occurrences/{recurrence_id}")
+async def cancel_occurrence(
+    event_id: int,
+    recurrence_id: datetime,
+    current_user = Depends(get_current_user),
+    current_org = Depends(get_current_org),
+    db: Session = Depends(get_db)
+):
+    """Cancel a single occurrence of a recurring event"""
+    recurrence_id = naive_utc(recurrence_id)
+    event, exception = _get_occurrence_exception(db, event_id, current_org.id, recurrence_id)
+    exception.cancelled = True
+    
+    db.commit()
+    db.refresh(event)
+    _publish_change(db, event)
+    
+    return {"message": "Occurrence cancelled successfully"}
@@ -0,0 +1,93 @@
+"""Background job status routes"""
+
+import os
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from typing import List
+from app.database import get_db
+from app import models, schemas
+from app.deps import get_current_user, get_current_org
+from app.jobs import JOBS_OUTPUT_DIR
+
+router = APIRouter()
+
+# Kinds whose results only owners and admins may see (an org export holds every member's data)
+ADMIN_JOB_KINDS = {"org_export"}
+
+def _is_admin(current_user) -> bool:
+    return current_user.current_role in (models.RoleEnum.owner.value, models.RoleEnum.admin.value)
+
+def _get_job(db: Session, job_id: int, org_id: int, current_user) -> models.Job:
+    job = db.query(models.Job).filter(
+        models.Job.id == job_id,
+        models.Job.org_id == org_id
+    ).first()
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    # Members only see their own jobs, and never admin-only kinds
+    if not _is_admin(current_user) and (job.kind in ADMIN_JOB_KINDS or job.user_id != current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    
+    return job
+
+@router.get("/", response_model=List[schemas.JobResponse])
+async def list_jobs(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    current_user = Depends(get_current_user),
+    current_org = Depends(get_current_org),
+    db: Session = Depends(get_db)
+):
+    """List the current organization's recent jobs (a member's own jobs unless admin)"""
+    query = db.query(models.Job).filter(models.Job.org_id == current_org.id)
+    if not _is_admin(current_user):
+        query = query.filter(
+            models.Job.user_id == current_user.id,
+            models.Job.kind.notin_(ADMIN_JOB_KINDS)
+        )
+    return query.order_by(models.Job.created_at.desc()).offset(skip).limit(limit).all()
+
+@router.get("/{job_id}", response_model=schemas.JobResponse)
+async def get_job(
+    job_id: int,
+    current_user = Depends(get_current_user),
+    current_org = Depends(get_current_org),
+    db: Session = Depends(get_db)
+):
+    """Get a job's status, for polling"""
+    return _get_job(db, job_id, current_org.id, current_user)
+
+@router.get("/{job_id}/download")
+async def download_job_result(
+    job_id: int,
+    current_user = Depends(get_current_user),
+    current_org = Depends(get_current_org),
+    db: Session = Depends(get_db)
+):
+    """Download the file produced by a finished job"""
+    job = _get_job(db, job_id, current_org.id, current_user)
+    
+    filename = (job.result or {}).get("file")
+    if job.status != models.JobStatusEnum.succeeded or not filename:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job has no file to download"
+        )
+    
+    path = os.path.join(JOBS_OUTPUT_DIR, os.path.basename(filename))
+    if not os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Job output is no longer available"
+        )
+    
+    return FileResponse(path, filename=os.path.basename(filename))
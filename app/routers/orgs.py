@@ -0,0 +1,36 @@
+"""Organization management routes"""
+
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from datetime import datetime
+from app.database import get_db
+from app import schemas
+from app.archive import iter_export
+from app.jobs import enqueue
+from app.deps import get_current_admin, get_current_org
+
+router = APIRouter()
+
+@router.get("/export")
+async def export_org(
+    current_user = Depends(get_current_admin),
+    current_org = Depends(get_current_org),
+    db: Session = Depends(get_db)
+):
+    """Stream a compressed archive of the current organization's data"""
+    filename = f"org-{current_org.id}-{datetime.utcnow():%Y%m%d%H%M%S}.tar.gz"
+    return StreamingResponse(
+        iter_export(db.get_bind(), current_org.id),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/export/jobs", response_model=schemas.JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def queue_org_export(
+    current_user = Depends(get_current_admin),
+    current_org = Depends(get_current_org),
+    db: Session = Depends(get_db)
+):
+    """Queue an archive export; poll /api/jobs/{id} and download it when done"""
+    return enqueue(db, "org_export", org_id=current_org.id, user_id=current_user.id)
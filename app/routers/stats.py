@@ -1,15 +1,25 @@
 """Statistics routes"""
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from datetime import datetime
 from app.database import get_db
 from app import models, schemas
 from app.deps import get_current_user, get_current_org
+from app.queries import query_budget
+from app.recurrence import UPCOMING_HORIZON, count_occurrences
 
 router = APIRouter()
 
+def _active_case_query(db: Session, org_id: int):
+    """Active cases of an org"""
+    return db.query(models.Case).filter(
+        models.Case.org_id == org_id,
+        models.Case.status == models.CaseStatusEnum.active
+    )
+
 @router.get("/", response_model=schemas.StatsResponse)
+@query_budget(7)
 async def get_stats(
     current_user = Depends(get_current_user),
     current_org = Depends(get_current_org),
@@ -27,17 +37,28 @@ async def get_stats(
     ).count()
     
     # Count active cases
-    active_cases = db.query(models.Case).filter(
-        models.Case.org_id == current_org.id,
-        models.Case.status == models.CaseStatusEnum.active
-    ).count()
+    active_cases = _active_case_query(db, current_org.id).count()
     
     # Count upcoming events
+    now = datetime.utcnow()
     upcoming_events = db.query(models.Event).filter(
         models.Event.org_id == current_org.id,
-        models.Event.starts_at >= datetime.utcnow()
+        models.Event.rrule.is_(None),
+        models.Event.starts_at >= now
     ).count()
     
+    # Recurring series count their occurrences up to a fixed horizon
+    horizon = now + UPCOMING_HORIZON
+    series = db.query(models.Event).options(
+        selectinload(models.Event.exceptions)
+    ).filter(
+        models.Event.org_id == current_org.id,
+        models.Event.rrule.isnot(None),
+        models.Event.starts_at < horizon,
+        models.Event.recurrence_until.is_(None) | (models.Event.recurrence_until >= now)
+    ).all()
+    upcoming_events += count_occurrences(series, now, horizon, include_ongoing=False)
+    
     return {
         "total_clients": total_clients,
         "total_cases": total_cases,
@@ -0,0 +1,37 @@
+"""Server-Sent Events change stream"""
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db
+from app.deps import user_from_token
+from app.stream import change_hub
+
+router = APIRouter()
+
+@router.get("/")
+async def stream_changes(
+    request: Request,
+    access_token: Optional[str] = Query(None, description="For EventSource, which cannot send headers"),
+    db: Session = Depends(get_db)
+):
+    """Stream change notifications (entity, id, op, version) for the current organization"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    token = token if scheme.lower() == "bearer" and token else access_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    org_id = user_from_token(token, db).current_org_id
+    # Release the connection; the stream itself never touches the database
+    db.close()
+    
+    return StreamingResponse(
+        change_hub.subscribe(org_id, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
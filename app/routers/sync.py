@@ -0,0 +1,48 @@
+"""Delta sync routes"""
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db
+from app import schemas
+from app.deps import get_current_user, get_current_org
+from app.queries import query_budget
+from app.sync import Cursor, changes_since
+
+router = APIRouter()
+
+@router.get("/", response_model=schemas.SyncResponse)
+@query_budget(7)
+async def sync(
+    since: Optional[str] = Query(None, description="'next' of the previous response; omit for a full sync"),
+    limit: int = Query(500, ge=1, le=1000),
+    current_user = Depends(get_current_user),
+    current_org = Depends(get_current_org),
+    db: Session = Depends(get_db)
+):
+    """Clients, cases and events changed or deleted since a sync token"""
+    if since is None:
+        cursor = Cursor.start(current_org.sync_version)
+    else:
+        try:
+            cursor = Cursor.decode(since)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        if current_org.sync_pruned_version > max(cursor.version, cursor.floor):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Sync token expired, sync again without 'since'"
+            )
+
+    page = changes_since(db, current_org.id, cursor, limit)
+    return {
+        "clients": page.clients,
+        "cases": page.cases,
+        "events": page.events,
+        "deleted": [{"entity": t.entity, "id": t.entity_id} for t in page.deleted],
+        "next": page.next.encode(),
+        "has_more": page.has_more,
+    }
@@ -0,0 +1,47 @@
+"""Calendar range helpers shared by the event routes"""
+
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from app import models
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Request datetimes as stored: offsets converted to UTC and dropped, naive ones taken as UTC"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def naive_utc_fields(data: dict) -> dict:
+    """Apply naive_utc to the start and end of a request body's dict"""
+    for field in ("starts_at", "ends_at"):
+        if data.get(field) is not None:
+            data[field] = naive_utc(data[field])
+    return data
+
+def overlaps_range(start: datetime, end: datetime, model=models.Event):
+    """Filter for events overlapping the half-open window [start, end)
+
+    An event overlaps when it starts before the window ends and either ends
+    after the window starts or starts inside it (events without ``ends_at``
+    are instants). Both branches are plain range conditions, so they can use
+    the ``(org_id, starts_at)`` and ``(org_id, ends_at)`` indexes.
+    """
+    return (model.starts_at < end) & or_(
+        model.ends_at > start,
+        model.starts_at >= start
+    )
+
+def earliest_overlapping(db: Session, org_id: int, start: datetime, model=models.Event) -> datetime:
+    """Lower bound on starts_at of an org's events overlapping anything after ``start``
+
+    Filtering on it changes no result, but gives Postgres a starts_at range
+    to prune monthly partitions with (see app/partitions.py). Finding the
+    events that straddle ``start`` is one (org_id, ends_at) index probe.
+    """
+    straddling = db.query(func.min(model.starts_at)).filter(
+        model.org_id == org_id,
+        model.starts_at < start,
+        model.ends_at > start
+    ).scalar()
+    return straddling or start
@@ -23,6 +23,12 @@ class CaseStatusEnum(str, Enum):
     pending = "pending"
     closed = "closed"
 
+class JobStatusEnum(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
 # User Schemas
 class UserRegister(BaseModel):
     email: EmailStr
@@ -116,6 +122,7 @@ class CaseResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     client: Optional[ClientResponse] = None
+    archived_at: Optional[datetime] = None  # Set for cases read from the archive
     
     class Config:
         from_attributes = True
@@ -128,6 +135,7 @@ class EventCreate(BaseModel):
     starts_at: datetime
     ends_at: Optional[datetime] = None
     location: Optional[str] = None
+    rrule: Optional[str] = None  # e.g. "FREQ=WEEKLY;BYDAY=MO;COUNT=10"
 
 class EventUpdate(BaseModel):
     case_id: Optional[int] = None
@@ -136,6 +144,37 @@ class EventUpdate(BaseModel):
     starts_at: Optional[datetime] = None
     ends_at: Optional[datetime] = None
     location: Optional[str] = None
+    rrule: Optional[str] = None
+
+class EventOccurrenceUpdate(BaseModel):
+    title: Optional[str] = None
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    location: Optional[str] = None
+
+class EventConflict(BaseModel):
+    id: int
+    title: str
+    starts_at: datetime
+    ends_at: Optional[datetime]
+    location: Optional[str]
+    recurrence_id: Optional[datetime] = None
+    reason: str  # "user" or "location"
+
+class TimeSlot(BaseModel):
+    starts_at: datetime
+    ends_at: datetime
+
+class UserBusy(BaseModel):
+    user_id: int
+    busy: List[TimeSlot]
+
+class AvailabilityResponse(BaseModel):
+    starts_at: datetime
+    ends_at: datetime
+    duration_minutes: int
+    users: List[UserBusy]
+    slots: List[TimeSlot]
 
 class EventResponse(BaseModel):
     id: int
@@ -145,8 +184,12 @@ class EventResponse(BaseModel):
     starts_at: datetime
     ends_at: Optional[datetime]
     location: Optional[str]
+    rrule: Optional[str] = None
+    recurrence_id: Optional[datetime] = None  # Original start of an expanded occurrence
     created_at: datetime
     case: Optional[CaseResponse] = None
+    conflicts: Optional[List[EventConflict]] = None  # Scheduling warnings on create/update
+    archived_at: Optional[datetime] = None  # Set for events read from the archive
     
     class Config:
         from_attributes = True
@@ -158,6 +201,64 @@ class StatsResponse(BaseModel):
     active_cases: int
     upcoming_events: int
 
+# Job Schema
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: JobStatusEnum
+    priority: int
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+# Audit Schema
+class AuditLogResponse(BaseModel):
+    id: int
+    user_id: Optional[int]
+    entity: str
+    entity_id: int
+    action: str
+    changes: dict
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+# Sync Schemas
+class EventExceptionResponse(BaseModel):
+    original_start: datetime
+    cancelled: bool
+    title: Optional[str]
+    starts_at: Optional[datetime]
+    ends_at: Optional[datetime]
+    location: Optional[str]
+    
+    class Config:
+        from_attributes = True
+
+class SyncEventResponse(EventResponse):
+    exceptions: List[EventExceptionResponse] = []
+
+class SyncDeleted(BaseModel):
+    entity: str
+    id: int
+
+class SyncResponse(BaseModel):
+    clients: List[ClientResponse]
+    cases: List[CaseResponse]
+    events: List[SyncEventResponse]
+    deleted: List[SyncDeleted]  # Apply before the changed rows
+    next: str  # Pass as 'since' on the next call
+    has_more: bool
+
 # Me Response
 class MeResponse(BaseModel):
     user: UserResponse
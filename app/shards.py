@@ -0,0 +1,478 @@
+"""Org-based sharding across several databases
+
+``DATABASE_URL`` is the directory: it holds users, orgs, memberships and the
+``org_shards`` map, and is also the ``default`` shard. ``DATABASE_SHARDS``
+names further databases with the full schema
+(``big=postgresql://...,eu=postgresql://...``). Each org's tenant rows live
+on one shard together with copies of its org row, memberships and member
+users, so foreign keys, ``get_current_user`` and delta sync versions work
+there unchanged. ``get_db`` opens the session on the shard of the org in
+the request's token; the map is cached for SHARD_MAP_TTL seconds per
+process.
+
+An org is moved while it stays online:
+
+1. its rows are copied to the target in id order, noting the org's sync
+   version first;
+2. rows changed or deleted since (by ``sync_version`` and tombstones) are
+   copied again until little is left;
+3. the source copy of the org is fenced by setting ``orgs.moved_to`` in a
+   transaction that holds the org row, the last changes are copied, and
+   the map is switched. Writes blocked on the org row, or routed by a stale
+   map, then fail in ``next_version`` or ``get_current_org`` with 503 and
+   succeed on retry.
+
+The source rows stay until ``purge``, run once every process has reloaded
+the map. Moved rows keep their ids; on Postgres ``init`` gives every shard
+its own id range so they cannot collide (SQLite shards only detect it).
+
+Usage:
+    python -m app.shards list
+    python -m app.shards init
+    python -m app.shards move --org-id 3 --to big [--batch-size 1000]
+    python -m app.shards purge --org-id 3 --shard default
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, delete, func, insert, select, text, union, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from app import models
+
+DEFAULT_SHARD = "default"
+SHARD_MAP_TTL = float(os.getenv("SHARD_MAP_TTL", "30"))
+BATCH_SIZE = 1000
+# Catch-up rounds stop once a round copies fewer rows than this
+CUTOVER_ROWS = 500
+MAX_CATCH_UP_ROUNDS = 10
+# Ids per shard on Postgres; shard N allocates from N * SHARD_ID_SPAN
+SHARD_ID_SPAN = 2 ** 27
+# Append-only rows committed out of id order by at most this much are still found at cut-over
+APPEND_RECHECK_IDS = 10000
+
+# Live tables with sync versions, their archive tables, and child tables keyed by event_id
+VERSIONED = [("clients", None), ("cases", "cases_archive"), ("events", "events_archive")]
+EVENT_CHILDREN = [("event_exceptions", "event_exceptions_archive"), ("reminder_deliveries", None)]
+APPEND_ONLY = ["audit_log", "sync_tombstones", "reminder_deliveries"]
+SEQUENCE_TABLES = ["clients", "cases", "events", "event_exceptions", "reminder_deliveries",
+                   "jobs", "audit_log", "sync_tombstones"]
+
+
+class OrgMoved(Exception):
+    """Write to a shard's copy of an org that has moved elsewhere"""
+
+    def __init__(self, org_id: int, shard: str):
+        super().__init__(f"Org {org_id} moved to shard {shard}")
+        self.org_id = org_id
+        self.shard = shard
+
+
+class ShardMoveError(Exception):
+    pass
+
+
+def parse_shards(spec: str) -> Dict[str, str]:
+    """``name=url,name=url`` as a dict"""
+    shards = {}
+    for part in spec.split(","):
+        if part.strip():
+            name, _, url = part.partition("=")
+            shards[name.strip()] = url.strip().replace("postgres://", "postgresql://", 1)
+    return shards
+
+
+def _table(name: str):
+    return models.Base.metadata.tables[name]
+
+
+def _org_filter(name: str, org_id: int):
+    """One org's rows of a table"""
+    table = _table(name)
+    if name in ("event_exceptions", "reminder_deliveries"):
+        events = _table("events")
+        return table.c.event_id.in_(select(events.c.id).where(events.c.org_id == org_id))
+    if name == "event_exceptions_archive":
+        events = _table("events_archive")
+        return table.c.event_id.in_(select(events.c.id).where(events.c.org_id == org_id))
+    return table.c.org_id == org_id
+
+
+def _org_users(org_id: int, authors: bool = False):
+    """Members of an org, optionally with everyone who authored its rows"""
+    tables = ["memberships"] + (["clients", "cases", "events"] if authors else [])
+    referenced = union(*[
+        select(_table(name).c.user_id).where(_table(name).c.org_id == org_id) for name in tables
+    ]).subquery()
+    return _table("users").c.id.in_(select(referenced.c.user_id))
+
+
+def _chunks(ids: List[int], size: int = 500) -> Iterator[List[int]]:
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def _copy_rows(src, dst, name: str, where, batch_size: int = BATCH_SIZE, after_id: int = 0,
+               skip_existing: bool = False) -> Tuple[int, int]:
+    """Copy matching rows in id order; returns (rows copied, highest id seen)"""
+    table = _table(name)
+    copied, last = 0, after_id
+    while True:
+        rows = [dict(row._mapping) for row in src.execute(
+            select(table).where(where, table.c.id > last).order_by(table.c.id).limit(batch_size)
+        )]
+        if not rows:
+            return copied, last
+        last = rows[-1]["id"]
+        if skip_existing:
+            present = set(dst.execute(select(table.c.id).where(
+                table.c.id.in_([row["id"] for row in rows])
+            )).scalars())
+            rows = [row for row in rows if row["id"] not in present]
+        if rows:
+            try:
+                dst.execute(insert(table), rows)
+            except IntegrityError as e:
+                raise ShardMoveError(f"Id conflict copying {name}; run 'init' on Postgres shards") from e
+            copied += len(rows)
+
+
+def _copy_ids(src, dst, name: str, ids: List[int], column: str = "id") -> int:
+    table = _table(name)
+    copied = 0
+    for chunk in _chunks(ids):
+        rows = [dict(row._mapping) for row in src.execute(select(table).where(table.c[column].in_(chunk)))]
+        if rows:
+            dst.execute(insert(table), rows)
+            copied += len(rows)
+    return copied
+
+
+def _delete_ids(conn, name: str, ids: List[int], column: str = "id"):
+    table = _table(name)
+    for chunk in _chunks(ids):
+        conn.execute(delete(table).where(table.c[column].in_(chunk)))
+
+
+def copy_org_row(src, dst, org_id: int, authors: bool = False):
+    """Copy the org row, its users and memberships; the copy is not fenced"""
+    orgs = _table("orgs")
+    org = dict(src.execute(select(orgs).where(orgs.c.id == org_id)).one()._mapping)
+    org["moved_to"] = None
+    if dst.execute(select(orgs.c.id).where(orgs.c.id == org_id)).first():
+        dst.execute(update(orgs).where(orgs.c.id == org_id).values(**org))
+    else:
+        dst.execute(insert(orgs), [org])
+    _copy_rows(src, dst, "users", _org_users(org_id, authors), skip_existing=True)
+    dst.execute(delete(_table("memberships")).where(_table("memberships").c.org_id == org_id))
+    _copy_rows(src, dst, "memberships", _table("memberships").c.org_id == org_id)
+
+
+def copy_changes(src, dst, org_id: int, since: int) -> Tuple[int, int]:
+    """Replace rows changed or deleted after version ``since``
+
+    Returns the version the copy is complete up to and the number of rows
+    replaced. Archived and restored rows show up as tombstones and changes,
+    so the archive tables are brought along too.
+    """
+    orgs = _table("orgs")
+    tombstones = _table("sync_tombstones")
+    upto = src.execute(select(orgs.c.sync_version).where(orgs.c.id == org_id)).scalar()
+
+    touched: Dict[str, List[int]] = {}
+    for name, _ in VERSIONED:
+        table = _table(name)
+        changed = set(src.execute(select(table.c.id).where(
+            table.c.org_id == org_id, table.c.sync_version > since
+        )).scalars())
+        changed.update(src.execute(select(tombstones.c.entity_id).where(
+            tombstones.c.org_id == org_id, tombstones.c.entity == name, tombstones.c.version > since
+        )).scalars())
+        touched[name] = sorted(changed)
+
+    event_ids = touched["events"]
+    for child, archive in EVENT_CHILDREN:
+        for name in filter(None, (child, archive)):
+            _delete_ids(dst, name, event_ids, column="event_id")
+    for name, archive in reversed(VERSIONED):
+        for table_name in filter(None, (name, archive)):
+            _delete_ids(dst, table_name, touched[name])
+
+    copied = 0
+    for name, archive in VERSIONED:
+        for table_name in filter(None, (name, archive)):
+            copied += _copy_ids(src, dst, table_name, touched[name])
+    for child, archive in EVENT_CHILDREN:
+        for name in filter(None, (child, archive)):
+            copied += _copy_ids(src, dst, name, event_ids, column="event_id")
+    return upto, copied
+
+
+def purge_org(bind, org_id: int, directory: bool, batch_size: int = BATCH_SIZE) -> int:
+    """Delete an org's rows from a shard in batches; the directory keeps its org row"""
+    order = ["reminder_deliveries", "event_exceptions", "event_exceptions_archive", "events_archive",
+             "events", "cases_archive", "cases", "clients", "jobs", "audit_log", "sync_tombstones"]
+    if not directory:
+        order += ["memberships", "org_shards"]
+    deleted = 0
+    for name in order:
+        table = _table(name)
+        key = table.c.org_id if name == "org_shards" else table.c.id
+        where = _org_filter(name, org_id)
+        while True:
+            with bind.begin() as conn:
+                ids = list(conn.execute(select(key).where(where).limit(batch_size)).scalars())
+                if not ids:
+                    break
+                conn.execute(delete(table).where(key.in_(ids)))
+                deleted += len(ids)
+    if not directory:
+        with bind.begin() as conn:
+            conn.execute(delete(_table("orgs")).where(_table("orgs").c.id == org_id))
+    return deleted
+
+
+class ShardMap:
+    """Engines of the database shards and the cached org to shard map"""
+
+    def __init__(self, urls: Dict[str, str], default_engine=None, ttl: float = SHARD_MAP_TTL,
+                 get_default_engine: Optional[Callable[[], object]] = None):
+        self.urls = dict(urls)
+        self.ttl = ttl
+        self._engines = {}
+        self._sessions = {}
+        self._cache: Dict[int, Tuple[str, float]] = {}
+        self._get_default_engine = get_default_engine
+        if default_engine is not None:
+            self._engines[DEFAULT_SHARD] = default_engine
+        elif get_default_engine is None and DEFAULT_SHARD not in self.urls:
+            raise ValueError("The default shard needs a URL or an engine")
+
+    @property
+    def names(self) -> List[str]:
+        return [DEFAULT_SHARD] + [name for name in self.urls if name != DEFAULT_SHARD]
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.names) > 1
+
+    def engine(self, name: str = DEFAULT_SHARD):
+        if name not in self._engines:
+            if name == DEFAULT_SHARD and self._get_default_engine is not None:
+                self._engines[name] = self._get_default_engine()
+            elif name not in self.urls:
+                raise KeyError(f"Unknown shard: {name}")
+            else:
+                self._engines[name] = create_engine(self.urls[name])
+        return self._engines[name]
+
+    def engines(self) -> Dict[str, object]:
+        return {name: self.engine(name) for name in self.names}
+
+    def session(self, name: str = DEFAULT_SHARD):
+        if name not in self._sessions:
+            self._sessions[name] = sessionmaker(autocommit=False, autoflush=False, bind=self.engine(name))
+        return self._sessions[name]()
+
+    def shard_for(self, org_id: Optional[int]) -> str:
+        """Shard holding an org's data, from the directory at most ttl seconds ago"""
+        if org_id is None or not self.sharded:
+            return DEFAULT_SHARD
+        cached = self._cache.get(org_id)
+        now = time.monotonic()
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        with self.engine().connect() as conn:
+            shard = conn.execute(
+                select(models.OrgShard.shard).where(models.OrgShard.org_id == org_id)
+            ).scalar() or DEFAULT_SHARD
+        self._cache[org_id] = (shard, now + self.ttl)
+        return shard
+
+    def invalidate(self, org_id: Optional[int] = None):
+        if org_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(org_id, None)
+
+    def session_for(self, request: Request):
+        """Session on the shard of the org in the request's access token"""
+        if not self.sharded:
+            return self.session()
+        return self.session(self.shard_for(request_org_id(request)))
+
+    def move_org(self, org_id: int, target: str, batch_size: int = BATCH_SIZE, log=print) -> dict:
+        """Move an org's data to ``target`` while it stays in use"""
+        source = self.shard_for_fresh(org_id)
+        if source == target:
+            return {"org_id": org_id, "shard": target, "copied": 0}
+        src_engine, dst_engine = self.engine(source), self.engine(target)
+        orgs = _table("orgs")
+        started = time.perf_counter()
+
+        with src_engine.connect() as src:
+            org = src.execute(select(orgs.c.moved_to).where(orgs.c.id == org_id)).first()
+        if org is None:
+            raise ShardMoveError(f"Org {org_id} not found on {source}")
+        moved_to = org.moved_to
+        if moved_to not in (None, target):
+            raise ShardMoveError(f"Org {org_id} is fenced on {source} for a move to {moved_to}")
+
+        copied = 0
+        if moved_to is None:
+            # Rows left on the target by an earlier move or an interrupted run are stale
+            purge_org(dst_engine, org_id, directory=target == DEFAULT_SHARD, batch_size=batch_size)
+
+            with src_engine.connect() as src, dst_engine.begin() as dst:
+                since = src.execute(select(orgs.c.sync_version).where(orgs.c.id == org_id)).scalar()
+                copy_org_row(src, dst, org_id, authors=True)
+                for name in ["clients", "cases", "cases_archive", "events", "events_archive",
+                             "event_exceptions", "event_exceptions_archive", "jobs"] + APPEND_ONLY:
+                    rows, _ = _copy_rows(src, dst, name, _org_filter(name, org_id), batch_size)
+                    copied += rows
+            log(f"Copied {copied} rows of org {org_id} from {source} to {target}")
+
+            for _ in range(MAX_CATCH_UP_ROUNDS):
+                with src_engine.connect() as src, dst_engine.begin() as dst:
+                    since, rows = copy_changes(src, dst, org_id, since)
+                copied += rows
+                log(f"Caught up {rows} changed rows")
+                if rows < CUTOVER_ROWS:
+                    break
+
+            # Holding the org row stops new versions until the map is switched
+            with src_engine.begin() as src:
+                src.execute(update(orgs).where(orgs.c.id == org_id).values(moved_to=target))
+                with dst_engine.begin() as dst:
+                    since, rows = copy_changes(src, dst, org_id, since)
+                    copy_org_row(src, dst, org_id)
+                    jobs = _table("jobs")
+                    dst.execute(delete(jobs).where(jobs.c.org_id == org_id))
+                    rows += _copy_rows(src, dst, "jobs", jobs.c.org_id == org_id, batch_size)[0]
+                    for name in APPEND_ONLY:
+                        table = _table(name)
+                        high = dst.execute(select(func.max(table.c.id)).where(_org_filter(name, org_id))).scalar()
+                        rows += _copy_rows(src, dst, name, _org_filter(name, org_id), batch_size,
+                                           after_id=max((high or 0) - APPEND_RECHECK_IDS, 0),
+                                           skip_existing=True)[0]
+                copied += rows
+
+        with self.engine().begin() as conn:
+            shards = models.OrgShard.__table__
+            conn.execute(delete(shards).where(shards.c.org_id == org_id))
+            if target != DEFAULT_SHARD:
+                conn.execute(insert(shards), [{"org_id": org_id, "shard": target, "moved_at": datetime.utcnow()}])
+        self.invalidate(org_id)
+        log(f"Org {org_id} now on {target} ({time.perf_counter() - started:.1f}s)")
+        return {"org_id": org_id, "shard": target, "source": source, "copied": copied}
+
+    def shard_for_fresh(self, org_id: int) -> str:
+        self.invalidate(org_id)
+        return self.shard_for(org_id)
+
+    def purge(self, org_id: int, shard: str, batch_size: int = BATCH_SIZE) -> int:
+        """Delete the stale copy of a moved org from ``shard``"""
+        if self.shard_for_fresh(org_id) == shard:
+            raise ShardMoveError(f"Org {org_id} lives on {shard}")
+        with self.engine().connect() as conn:
+            moved_at = conn.execute(
+                select(models.OrgShard.moved_at).where(models.OrgShard.org_id == org_id)
+            ).scalar()
+        if moved_at is not None and datetime.utcnow() - moved_at < timedelta(seconds=self.ttl):
+            raise ShardMoveError(f"Org {org_id} moved less than {self.ttl:.0f}s ago; cached maps may still route to {shard}")
+        return purge_org(self.engine(shard), org_id, directory=shard == DEFAULT_SHARD, batch_size=batch_size)
+
+    def init_id_ranges(self) -> List[str]:
+        """Move each Postgres shard's sequences into its own id range"""
+        changed = []
+        for index, name in enumerate(self.names):
+            engine = self.engine(name)
+            if engine.dialect.name != "postgresql" or index == 0:
+                continue
+            with engine.begin() as conn:
+                for table in SEQUENCE_TABLES:
+                    conn.execute(text(
+                        f"SELECT setval('{table}_id_seq', GREATEST((SELECT last_value FROM {table}_id_seq), :start))"
+                    ), {"start": index * SHARD_ID_SPAN})
+            changed.append(name)
+        return changed
+
+
+def request_org_id(request: Request) -> Optional[int]:
+    """Org of the token in the Authorization header or ``access_token``/``token`` query parameter"""
+    from app.auth import decode_token
+
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        token = request.query_params.get("access_token") or request.query_params.get("token")
+    payload = decode_token(token) if token else None
+    return payload.get("org_id") if payload else None
+
+
+async def org_moved_handler(request: Request, exc: OrgMoved):
+    """Answer writes that reached an org's old shard with a retryable 503"""
+    shard_map.invalidate(exc.org_id)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Organization is moving to another database, retry"},
+        headers={"Retry-After": "1"}
+    )
+
+
+def _default_map() -> ShardMap:
+    from app.database import get_engine
+    return ShardMap(parse_shards(os.getenv("DATABASE_SHARDS", "")), get_default_engine=get_engine)
+
+
+shard_map = _default_map()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage org database shards")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Orgs per shard")
+    commands.add_parser("init", help="Give each Postgres shard its own id range")
+    move_cmd = commands.add_parser("move", help="Move an org to another shard")
+    move_cmd.add_argument("--org-id", type=int, required=True)
+    move_cmd.add_argument("--to", required=True, choices=shard_map.names)
+    move_cmd.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    purge_cmd = commands.add_parser("purge", help="Delete a moved org's rows from its old shard")
+    purge_cmd.add_argument("--org-id", type=int, required=True)
+    purge_cmd.add_argument("--shard", required=True, choices=shard_map.names)
+    purge_cmd.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        with shard_map.engine().connect() as conn:
+            total = conn.execute(select(func.count()).select_from(models.Org.__table__)).scalar()
+            counts = dict(conn.execute(
+                select(models.OrgShard.shard, func.count()).group_by(models.OrgShard.shard)
+            ).all())
+        counts[DEFAULT_SHARD] = total - sum(counts.values())
+        for name in shard_map.names:
+            print(f"{name:>12}: {counts.get(name, 0)} orgs")
+    elif args.command == "init":
+        changed = shard_map.init_id_ranges()
+        print(f"✅ Set id ranges on {len(changed)} shards" + (f": {', '.join(changed)}" if changed else ""))
+    elif args.command == "move":
+        try:
+            result = shard_map.move_org(args.org_id, args.to, args.batch_size)
+        except ShardMoveError as e:
+            parser.exit(1, f"❌ {e}\n")
+        print(f"✅ Moved org {result['org_id']} to {result['shard']} ({result['copied']} rows)")
+    elif args.command == "purge":
+        try:
+            deleted = shard_map.purge(args.org_id, args.shard, args.batch_size)
+        except ShardMoveError as e:
+            parser.exit(1, f"❌ {e}\n")
+        print(f"✅ Deleted {deleted} rows of org {args.org_id} from {args.shard}")
+
+
+if __name__ == "__main__":
+    main()
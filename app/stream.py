@@ -0,0 +1,195 @@
+"""In-process change notifications for the SSE stream
+
+Committed changes to clients, cases and events are picked up from session
+events and published to ``change_hub``. Each org has a channel holding a
+bounded backlog of recent changes and one shared future that publishing
+resolves. Idle subscribers only await that future, so fan-out costs one
+wakeup per subscriber and no per-connection queues. A subscriber that falls
+behind the backlog, or resumes from an id of another process, is told to
+reset and refetch instead.
+
+Changes are only seen by subscribers connected to the worker that handled
+the write.
+"""
+
+import asyncio
+import json
+import secrets
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Deque, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+STREAM_BACKLOG = 1000  # Changes kept per org for resuming
+MAX_CHANNELS = 10000
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+# Streamed entity for each table; exceptions are changes to their event
+STREAM_TABLES = {"clients": "clients", "cases": "cases", "events": "events", "event_exceptions": "events"}
+
+
+class Change(NamedTuple):
+    version: int
+    entity: str
+    id: int
+    op: str
+
+
+class _Channel:
+    __slots__ = ("backlog", "floor", "waiter")
+
+    def __init__(self, floor: int):
+        self.backlog: Deque[Change] = deque(maxlen=STREAM_BACKLOG)
+        self.floor = floor  # Changes up to this version are no longer known
+        self.waiter: Optional[asyncio.Future] = None
+
+    def after(self, version: int) -> List[Change]:
+        newer = []
+        for change in reversed(self.backlog):
+            if change.version <= version:
+                break
+            newer.append(change)
+        newer.reverse()
+        return newer
+
+
+class ChangeHub:
+    """Per-org broadcast of committed changes to SSE subscribers"""
+
+    def __init__(self):
+        # Event ids are "<epoch>-<version>" so ids from another process are detected
+        self.epoch = secrets.token_hex(4)
+        self.version = 0
+        self._channels: "OrderedDict[int, _Channel]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._closed = False
+
+    async def stop(self):
+        # Let open streams finish so shutdown does not wait on them
+        self._closed = True
+        for channel in self._channels.values():
+            self._wake(channel)
+        self._loop = None
+
+    def publish(self, org_id: int, changes: Iterable[Tuple[str, int, str]]):
+        """Publish (entity, id, op) changes of an org; safe to call from any thread"""
+        loop = self._loop
+        if loop is None:
+            return
+        changes = list(changes)
+        try:
+            in_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            self._publish(org_id, changes)
+        else:
+            loop.call_soon_threadsafe(self._publish, org_id, changes)
+
+    def _channel(self, org_id: int) -> _Channel:
+        channel = self._channels.get(org_id)
+        if channel is None:
+            channel = self._channels[org_id] = _Channel(self.version)
+            if len(self._channels) > MAX_CHANNELS:
+                _, evicted = self._channels.popitem(last=False)
+                self._wake(evicted)
+        self._channels.move_to_end(org_id)
+        return channel
+
+    def _publish(self, org_id: int, changes: List[Tuple[str, int, str]]):
+        channel = self._channel(org_id)
+        for entity, entity_id, op in changes:
+            self.version += 1
+            if len(channel.backlog) == channel.backlog.maxlen:
+                channel.floor = channel.backlog[0].version
+            channel.backlog.append(Change(self.version, entity, entity_id, op))
+        self._wake(channel)
+
+    def _wake(self, channel: _Channel):
+        if channel.waiter is not None and not channel.waiter.done():
+            channel.waiter.set_result(None)
+        channel.waiter = None
+
+    def _resume_version(self, last_event_id: Optional[str]) -> Optional[int]:
+        epoch, _, version = (last_event_id or "").partition("-")
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        return int(version)
+
+    def _format(self, change: Change) -> str:
+        data = json.dumps({"entity": change.entity, "id": change.id, "op": change.op, "version": change.version})
+        return f"id: {self.epoch}-{change.version}\nevent: change\ndata: {data}\n\n"
+
+    def _reset(self) -> str:
+        return f"id: {self.epoch}-{self.version}\nevent: reset\ndata: {{}}\n\n"
+
+    async def subscribe(self, org_id: int, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield SSE frames for an org's changes until the hub stops"""
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+
+        cursor = self._resume_version(last_event_id)
+        if cursor is None or cursor < self._channel(org_id).floor:
+            cursor = self.version
+            if last_event_id:
+                yield self._reset()
+
+        while not self._closed:
+            channel = self._channel(org_id)
+            if cursor < channel.floor:
+                # Fell behind the backlog
+                cursor = self.version
+                yield self._reset()
+            for change in channel.after(cursor):
+                cursor = change.version
+                yield self._format(change)
+
+            if channel.waiter is None:
+                channel.waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(asyncio.shield(channel.waiter), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+
+
+change_hub = ChangeHub()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session: Session, flush_context):
+    actor_org_id = session.info.get("audit_actor", (None, None))[1]
+    pending = session.info.setdefault("stream_pending", [])
+    for op, objects in (("create", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            table = getattr(obj, "__tablename__", None)
+            if table not in STREAM_TABLES:
+                continue
+            if op == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+            org_id = getattr(obj, "org_id", None) or actor_org_id
+            if table == "event_exceptions":
+                pending.append((org_id, "events", obj.event_id, "update"))
+            else:
+                pending.append((org_id, STREAM_TABLES[table], obj.id, op))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish(session: Session):
+    pending = session.info.pop("stream_pending", None)
+    if not pending:
+        return
+    by_org = OrderedDict()
+    for org_id, entity, entity_id, op in pending:
+        if org_id is not None:
+            by_org.setdefault(org_id, []).append((entity, entity_id, op))
+    for org_id, changes in by_org.items():
+        change_hub.publish(org_id, changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session):
+    session.info.pop("stream_pending", None)
@@ -0,0 +1,215 @@
+"""Per-org change versions for delta sync
+
+Each flush that creates, updates or deletes clients, cases or events takes
+the next version of every org it touches from ``orgs.sync_version`` and
+stamps it on the changed rows; deleted rows leave a ``sync_tombstones``
+entry with that version. Incrementing the counter locks the org row until
+commit, so writes of one org commit in version order and a client that has
+seen version N cannot later miss a commit with a smaller one.
+``changes_since`` reads only what lies past a client's cursor through the
+(org_id, sync_version) indexes, so a sync costs as much as the changes.
+
+Tombstones are kept for SYNC_TOMBSTONE_DAYS. Tokens older than the pruned
+range are refused and the client has to sync from scratch.
+
+Usage:
+    python -m app.sync prune [--days 90]
+"""
+
+import argparse
+import base64
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import and_, delete, event, func, or_, select, update
+from sqlalchemy.orm import Session, noload, selectinload
+from app import models
+from app.shards import OrgMoved
+
+SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "90"))
+SYNC_TABLES = {"clients": models.Client, "cases": models.Case, "events": models.Event}
+# Order of rows sharing a version; tombstones come last
+ENTITY_RANKS = {"clients": 0, "cases": 1, "events": 2}
+TOMBSTONE_RANK = 3
+
+
+class Cursor(NamedTuple):
+    version: int
+    rank: int
+    id: int
+    # Org version when the initial sync started; older tombstones are not needed
+    floor: int
+
+    def encode(self) -> str:
+        raw = ".".join(str(part) for part in self).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+            return cls(*(int(part) for part in raw.split(".")))
+        except (ValueError, TypeError, UnicodeDecodeError):
+            raise ValueError("Invalid sync token")
+
+    @classmethod
+    def start(cls, org_version: int) -> "Cursor":
+        return cls(-1, 0, 0, org_version)
+
+
+class SyncPage(NamedTuple):
+    clients: List[models.Client]
+    cases: List[models.Case]
+    events: List[models.Event]
+    deleted: List[models.SyncTombstone]
+    next: Cursor
+    has_more: bool
+
+
+def next_version(conn, org_id: int) -> Optional[int]:
+    """Take the org's next version; the org row stays locked until commit
+
+    Raises OrgMoved once the org was moved to another database shard, so
+    writes that were waiting on the lock do not land on the old copy.
+    """
+    orgs = models.Org.__table__
+    version = conn.execute(
+        update(orgs).where(orgs.c.id == org_id, orgs.c.moved_to.is_(None))
+        .values(sync_version=orgs.c.sync_version + 1)
+        .returning(orgs.c.sync_version)
+    ).scalar()
+    if version is None:
+        moved_to = conn.execute(select(orgs.c.moved_to).where(orgs.c.id == org_id)).scalar()
+        if moved_to is not None:
+            raise OrgMoved(org_id, moved_to)
+    return version
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_versions(session: Session, flush_context, instances):
+    changed = defaultdict(set)
+    deleted = defaultdict(list)
+
+    for obj in list(session.new) + list(session.dirty):
+        table = getattr(obj, "__tablename__", None)
+        if table == "event_exceptions":
+            # An edited occurrence is a change to its series
+            obj = obj.event
+            if obj is None or obj in session.deleted:
+                continue
+        elif table not in SYNC_TABLES:
+            continue
+        elif obj in session.dirty and not session.is_modified(obj):
+            continue
+        changed[obj.org_id].add(obj)
+
+    for obj in session.deleted:
+        table = getattr(obj, "__tablename__", None)
+        if table == "event_exceptions":
+            if obj.event is not None and obj.event not in session.deleted:
+                changed[obj.event.org_id].add(obj.event)
+        elif table in SYNC_TABLES:
+            deleted[obj.org_id].append(obj)
+            if table == "cases":
+                # The flush clears case_id on the case's events
+                for child in obj.events:
+                    changed[child.org_id].add(child)
+
+    # Lock orgs in a fixed order so concurrent writers cannot deadlock
+    for org_id in sorted(org_id for org_id in set(changed) | set(deleted) if org_id is not None):
+        version = next_version(session.connection(), org_id)
+        if version is None:
+            # Org inserted in this same flush; its rows keep version 0
+            continue
+        for obj in changed[org_id]:
+            obj.sync_version = version
+        for obj in deleted[org_id]:
+            session.add(models.SyncTombstone(
+                org_id=org_id, entity=obj.__tablename__, entity_id=obj.id, version=version
+            ))
+
+
+def _past(version_column, id_column, rank: int, cursor: Cursor):
+    """Rows ordered after the cursor by (version, rank, id)"""
+    if rank > cursor.rank:
+        return version_column >= cursor.version
+    if rank < cursor.rank:
+        return version_column > cursor.version
+    return or_(
+        version_column > cursor.version,
+        and_(version_column == cursor.version, id_column > cursor.id)
+    )
+
+
+def changes_since(db: Session, org_id: int, cursor: Cursor, limit: int) -> SyncPage:
+    """Up to ``limit`` changed rows and tombstones of an org past ``cursor``"""
+    options = {
+        "clients": [],
+        "cases": [noload(models.Case.client)],
+        "events": [noload(models.Event.case), selectinload(models.Event.exceptions)],
+    }
+    found = []
+    for entity, model in SYNC_TABLES.items():
+        rank = ENTITY_RANKS[entity]
+        rows = db.query(model).options(*options[entity]).filter(
+            model.org_id == org_id,
+            _past(model.sync_version, model.id, rank, cursor)
+        ).order_by(model.sync_version, model.id).limit(limit + 1).all()
+        found.extend(((row.sync_version, rank, row.id), entity, row) for row in rows)
+
+    tombstone = models.SyncTombstone
+    tombstones = db.query(tombstone).filter(
+        tombstone.org_id == org_id,
+        tombstone.version > cursor.floor,
+        _past(tombstone.version, tombstone.id, TOMBSTONE_RANK, cursor)
+    ).order_by(tombstone.version, tombstone.id).limit(limit + 1).all()
+    found.extend(((row.version, TOMBSTONE_RANK, row.id), "deleted", row) for row in tombstones)
+
+    found.sort(key=lambda item: item[0])
+    page = found[:limit]
+    grouped = {"clients": [], "cases": [], "events": [], "deleted": []}
+    for _, kind, row in page:
+        grouped[kind].append(row)
+
+    next_cursor = cursor
+    if page:
+        version, rank, row_id = page[-1][0]
+        next_cursor = Cursor(version, rank, row_id, cursor.floor)
+    return SyncPage(next=next_cursor, has_more=len(found) > limit, **grouped)
+
+
+def prune_tombstones(bind, older_than: timedelta) -> int:
+    """Delete old tombstones and record the newest pruned version per org"""
+    tombstones = models.SyncTombstone.__table__
+    orgs = models.Org.__table__
+    cutoff = datetime.utcnow() - older_than
+    with bind.begin() as conn:
+        pruned = conn.execute(
+            select(tombstones.c.org_id, func.max(tombstones.c.version))
+            .where(tombstones.c.deleted_at < cutoff)
+            .group_by(tombstones.c.org_id)
+        ).all()
+        for org_id, version in pruned:
+            conn.execute(update(orgs).where(
+                orgs.c.id == org_id,
+                orgs.c.sync_pruned_version < version
+            ).values(sync_pruned_version=version))
+        return conn.execute(delete(tombstones).where(tombstones.c.deleted_at < cutoff)).rowcount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain delta sync data")
+    commands = parser.add_subparsers(dest="command", required=True)
+    prune_cmd = commands.add_parser("prune", help="Delete old tombstones")
+    prune_cmd.add_argument("--days", type=int, default=SYNC_TOMBSTONE_DAYS)
+    args = parser.parse_args(argv)
+
+    from app.database import engine
+    deleted = prune_tombstones(engine, timedelta(days=args.days))
+    print(f"✅ Pruned {deleted} tombstones older than {args.days} days")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""Local request tracing
+
+``TracingMiddleware`` opens a root span for a sampled share of requests
+(TRACE_SAMPLE_RATE). Inside it, spans are recorded for dependency
+resolution, each dependency or function marked ``@traced`` (token
+decoding, ``get_current_user``, ``get_current_org``), the endpoint, every
+SQL statement and response serialization. The current span lives in a
+context variable, so it follows requests through ``await`` and into the
+threadpool that runs sync endpoints and dependencies.
+
+Finished traces are kept in a ring buffer of the last TRACE_BUFFER_SIZE
+(``GET /api/diagnostics/traces``) and, with TRACE_FILE set, appended to it
+as one OTLP/JSON ``ExportTraceServiceRequest`` per line, the format read
+by the OpenTelemetry Collector's ``otlpjsonfile`` receiver. An incoming
+W3C ``traceparent`` header is continued, and sampled responses carry
+``X-Trace-Id``.
+
+Unsampled requests pay for one random number; instrumented code checks a
+context variable and otherwise runs untouched.
+"""
+
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_FILE = os.getenv("TRACE_FILE")
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "100"))
+SERVICE_NAME = "avukatajanda-api"
+STATEMENT_MAX_LENGTH = 1000
+
+# OTLP span kinds
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.spans: List["Span"] = []
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start", "end", "attributes", "error")
+
+    def __init__(self, trace: Trace, name: str, parent_id: str = "", kind: int = KIND_INTERNAL,
+                 attributes: Optional[dict] = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+        self.end = 0
+        self.start = time.time_ns()
+        # Appending to a list is atomic, so threadpool spans need no lock
+        trace.spans.append(self)
+
+    def child(self, name: str, kind: int = KIND_INTERNAL, **attributes) -> "Span":
+        return Span(self.trace, name, self.span_id, kind, attributes)
+
+    def finish(self):
+        self.end = time.time_ns()
+
+    def otlp(self) -> dict:
+        data = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end or time.time_ns()),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+        }
+        if self.error is not None:
+            data["status"] = {"code": 2, "message": self.error}
+        return data
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes) -> Iterator[Optional[Span]]:
+    """Child of the current span, or nothing when the request is not traced"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, kind, **attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = repr(e)
+        raise
+    finally:
+        child.finish()
+        _current.reset(token)
+
+
+def traced(name: Optional[str] = None):
+    """Record calls of a sync or async function (or dependency) as spans"""
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return await func(*args, **kwargs)
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before(conn, cursor, statement, parameters, context, executemany):
+    parent = _current.get()
+    if parent is not None:
+        conn.info.setdefault("trace_spans", []).append(parent.child(
+            "db.query", KIND_CLIENT, **{"db.system": conn.dialect.name, "db.statement": statement[:STATEMENT_MAX_LENGTH]}
+        ))
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans and _current.get() is not None:
+        spans.pop().finish()
+
+
+@event.listens_for(Engine, "handle_error")
+def _error(context):
+    spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+    if spans and _current.get() is not None:
+        failed = spans.pop()
+        failed.error = repr(context.original_exception)
+        failed.finish()
+
+
+class Exporter:
+    """Ring buffer of finished traces, optionally appended to a JSONL file"""
+
+    def __init__(self, path: Optional[str] = TRACE_FILE, size: int = TRACE_BUFFER_SIZE):
+        self.path = path
+        self.traces: Deque[dict] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace):
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+                                        {"key": "process.pid", "value": {"intValue": str(os.getpid())}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [s.otlp() for s in trace.spans]}],
+        }]}
+        self.traces.append(request)
+        if self.path:
+            line = json.dumps(request) + "\n"
+            with self._lock, open(self.path, "a") as f:
+                f.write(line)
+
+    def recent(self, limit: int = TRACE_BUFFER_SIZE) -> dict:
+        """The last ``limit`` traces as one OTLP/JSON request"""
+        traces = list(self.traces)[-limit:] if limit else []
+        return {"resourceSpans": [rs for request in traces for rs in request["resourceSpans"]]}
+
+
+exporter = Exporter()
+
+
+def _parse_traceparent(value: Optional[str]):
+    # version-traceid-parentid-flags
+    parts = (value or "").split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16 and parts[1] != "0" * 32:
+        return parts[1], parts[2]
+    return None, ""
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening the root span of sampled requests"""
+
+    def __init__(self, app, sample_rate: float = TRACE_SAMPLE_RATE, exporter: Exporter = exporter):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.sample_rate or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        trace_id, parent_id = _parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        root = Span(Trace(trace_id), f"{scope['method']} {scope['path']}", parent_id, KIND_SERVER,
+                    {"http.method": scope["method"], "url.path": scope["path"]})
+        token = _current.set(root)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) +
+                           [(b"x-trace-id", root.trace.trace_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            root.error = repr(e)
+            raise
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                root.name = f"{scope['method']} {route}"
+                root.attributes["http.route"] = route
+            root.finish()
+            self.exporter.export(root.trace)
+
+
+def instrument_fastapi():
+    """Span the phases of FastAPI's request handler
+
+    ``fastapi.routing`` looks these functions up at call time, and keeps
+    ``run_endpoint_function`` separate precisely so profilers can hook it.
+    """
+    import fastapi.routing as routing
+
+    if getattr(routing, "_traced", False):
+        return
+
+    solve_dependencies = routing.solve_dependencies
+    run_endpoint_function = routing.run_endpoint_function
+    serialize_response = routing.serialize_response
+
+    async def traced_solve_dependencies(**kwargs):
+        if _current.get() is None:
+            return await solve_dependencies(**kwargs)
+        with span("dependencies"):
+            return await solve_dependencies(**kwargs)
+
+    async def traced_run_endpoint_function(*, dependant, **kwargs):
+        if _current.get() is None:
+            return await run_endpoint_function(dependant=dependant, **kwargs)
+        with span(f"endpoint {getattr(dependant.call, '__name__', 'call')}"):
+            return await run_endpoint_function(dependant=dependant, **kwargs)
+
+    async def traced_serialize_response(**kwargs):
+        if _current.get() is None:
+            return await serialize_response(**kwargs)
+        with span("serialize"):
+            return await serialize_response(**kwargs)
+
+    routing.solve_dependencies = traced_solve_dependencies
+    routing.run_endpoint_function = traced_run_endpoint_function
+    routing.serialize_response = traced_serialize_response
+    routing._traced = True
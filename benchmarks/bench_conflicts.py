@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Benchmark event conflict lookups against a large events table
+
+Compares the R*Tree-backed lookup with the plain starts_at range scan on a
+SQLite file. Run from the repository root:
+
+    python benchmarks/bench_conflicts.py --events 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app import conflicts, models
+
+
+def seed(engine, events: int, users: int, seed_value: int):
+    rng = random.Random(seed_value)
+    start = datetime(2024, 1, 1)
+    span_minutes = 3 * 365 * 24 * 60
+
+    with engine.begin() as conn:
+        conn.execute(models.Org.__table__.insert(), [{"id": 1, "name": "Bench"}])
+        conn.execute(models.User.__table__.insert(), [
+            {"id": i, "email": f"user{i}@example.com", "password_hash": "x"} for i in range(1, users + 1)
+        ])
+
+        batch = []
+        for i in range(1, events + 1):
+            starts_at = start + timedelta(minutes=rng.randrange(0, span_minutes, 15))
+            batch.append({
+                "id": i,
+                "user_id": rng.randint(1, users),
+                "org_id": 1,
+                "title": "Duruşma",
+                "starts_at": starts_at,
+                "ends_at": starts_at + timedelta(minutes=rng.choice((30, 60, 90, 120))),
+                "location": f"Adliye {rng.randint(1, 200)}",
+            })
+            if len(batch) == 50000:
+                conn.execute(models.Event.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(models.Event.__table__.insert(), batch)
+
+
+def measure(Session, probes, use_rtree: bool) -> list:
+    timings = []
+    db = Session()
+    conflicts._rtree_available[db.get_bind().engine] = use_rtree
+    for probe in probes:
+        started = time.perf_counter()
+        conflicts.find_conflicts(db, probe)
+        timings.append((time.perf_counter() - started) * 1000)
+    db.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_conflicts.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+
+    started = time.perf_counter()
+    seed(engine, args.events, args.users, args.seed)
+    print(f"Seeded {args.events:,} events in {time.perf_counter() - started:.1f}s ({path})")
+
+    rng = random.Random(args.seed + 1)
+    probes = []
+    for _ in range(args.probes):
+        starts_at = datetime(2024, 1, 1) + timedelta(minutes=rng.randrange(0, 3 * 365 * 24 * 60, 15))
+        probes.append(models.Event(
+            user_id=rng.randint(1, args.users), org_id=1, title="Probe",
+            starts_at=starts_at, ends_at=starts_at + timedelta(hours=1),
+            location=f"Adliye {rng.randint(1, 200)}"
+        ))
+
+    Session = sessionmaker(bind=engine)
+    for label, use_rtree in (("R*Tree", True), ("starts_at range", False)):
+        timings = measure(Session, probes, use_rtree)
+        print(
+            f"{label:>16}: p50 {statistics.median(timings):8.2f} ms  "
+            f"p95 {statistics.quantiles(timings, n=20)[-1]:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""Load-test the HTTP API with a realistic request mix
+
+Logs in (registering the account on first use), seeds the organization
+through the API when it has fewer clients than --clients, then runs
+--concurrency clients against the server for --duration seconds. The mix
+covers dashboard stats, client and case search with ``q``, calendar month
+views, upcoming events and creates; weights are set with --mix. Reports
+throughput and p50/p95/p99 latency per route. Needs httpx. Run from the
+repository root:
+
+    python benchmarks/bench_load.py --serve --concurrency 20 --duration 30 --save baseline.json
+    python benchmarks/bench_load.py --base-url http://127.0.0.1:8000 --compare baseline.json
+
+--serve starts uvicorn on a fresh, migrated SQLite database (or on
+--database-url) and stops it afterwards; --db-latency makes it sleep before
+every database round trip (see app/latency.py) to show how the mix would
+behave against a remote database. --compare exits with status 1 when
+a route's p95 or the total throughput is worse than the baseline by more
+than --threshold.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).parent.parent
+
+FIRST_NAMES = ["Ahmet", "Mehmet", "Ayşe", "Fatma", "Mustafa", "Zeynep", "Emre", "Elif", "Hüseyin", "Özge"]
+LAST_NAMES = ["Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Yıldız", "Aydın", "Öztürk", "Arslan", "Doğan"]
+CASE_TITLES = ["Alacak davası", "Boşanma davası", "İşçilik alacağı", "Kira tespiti", "Tazminat davası", "İcra takibi"]
+EVENT_TITLES = ["Duruşma", "Keşif", "Bilirkişi incelemesi", "Müvekkil görüşmesi", "Arabuluculuk"]
+SEARCH_TERMS = ["Yıl", "Kaya", "dava", "Ay", "İcra", "2024", "Demir", "ta"]
+
+DEFAULT_MIX = {
+    "stats": 10,
+    "clients_search": 15,
+    "cases_search": 20,
+    "events_calendar": 25,
+    "events_upcoming": 10,
+    "create_client": 5,
+    "create_case": 5,
+    "create_event": 10,
+}
+
+
+def person(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+# Case numbers are unique per org; each run numbers its cases from a random start
+_case_numbers = itertools.count(random.SystemRandom().randrange(10 ** 8))
+
+
+def case_number(rng: random.Random) -> str:
+    return f"{rng.randint(2018, 2025)}/{next(_case_numbers)} E."
+
+
+class Scenario:
+    """Builds requests for each kind in the mix, labelled with the reported route"""
+
+    def __init__(self, rng: random.Random, client_ids, case_ids):
+        self.rng = rng
+        self.client_ids = client_ids
+        self.case_ids = case_ids
+
+    def request(self, kind: str):
+        rng = self.rng
+        if kind == "stats":
+            return "GET /api/stats/", "GET", "/api/stats/", {}
+        if kind == "clients_search":
+            return "GET /api/clients/?q", "GET", "/api/clients/", {"params": {"q": rng.choice(SEARCH_TERMS), "limit": 50}}
+        if kind == "cases_search":
+            return "GET /api/cases/?q", "GET", "/api/cases/", {"params": {"q": rng.choice(SEARCH_TERMS), "limit": 50}}
+        if kind == "events_calendar":
+            month = datetime(2024, 1, 1) + timedelta(days=31 * rng.randrange(24))
+            start = month.replace(day=1)
+            end = (start + timedelta(days=32)).replace(day=1)
+            return "GET /api/events/?from&to", "GET", "/api/events/", {
+                "params": {"from": start.isoformat(), "to": end.isoformat(), "limit": 100}}
+        if kind == "events_upcoming":
+            return "GET /api/events/?upcoming", "GET", "/api/events/", {"params": {"upcoming": "true", "limit": 20}}
+        if kind == "create_client":
+            return "POST /api/clients/", "POST", "/api/clients/", {"json": {"name": person(rng)}}
+        if kind == "create_case":
+            return "POST /api/cases/", "POST", "/api/cases/", {"json": {
+                "client_id": rng.choice(self.client_ids), "case_number": case_number(rng),
+                "title": rng.choice(CASE_TITLES)}}
+        if kind == "create_event":
+            starts_at = datetime(2024, 1, 1, 9) + timedelta(days=rng.randrange(730), minutes=15 * rng.randrange(32))
+            return "POST /api/events/", "POST", "/api/events/", {"json": {
+                "case_id": rng.choice(self.case_ids), "title": rng.choice(EVENT_TITLES),
+                "starts_at": starts_at.isoformat(), "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+                "location": f"İstanbul {rng.randint(1, 40)}. Asliye Hukuk"}}
+        raise ValueError(f"Unknown request kind: {kind}")
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(","):
+        kind, _, weight = item.partition("=")
+        if kind.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown kind '{kind}' (one of {', '.join(DEFAULT_MIX)})")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(ordered: list, q: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post("/auth/login", data={"username": email, "password": password})
+    if response.status_code == 401:
+        response = await client.post("/auth/register", json={"email": email, "password": password, "name": "Yük Testi"})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def seed(client: httpx.AsyncClient, rng: random.Random, clients: int, cases: int, events: int,
+               concurrency: int):
+    """Create clients, cases and events through the API up to the requested counts"""
+    existing = await client.get("/api/clients/", params={"limit": 100})
+    existing.raise_for_status()
+    client_ids = [c["id"] for c in existing.json()]
+    cases_page = await client.get("/api/cases/", params={"limit": 100})
+    cases_page.raise_for_status()
+    case_ids = [c["id"] for c in cases_page.json()]
+    if len(client_ids) >= min(clients, 100) and case_ids:
+        return client_ids, case_ids
+
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def create(path: str, body: dict) -> int:
+        async with semaphore:
+            response = await client.post(path, json=body)
+            response.raise_for_status()
+            return response.json()["id"]
+
+    client_ids += await asyncio.gather(*[
+        create("/api/clients/", {"name": person(rng), "phone": f"05{rng.randint(300000000, 599999999)}"})
+        for _ in range(clients)
+    ])
+    case_ids += await asyncio.gather(*[
+        create("/api/cases/", {"client_id": rng.choice(client_ids), "case_number": case_number(rng),
+                               "title": rng.choice(CASE_TITLES)})
+        for _ in range(cases)
+    ])
+    scenario = Scenario(rng, client_ids, case_ids)
+    await asyncio.gather(*[create("/api/events/", scenario.request("create_event")[3]["json"]) for _ in range(events)])
+    print(f"Seeded {clients} clients, {cases} cases, {events} events in {time.perf_counter() - started:.1f}s")
+    return client_ids, case_ids
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        token = await login(client, args.email, args.password)
+        client.headers["Authorization"] = f"Bearer {token}"
+        client_ids, case_ids = await seed(client, rng, args.clients, args.cases, args.events, args.concurrency)
+
+        kinds, weights = zip(*args.mix.items())
+        samples = {}
+        errors = {}
+
+        async def worker(index: int, deadline: float, record: bool):
+            scenario = Scenario(random.Random(args.seed * 1000 + index), client_ids, case_ids)
+            while time.perf_counter() < deadline:
+                route, method, url, kwargs = scenario.request(scenario.rng.choices(kinds, weights)[0])
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url, **kwargs)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                elapsed = time.perf_counter() - started
+                if record:
+                    samples.setdefault(route, []).append(elapsed)
+                    if failed:
+                        errors[route] = errors.get(route, 0) + 1
+
+        if args.warmup:
+            deadline = time.perf_counter() + args.warmup
+            await asyncio.gather(*[worker(i, deadline, False) for i in range(args.concurrency)])
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*[worker(i, deadline, True) for i in range(args.concurrency)])
+        wall = time.perf_counter() - started
+
+    routes = {}
+    for route, timings in sorted(samples.items()):
+        timings.sort()
+        routes[route] = {
+            "requests": len(timings),
+            "errors": errors.get(route, 0),
+            "rps": len(timings) / wall,
+            "mean_ms": sum(timings) / len(timings) * 1000,
+            "p50_ms": percentile(timings, 50) * 1000,
+            "p95_ms": percentile(timings, 95) * 1000,
+            "p99_ms": percentile(timings, 99) * 1000,
+        }
+    everything = sorted(t for timings in samples.values() for t in timings)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "date": datetime.utcnow().isoformat(timespec="seconds"),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "mix": args.mix,
+            "db_latency_ms": args.db_latency if args.serve else None,
+        },
+        "total": {
+            "requests": len(everything),
+            "errors": sum(errors.values()),
+            "rps": len(everything) / wall,
+            "p50_ms": percentile(everything, 50) * 1000,
+            "p95_ms": percentile(everything, 95) * 1000,
+            "p99_ms": percentile(everything, 99) * 1000,
+        },
+        "routes": routes,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(result: dict):
+    print(f"{'route':<28} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, r in list(result["routes"].items()) + [("total", result["total"])]:
+        print(f"{route:<28} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> bool:
+    """Print changes against a baseline; True when nothing regressed beyond threshold"""
+    ok = True
+    print(f"\nAgainst baseline {baseline['meta'].get('commit')} ({baseline['meta'].get('date')}):")
+    for route, r in list(result["routes"].items()) + [("total", result["total"])]:
+        old = baseline["total"] if route == "total" else baseline["routes"].get(route)
+        if not old:
+            continue
+        p95 = r["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        rps = r["rps"] / old["rps"] - 1 if old["rps"] else 0.0
+        regressed = p95 > threshold or (route == "total" and rps < -threshold)
+        ok = ok and not regressed
+        print(f"{route:<28} p95 {p95:+7.1%}  req/s {rps:+7.1%}{'  REGRESSED' if regressed else ''}")
+    return ok
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(database_url: str, workers: int, latency: dict = None):
+    """Start uvicorn on a migrated database; returns the process and its base URL"""
+    env = {**os.environ, "DATABASE_URL": database_url, "REMINDERS_ENABLED": "false"}
+    subprocess.run([sys.executable, "-m", "app.migrate", "--database-url", database_url], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=ROOT, env={**env, **(latency or {})},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            if httpx.get(f"{base_url}/ping").status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise SystemExit("uvicorn did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--serve", action="store_true", help="start uvicorn for the run")
+    parser.add_argument("--database-url", help="with --serve (default: a new SQLite file)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --serve")
+    parser.add_argument("--db-latency", type=float, default=0, help="ms per database round trip with --serve")
+    parser.add_argument("--db-jitter", type=float, default=0, help="standard deviation in ms")
+    parser.add_argument("--db-latency-per", choices=["statement", "roundtrip"], default="statement")
+    parser.add_argument("--email", default="yuk-testi@example.com")
+    parser.add_argument("--password", default="yuk-testi-123")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. stats=10,events_calendar=30")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--cases", type=int, default=500)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    process = None
+    if args.serve:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_load.db')}"
+        latency = {"DB_LATENCY_MS": str(args.db_latency), "DB_JITTER_MS": str(args.db_jitter),
+                   "DB_LATENCY_PER": args.db_latency_per}
+        process, args.base_url = serve(database_url, args.workers, latency)
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    report(result)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if not compare(result, json.load(f), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
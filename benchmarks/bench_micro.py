@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""Microbenchmarks of per-request fixed costs
+
+Times, in isolation, the work every request repeats: JWT creation and
+decoding, password verification, validating an ``EventCreate`` body,
+serializing a page of nested ``EventResponse`` objects the way FastAPI
+does, and building (with its cache key) and compiling each router's main
+queries. Each benchmark is calibrated to run for at least --min-time per
+round; the median of --rounds rounds is reported. Run from the repository
+root:
+
+    python benchmarks/bench_micro.py --save .benchmarks/micro.json
+    python benchmarks/bench_micro.py --compare .benchmarks/micro.json --threshold 0.15 [-k query]
+
+--compare exits with status 1 when a benchmark's median is slower than the
+baseline by more than --threshold.
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from pydantic import TypeAdapter
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app import models, schemas
+from app.auth import create_access_token, decode_token, get_password_hash, verify_password
+from app.routers.auth import _membership_query
+from app.routers.cases import _case_query
+from app.routers.clients import _client_query
+from app.routers.events import _event_query, _singles_in_window
+from app.routers.stats import _active_case_query
+
+ROOT = Path(__file__).parent.parent
+DIALECTS = {"sqlite": sqlite.dialect(), "postgresql": postgresql.dialect()}
+PAGE_SIZE = 100
+
+# name -> factory returning the callable to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    def register(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+
+# Auth
+
+CLAIMS = {"user_id": 1, "org_id": 1, "role": "owner"}
+
+
+@benchmark("auth.create_access_token")
+def _create_token():
+    return lambda: create_access_token(CLAIMS)
+
+
+@benchmark("auth.decode_token")
+def _decode_token():
+    token = create_access_token(CLAIMS)
+    return lambda: decode_token(token)
+
+
+@benchmark("auth.verify_password")
+def _verify_password():
+    password_hash = get_password_hash("secret123")
+    return lambda: verify_password("secret123", password_hash)
+
+
+# Validation and serialization
+
+EVENT_BODY = {
+    "case_id": 12, "title": "Duruşma", "type": "hearing",
+    "starts_at": "2025-03-04T09:30:00", "ends_at": "2025-03-04T10:00:00",
+    "location": "İstanbul 3. Asliye Hukuk Mahkemesi", "rrule": None,
+}
+
+
+@benchmark("schemas.event_create_validate")
+def _event_create():
+    return lambda: schemas.EventCreate.model_validate(EVENT_BODY)
+
+
+@benchmark("schemas.event_create_validate_json")
+def _event_create_json():
+    body = json.dumps(EVENT_BODY)
+    return lambda: schemas.EventCreate.model_validate_json(body)
+
+
+def event_page(size: int = PAGE_SIZE) -> List[models.Event]:
+    """Transient ORM events with their case and client, as the events list loads them"""
+    now = datetime(2025, 3, 4, 9)
+    client = models.Client(id=1, name="Ayşe Yılmaz", email="ayse@example.com", phone="+90 532 000 00 00",
+                           address="Kadıköy, İstanbul", created_at=now, updated_at=now)
+    case = models.Case(id=1, client_id=1, case_number="2024/1234 E.", title="Alacak davası",
+                       status=models.CaseStatusEnum.active, created_at=now, updated_at=now, client=client)
+    return [
+        models.Event(id=i, case_id=1, case=case, title="Duruşma", type="hearing",
+                     starts_at=now + timedelta(days=i), ends_at=now + timedelta(days=i, minutes=30),
+                     location="İstanbul 3. Asliye Hukuk Mahkemesi", created_at=now)
+        for i in range(size)
+    ]
+
+
+@benchmark("schemas.event_response_page")
+def _event_response_page():
+    # FastAPI validates against response_model, dumps in JSON mode and renders with json.dumps
+    adapter = TypeAdapter(List[schemas.EventResponse])
+    page = event_page()
+
+    def serialize():
+        validated = adapter.validate_python(page, from_attributes=True)
+        return json.dumps(adapter.dump_python(validated, mode="json"), ensure_ascii=False).encode()
+    return serialize
+
+
+# Query construction and compilation, one representative query per router
+
+def clients_list(db: Session):
+    return _client_query(db, 1, "Yıl").offset(0).limit(PAGE_SIZE).statement
+
+
+def cases_list(db: Session):
+    return _case_query(db, models.Case, 1, "dava", schemas.CaseStatusEnum.active).offset(0).limit(PAGE_SIZE).statement
+
+
+def events_calendar(db: Session):
+    start, end = datetime(2025, 3, 1), datetime(2025, 4, 1)
+    query = _event_query(db, models.Event, 1, None)
+    return _singles_in_window(query, models.Event, None, start, end, start).limit(PAGE_SIZE).statement
+
+
+def stats_counts(db: Session):
+    # Query.count() wraps the query in a subquery like this
+    return select(func.count()).select_from(_active_case_query(db, 1).subquery())
+
+
+def auth_me(db: Session):
+    return _membership_query(db, 1).statement
+
+
+QUERIES = {
+    "clients": clients_list,
+    "cases": cases_list,
+    "events": events_calendar,
+    "stats": stats_counts,
+    "auth": auth_me,
+}
+
+
+def _register_queries(dialect_name: str):
+    dialect = DIALECTS[dialect_name]
+    for router, build in QUERIES.items():
+        def build_factory(build=build):
+            db = Session()
+            # Building plus the cache key is the per-request cost once the compiled form is cached
+            return lambda: build(db)._generate_cache_key()
+
+        def compile_factory(build=build):
+            statement = build(Session())
+            return lambda: statement.compile(dialect=dialect)
+
+        benchmark(f"query.{router}.build")(build_factory)
+        benchmark(f"query.{router}.compile_{dialect_name}")(compile_factory)
+
+
+def measure(func: Callable, rounds: int, min_time: float) -> dict:
+    """Seconds per call: median, min and spread over rounds of a calibrated loop"""
+    def run(n: int) -> float:
+        started = time.perf_counter()
+        for _ in range(n):
+            func()
+        return time.perf_counter() - started
+
+    func()
+    n = 1
+    while True:
+        elapsed = run(n)
+        if elapsed >= min_time:
+            break
+        n = max(n * 2, int(n * min_time / max(elapsed, 1e-9) * 1.2))
+
+    gc_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        times = [run(n) / n for _ in range(rounds)]
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "iterations": n,
+        "rounds": rounds,
+    }
+
+
+def _format(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:9.3f} ms"
+    return f"{seconds * 1e6:9.2f} µs"
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="keyword", help="only benchmarks whose name contains this")
+    parser.add_argument("--dialect", choices=sorted(DIALECTS), default="sqlite", help="for query compilation")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per round")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative slowdown of the median")
+    args = parser.parse_args()
+
+    _register_queries(args.dialect)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["benchmarks"]
+
+    results = {}
+    regressed = []
+    print(f"{'benchmark':<36} {'median':>12} {'min':>12} {'stdev':>7} {'ops/s':>10}" + ("   change" if baseline else ""))
+    for name, factory in BENCHMARKS.items():
+        if args.keyword and args.keyword not in name:
+            continue
+        result = results[name] = measure(factory(), args.rounds, args.min_time)
+        line = (f"{name:<36} {_format(result['median'])} {_format(result['min'])} "
+                f"{result['stdev'] / result['median']:>6.1%} {1 / result['median']:>10,.0f}")
+        old = (baseline or {}).get(name)
+        if old:
+            change = result["median"] / old["median"] - 1
+            line += f"  {change:+7.1%}"
+            if change > args.threshold:
+                regressed.append(name)
+                line += "  REGRESSED"
+        print(line)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump({
+                "meta": {"commit": _git_commit(), "date": datetime.utcnow().isoformat(timespec="seconds"),
+                         "python": sys.version.split()[0], "dialect": args.dialect},
+                "benchmarks": results,
+            }, f, indent=2)
+    if regressed:
+        print(f"\n{len(regressed)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Benchmark event range and upcoming queries against events table size
+
+Seeds events over three years for each size and times the calendar range
+and upcoming listings. Point it at a Postgres database to measure monthly
+partitions; --plain creates a single events table for comparison. Without
+--database-url a temporary SQLite file is used (always a single table).
+Run from the repository root:
+
+    python benchmarks/bench_partitions.py --database-url postgresql://localhost/bench \\
+        --sizes 100000,1000000,5000000 [--plain]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app import models, partitions
+from app.routers.events import _list_window
+
+START = datetime.utcnow() - timedelta(days=2 * 365)
+SPAN_MINUTES = 3 * 365 * 24 * 60
+
+
+def seed(engine, events: int, orgs: int, seed_value: int):
+    rng = random.Random(seed_value)
+    with engine.begin() as conn:
+        conn.execute(models.Org.__table__.insert(), [{"id": i, "name": f"Bench {i}"} for i in range(1, orgs + 1)])
+        conn.execute(models.User.__table__.insert(), [{"id": 1, "email": "bench@example.com", "password_hash": "x"}])
+
+        batch = []
+        for i in range(1, events + 1):
+            starts_at = START + timedelta(minutes=rng.randrange(0, SPAN_MINUTES, 15))
+            batch.append({
+                "id": i,
+                "user_id": 1,
+                "org_id": rng.randint(1, orgs),
+                "title": "Duruşma",
+                "starts_at": starts_at,
+                "ends_at": starts_at + timedelta(minutes=rng.choice((30, 60, 90, 120))),
+                "location": f"Adliye {rng.randint(1, 200)}",
+            })
+            if len(batch) == 50000:
+                conn.execute(models.Event.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(models.Event.__table__.insert(), batch)
+        if engine.dialect.name == "postgresql":
+            conn.exec_driver_sql("SELECT setval('events_id_seq', %s)", (events,))
+    # Months created after seeding pick their rows out of events_default
+    partitions.ensure_partitions(engine, since=START)
+    if engine.dialect.name == "postgresql":
+        # After moving rows, so the new partitions have statistics too
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE events")
+
+
+def measure(Session, probes, upcoming: bool) -> list:
+    timings = []
+    db = Session()
+    for org_id, from_ in probes:
+        started = time.perf_counter()
+        if upcoming:
+            _list_window(db, models.Event, org_id, None, True, None, None, 0, 50)
+        else:
+            _list_window(db, models.Event, org_id, None, None, from_, from_ + timedelta(days=31), 0, 50)
+        timings.append((time.perf_counter() - started) * 1000)
+    db.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="Empty database to use (default: temporary SQLite file)")
+    parser.add_argument("--sizes", default="100000,1000000")
+    parser.add_argument("--orgs", type=int, default=50)
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--plain", action="store_true", help="Do not partition events on Postgres")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.plain:
+        partitions.PARTITION_EVENTS = False
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_partitions.db')}"
+    engine = create_engine(url)
+    layout = "monthly partitions" if partitions.events_partitioned(engine.dialect) else "single table"
+    print(f"{engine.dialect.name}, {layout}")
+
+    rng = random.Random(args.seed + 1)
+    probes = [
+        (rng.randint(1, args.orgs), START + timedelta(minutes=rng.randrange(0, SPAN_MINUTES - 31 * 24 * 60, 15)))
+        for _ in range(args.probes)
+    ]
+    Session = sessionmaker(bind=engine)
+
+    for size in (int(size) for size in args.sizes.split(",")):
+        Base.metadata.drop_all(bind=engine)
+        if engine.dialect.name == "sqlite":
+            with engine.begin() as conn:
+                conn.exec_driver_sql("DROP TABLE IF EXISTS events_rtree")
+        Base.metadata.create_all(bind=engine)
+        started = time.perf_counter()
+        seed(engine, size, args.orgs, args.seed)
+        print(f"Seeded {size:,} events in {time.perf_counter() - started:.1f}s")
+
+        for label, upcoming in (("month range", False), ("upcoming", True)):
+            timings = measure(Session, probes, upcoming)
+            print(
+                f"{size:>12,} {label:>12}: p50 {statistics.median(timings):8.2f} ms  "
+                f"p95 {statistics.quantiles(timings, n=20)[-1]:8.2f} ms"
+            )
+    Base.metadata.drop_all(bind=engine)
+
+
+if __name__ == "__main__":
+    main()
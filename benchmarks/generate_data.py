@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""Generate large synthetic tenants for benchmarks
+
+Fills a SQLite or Postgres database with orgs, users, clients, cases and
+events through bulk Core inserts. Sizes follow a Zipf-like skew: with the
+defaults, the largest of 20 orgs holds about a third of all rows and the
+smallest ones only a few hundred. Names, case numbers, courts, statuses and
+event times follow Turkish law-office data: most cases are active,
+hearings fall on weekday office hours and the calendar spans two years back
+to six months ahead. The same --seed always yields the same data.
+
+On SQLite, secondary indexes and the triggers feeding the conflict-lookup
+R*Tree (see app/conflicts.py) are dropped for the load; the indexes are
+rebuilt and the new events indexed in one pass at the end. Values are
+written in SQLite's storage format without per-value type processing.
+Rows load at about 170k per second there, but filling the R*Tree is
+bound by SQLite at roughly 75k events per second. Without --create-schema
+the database is first migrated like at boot (app/migrate.py). Run from
+the repository root:
+
+    python benchmarks/generate_data.py --database-url sqlite:///bench.db --create-schema
+    python benchmarks/generate_data.py --database-url postgresql://localhost/bench --clients 100000 --cases 500000 --events 3000000
+
+Each org's owner is ``sahip<org id>@ornek-hukuk.test`` with --password, so
+the load test can log in to the largest org:
+
+    python benchmarks/bench_load.py --email sahip1@ornek-hukuk.test --password secret123 --clients 0
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, event, func, select, text
+from app import models
+from app.auth import get_password_hash
+from app.database import Base
+from app.migrate import migrate
+from app.partitions import ensure_partitions
+
+BATCH_SIZE = 20000
+
+FIRST_NAMES = [
+    "Ahmet", "Mehmet", "Mustafa", "Ali", "Hüseyin", "Hasan", "İbrahim", "Murat", "Emre", "Burak",
+    "Ömer", "Yusuf", "Serkan", "Oğuz", "Cem", "Kemal", "Tolga", "Barış", "Can", "Uğur",
+    "Ayşe", "Fatma", "Emine", "Hatice", "Zeynep", "Elif", "Merve", "Özge", "Esra", "Şeyma",
+    "Büşra", "Gül", "Derya", "Selin", "Ebru", "Gizem", "Tuğba", "Çiğdem", "Nur", "İrem",
+]
+LAST_NAMES = [
+    "Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Yıldız", "Yıldırım", "Öztürk", "Aydın", "Özdemir",
+    "Arslan", "Doğan", "Kılıç", "Aslan", "Çetin", "Kara", "Koç", "Kurt", "Özkan", "Şimşek",
+    "Polat", "Özcan", "Korkmaz", "Erdoğan", "Güneş", "Aksoy", "Tekin", "Ateş", "Bulut", "Karaca",
+]
+COMPANY_WORDS = ["Anadolu", "Ege", "Marmara", "Boğaziçi", "Toros", "Yıldız", "Kuzey", "Akdeniz", "Başak", "Güven"]
+COMPANY_KINDS = ["İnşaat", "Gıda", "Tekstil", "Lojistik", "Turizm", "Enerji", "Otomotiv", "Yazılım"]
+COMPANY_FORMS = ["Ltd. Şti.", "A.Ş.", "San. ve Tic. A.Ş."]
+CITIES = ["İstanbul", "Ankara", "İzmir", "Bursa", "Antalya", "Konya", "Adana", "Kocaeli", "Gaziantep", "Kayseri"]
+CITY_WEIGHTS = [40, 15, 10, 6, 5, 4, 4, 4, 3, 3]
+DISTRICTS = ["Kadıköy", "Çankaya", "Konak", "Nilüfer", "Muratpaşa", "Selçuklu", "Seyhan", "İzmit", "Şahinbey", "Melikgazi"]
+COURTS = [
+    ("Asliye Hukuk Mahkemesi", 30), ("Sulh Hukuk Mahkemesi", 10), ("İş Mahkemesi", 20),
+    ("Aile Mahkemesi", 15), ("Asliye Ticaret Mahkemesi", 10), ("İcra Hukuk Mahkemesi", 8),
+    ("Tüketici Mahkemesi", 4), ("İdare Mahkemesi", 3),
+]
+CASE_TITLES = [
+    "Alacak davası", "Boşanma davası", "İşçilik alacağı davası", "İşe iade davası", "Kira tespit davası",
+    "Tahliye davası", "Maddi ve manevi tazminat davası", "İtirazın iptali davası", "Menfi tespit davası",
+    "Velayet davası", "Nafaka davası", "Tapu iptali ve tescil davası", "Ortaklığın giderilmesi davası",
+    "Trafik kazası tazminat davası", "İcra takibi", "Tüketici hakem heyeti itirazı", "İptal davası",
+]
+# Cases are mostly open; closed ones pile up with time
+CASE_STATUSES = [status.name for status in (models.CaseStatusEnum.active, models.CaseStatusEnum.pending,
+                                            models.CaseStatusEnum.closed)]
+CASE_STATUS_WEIGHTS = [55, 15, 30]
+# (title, type, minutes or None for all-day deadlines, weight)
+EVENT_KINDS = [
+    ("Duruşma", "hearing", 30, 50),
+    ("Ön inceleme duruşması", "hearing", 30, 8),
+    ("Keşif", "site_visit", 120, 4),
+    ("Bilirkişi incelemesi", "expert_review", 60, 5),
+    ("Müvekkil görüşmesi", "meeting", 60, 15),
+    ("Arabuluculuk toplantısı", "mediation", 90, 6),
+    ("Cevap dilekçesi son gün", "deadline", None, 8),
+    ("İstinaf süresi son gün", "deadline", None, 4),
+]
+# Event starts on weekday office hours, stored as naive UTC (Turkey is UTC+3)
+OFFICE_SLOTS = [(hour - 3) * 60 + minute for hour in range(9, 17) for minute in (0, 15, 30, 45)]
+PAST_DAYS, FUTURE_DAYS = 730, 180
+COURT_KINDS = ("hearing", "site_visit", "expert_review")
+
+CLIENT_COLUMNS = ("id", "user_id", "org_id", "name", "email", "phone", "address", "created_at", "updated_at", "sync_version")
+CASE_COLUMNS = ("id", "user_id", "org_id", "client_id", "case_number", "title", "status", "created_at", "updated_at", "sync_version")
+EVENT_COLUMNS = ("id", "user_id", "org_id", "case_id", "title", "type", "starts_at", "ends_at", "location", "created_at", "sync_version")
+
+
+def ascii_slug(value: str) -> str:
+    value = value.replace("ı", "i").replace("İ", "I")
+    value = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode()
+    return value.lower().replace(" ", ".")
+
+
+def org_sizes(total: int, orgs: int, skew: float, minimum: int = 1) -> list:
+    """Split ``total`` over orgs with weights 1 / rank ** skew, largest first"""
+    weights = [1 / (rank + 1) ** skew for rank in range(orgs)]
+    scale = max(total - minimum * orgs, 0) / sum(weights)
+    sizes = [minimum + int(w * scale) for w in weights]
+    sizes[0] += max(total - sum(sizes), 0)
+    return sizes
+
+
+def next_ids(conn) -> dict:
+    return {
+        table: (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+        for table, model in (("orgs", models.Org), ("users", models.User), ("clients", models.Client),
+                             ("cases", models.Case), ("events", models.Event))
+    }
+
+
+class Generator:
+    def __init__(self, conn, seed: int, password_hash: str, now: datetime):
+        self.conn = conn
+        self.seed = seed
+        self.password_hash = password_hash
+        self.now = now
+        self.ids = next_ids(conn)
+        self.rows = {}
+        # Hearings and meetings only on weekdays
+        self.weekdays = [now - timedelta(days=d) for d in range(-FUTURE_DAYS, PAST_DAYS)
+                         if (now - timedelta(days=d)).weekday() < 5]
+        self.times = {}
+        if conn.dialect.name == "sqlite":
+            # SQLAlchemy's DateTime storage format on SQLite
+            self.timestamp = lambda value: value.isoformat(" ", "microseconds")
+        else:
+            self.timestamp = lambda value: value
+        court_names, court_weights = zip(*COURTS)
+        self.courts = court_names
+        self.court_cumulative = list(accumulate(court_weights))
+        self.event_cumulative = list(accumulate(kind[3] for kind in EVENT_KINDS))
+        self.status_cumulative = list(accumulate(CASE_STATUS_WEIGHTS))
+        self.city_cumulative = list(accumulate(CITY_WEIGHTS))
+
+    def _take(self, table: str, count: int) -> range:
+        start = self.ids[table]
+        self.ids[table] += count
+        return range(start, start + count)
+
+    def _insert(self, table, columns: tuple, rows: list):
+        """Insert tuples in ``columns`` order with one compiled Core statement"""
+        if self.conn.dialect.name == "sqlite":
+            # Values are already in SQLite's storage format; skip per-value type processing
+            statement = str(table.insert().compile(dialect=self.conn.dialect, column_keys=list(columns)))
+            for i in range(0, len(rows), BATCH_SIZE):
+                self.conn.exec_driver_sql(statement, rows[i:i + BATCH_SIZE])
+        else:
+            for i in range(0, len(rows), BATCH_SIZE):
+                self.conn.execute(table.insert(), [dict(zip(columns, row)) for row in rows[i:i + BATCH_SIZE]])
+        self.rows[table.name] = self.rows.get(table.name, 0) + len(rows)
+
+    def org(self, index: int, clients: int, cases: int, events: int):
+        rng = random.Random(f"{self.seed}:{index}")
+        ts = self.timestamp
+        org_id = self._take("orgs", 1)[0]
+        created_at = self.now - timedelta(days=PAST_DAYS + rng.randrange(365))
+        self._insert(models.Org.__table__, ("id", "name", "created_at", "sync_version", "sync_pruned_version"),
+                     [(org_id, f"{rng.choice(LAST_NAMES)} Hukuk Bürosu", ts(created_at), 0, 0)])
+
+        # One lawyer per ~2,000 clients, plus assistants in bigger offices
+        staff = min(1 + clients // 2000, 60)
+        user_ids = list(self._take("users", staff))
+        names = [f"{a} {b}" for a, b in zip(rng.choices(FIRST_NAMES, k=staff), rng.choices(LAST_NAMES, k=staff))]
+        self._insert(models.User.__table__, ("id", "email", "password_hash", "name", "created_at", "updated_at"), [
+            (uid, f"sahip{org_id}@ornek-hukuk.test" if i == 0 else f"{ascii_slug(name)}.{uid}@ornek-hukuk.test",
+             self.password_hash, name, ts(created_at), ts(created_at))
+            for i, (uid, name) in enumerate(zip(user_ids, names))
+        ])
+        roles = ["owner"] + ["assistant" if i % 4 == 3 else "lawyer" for i in range(1, staff)]
+        self._insert(models.Membership.__table__, ("user_id", "org_id", "role", "feed_version"),
+                     [(uid, org_id, role, 0) for uid, role in zip(user_ids, roles)])
+        lawyers = [uid for uid, role in zip(user_ids, roles) if role != "assistant"]
+
+        client_ids = list(self._take("clients", clients))
+        self._insert(models.Client.__table__, CLIENT_COLUMNS,
+                     self._clients(rng, org_id, client_ids, lawyers, ts(created_at)))
+        case_ids = list(self._take("cases", cases))
+        case_rows = self._cases(rng, org_id, case_ids, client_ids, lawyers, ts(created_at))
+        self._insert(models.Case.__table__, CASE_COLUMNS, case_rows)
+        case_users = {row[0]: row[1] for row in case_rows}
+        for start in range(0, events, BATCH_SIZE):
+            count = min(BATCH_SIZE, events - start)
+            self._insert(models.Event.__table__, EVENT_COLUMNS,
+                         self._events(rng, org_id, count, case_ids, case_users, lawyers))
+        return org_id
+
+    def _clients(self, rng, org_id, ids, lawyers, created_at) -> list:
+        n = len(ids)
+        first, last = rng.choices(FIRST_NAMES, k=n), rng.choices(LAST_NAMES, k=n)
+        cities = rng.choices(CITIES, cum_weights=self.city_cumulative, k=n)
+        owners = rng.choices(lawyers, k=n)
+        slugs = {name: ascii_slug(name) for name in FIRST_NAMES + LAST_NAMES + COMPANY_WORDS}
+        rows = []
+        for i, client_id in enumerate(ids):
+            # One in six clients is a company
+            if client_id % 6 == 0:
+                word = COMPANY_WORDS[client_id % 10]
+                name = f"{word} {COMPANY_KINDS[client_id % 8]} {COMPANY_FORMS[client_id % 3]}"
+                email = f"info@{slugs[word]}{client_id}.com.tr"
+            else:
+                name = f"{first[i]} {last[i]}"
+                email = f"{slugs[first[i]]}.{slugs[last[i]]}{client_id % 1000}@example.com" if client_id % 3 else None
+            rows.append((
+                client_id, owners[i], org_id, name, email,
+                f"+90 5{client_id % 50 + 30} {client_id * 7919 % 1000:03d} {client_id % 100:02d} {client_id * 31 % 100:02d}",
+                f"{DISTRICTS[client_id % 10]} Mah. {client_id % 300 + 1}. Sok. No: {client_id % 90 + 1}, {cities[i]}",
+                created_at, created_at, 0,
+            ))
+        return rows
+
+    def _cases(self, rng, org_id, ids, client_ids, lawyers, created_at) -> list:
+        n = len(ids)
+        # Some clients have many files; pick by a skewed index
+        clients = [client_ids[int(len(client_ids) * rng.random() ** 2)] for _ in range(n)]
+        statuses = rng.choices(CASE_STATUSES, cum_weights=self.status_cumulative, k=n)
+        titles = rng.choices(CASE_TITLES, k=n)
+        owners = rng.choices(lawyers, k=n)
+        years = rng.choices(range(self.now.year - PAST_DAYS // 365 - 3, self.now.year + 1), k=n)
+        # case_number is unique across orgs, so the esas number is the case id
+        return [
+            (case_id, owners[i], org_id, clients[i], f"{years[i]}/{case_id} E.", titles[i], statuses[i],
+             created_at, created_at, 0)
+            for i, case_id in enumerate(ids)
+        ]
+
+    def _times(self, day: int, slot: int, minutes: int) -> tuple:
+        """starts_at, ends_at and created_at of an event, formatted once per day, slot and length"""
+        key = (day, slot, minutes)
+        if key not in self.times:
+            ts = self.timestamp
+            starts_at = self.weekdays[day] + timedelta(minutes=slot)
+            self.times[key] = (ts(starts_at), ts(starts_at + timedelta(minutes=minutes)) if minutes else None,
+                               ts(starts_at - timedelta(days=30)))
+        return self.times[key]
+
+    def _events(self, rng, org_id, n, case_ids, case_users, lawyers) -> list:
+        times = self._times
+        ids = self._take("events", n)
+        kinds = rng.choices(EVENT_KINDS, cum_weights=self.event_cumulative, k=n)
+        # Indexes draw the same values as choosing the days themselves
+        days = rng.choices(range(len(self.weekdays)), k=n)
+        slots = rng.choices(OFFICE_SLOTS, k=n)
+        cases = rng.choices(case_ids, k=n) if case_ids else [None] * n
+        courts = rng.choices(self.courts, cum_weights=self.court_cumulative, k=n)
+        cities = rng.choices(CITIES, cum_weights=self.city_cumulative, k=n)
+        rows = []
+        for i, event_id in enumerate(ids):
+            title, kind, minutes, _ = kinds[i]
+            # Half of the client meetings are not about a particular case
+            case_id = cases[i] if kind != "meeting" or event_id % 2 else None
+            starts_at, ends_at, created_at = times(days[i], slots[i], minutes)
+            location = f"{cities[i]} {event_id % 25 + 1}. {courts[i]}" if kind in COURT_KINDS else None
+            rows.append((
+                event_id, case_users[case_id] if case_id else lawyers[event_id % len(lawyers)], org_id, case_id,
+                title, kind, starts_at, ends_at, location, created_at, 0,
+            ))
+        return rows
+
+
+@contextmanager
+def deferred_indexes(conn, tables=("clients", "cases", "events")):
+    """Drop the tables' secondary indexes on SQLite and rebuild them once loaded"""
+    if conn.dialect.name != "sqlite":
+        yield
+        return
+    indexes = conn.exec_driver_sql(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+        f"AND tbl_name IN ({', '.join('?' for _ in tables)})", tuple(tables)
+    ).all()
+    for name, _ in indexes:
+        conn.exec_driver_sql(f'DROP INDEX "{name}"')
+    try:
+        yield
+    finally:
+        started = time.perf_counter()
+        for _, sql in indexes:
+            conn.exec_driver_sql(sql)
+        conn.commit()
+        print(f"Rebuilt {len(indexes)} indexes in {time.perf_counter() - started:.1f}s")
+
+
+@contextmanager
+def deferred_rtree(conn):
+    """Drop the events R*Tree triggers on SQLite and index the loaded events in one pass at the end"""
+    triggers = conn.exec_driver_sql(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'events_rtree_%'"
+    ).all() if conn.dialect.name == "sqlite" else []
+    if not triggers:
+        yield
+        return
+    loaded_after = conn.exec_driver_sql("SELECT COALESCE(MAX(id), 0) FROM events").scalar()
+    for name, _ in triggers:
+        conn.exec_driver_sql(f'DROP TRIGGER "{name}"')
+    try:
+        yield
+    finally:
+        started = time.perf_counter()
+        # Same values as the events_rtree_insert trigger (app/models.py)
+        conn.exec_driver_sql("""INSERT INTO events_rtree (id, starts_min, ends_max)
+            SELECT id,
+                CAST(strftime('%s', starts_at) AS INTEGER) / 60,
+                MAX(CAST(strftime('%s', starts_at) AS INTEGER) / 60,
+                    (CAST(strftime('%s', COALESCE(ends_at, datetime(starts_at, '+1 hour'))) AS INTEGER) + 59) / 60)
+            FROM events WHERE id > ?""", (loaded_after,))
+        for _, sql in triggers:
+            conn.exec_driver_sql(sql)
+        conn.commit()
+        print(f"Indexed events for conflict lookups in {time.perf_counter() - started:.1f}s")
+
+
+def _fast_sqlite(dbapi_connection, connection_record):
+    # Bulk load only: a crash mid-run may corrupt the file
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.execute("PRAGMA journal_mode = MEMORY")
+    cursor.execute("PRAGMA cache_size = -1048576")
+    # Worker threads for sorting while the indexes are rebuilt
+    cursor.execute("PRAGMA threads = 4")
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./bench.db"))
+    parser.add_argument("--create-schema", action="store_true",
+                        help="create missing tables from the models instead of running the migrations")
+    parser.add_argument("--orgs", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=100000, help="total over all orgs")
+    parser.add_argument("--cases", type=int, default=500000, help="total over all orgs")
+    parser.add_argument("--events", type=int, default=2000000, help="total over all orgs")
+    parser.add_argument("--skew", type=float, default=1.0, help="0 gives equal orgs; higher concentrates rows")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="secret123")
+    args = parser.parse_args()
+
+    database_url = args.database_url.replace("postgres://", "postgresql://", 1)
+    engine = create_engine(database_url)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _fast_sqlite)
+    if args.create_schema:
+        Base.metadata.create_all(bind=engine)
+    else:
+        result = migrate(database_url)
+        if result["migrated"]:
+            print(f"Migrated the schema to {', '.join(result['to'])}")
+
+    now = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    # Events go back PAST_DAYS; give them monthly partitions instead of the default one
+    ensure_partitions(engine, since=now - timedelta(days=PAST_DAYS))
+
+    sizes = list(zip(
+        org_sizes(args.clients, args.orgs, args.skew),
+        org_sizes(args.cases, args.orgs, args.skew),
+        org_sizes(args.events, args.orgs, args.skew, minimum=0),
+    ))
+    password_hash = get_password_hash(args.password)
+
+    started = time.perf_counter()
+    with engine.connect() as conn, deferred_indexes(conn), deferred_rtree(conn):
+        generator = Generator(conn, args.seed, password_hash, now)
+        for index, (clients, cases, events) in enumerate(sizes):
+            org_id = generator.org(index, clients, cases, events)
+            conn.commit()
+            total = sum(generator.rows.values())
+            elapsed = time.perf_counter() - started
+            print(f"org {org_id}: {clients:,} clients, {cases:,} cases, {events:,} events "
+                  f"({total:,} rows, {total / elapsed:,.0f} rows/s)")
+
+        if conn.dialect.name == "postgresql":
+            for table in ("orgs", "users", "clients", "cases", "events", "memberships"):
+                conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                                  f"(SELECT max(id) FROM {table}))"))
+            conn.commit()
+
+    total = sum(generator.rows.values())
+    elapsed = time.perf_counter() - started
+    print(f"Generated {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s): "
+          + ", ".join(f"{n:,} {table}" for table, n in generator.rows.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Profile the API's startup: import time per module and time to first response
+
+Runs ``python -X importtime -c "import app.main"`` in fresh interpreters
+(--repeat times, keeping the fastest) and lists the modules with the
+largest cumulative import time, the total per top-level package and the
+app's own modules. --serve additionally starts uvicorn and measures the
+time from launching the process until ``/ping`` first answers, like a cold
+start on Render. Run from the repository root:
+
+    python benchmarks/import_time.py [--top 25] [--serve] [--budget 2.5]
+
+--budget exits with status 1 when importing app.main takes longer than
+that many seconds of wall-clock time.
+"""
+
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import List, NamedTuple
+
+import httpx
+
+ROOT = Path(__file__).parent.parent
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+class Import(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def profile_imports(module: str = "app.main"):
+    """One fresh interpreter importing module: (imports in load order, wall-clock seconds)"""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - started
+    imports = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append(Import(name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return imports, wall
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_response(timeout: float = 30) -> float:
+    """Seconds from launching uvicorn until /ping answers"""
+    port = _free_port()
+    env = {**os.environ, "REMINDERS_ENABLED": "false", "JOBS_IN_PROCESS": "false"}
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                                "--log-level", "warning"], cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/ping", timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                time.sleep(0.005)
+        raise SystemExit("uvicorn did not answer")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def report(imports: List[Import], top: int):
+    print(f"{'module':<48} {'self ms':>9} {'cumul. ms':>10}")
+    for item in sorted(imports, key=lambda i: i.cumulative_us, reverse=True)[:top]:
+        print(f"{'  ' * item.depth + item.module:<48} {item.self_us / 1000:>9.1f} {item.cumulative_us / 1000:>10.1f}")
+
+    packages = defaultdict(int)
+    for item in imports:
+        packages[item.module.split(".")[0]] += item.self_us
+    print(f"\n{'package':<48} {'self ms':>9}")
+    for package, self_us in sorted(packages.items(), key=lambda p: p[1], reverse=True)[:top]:
+        print(f"{package:<48} {self_us / 1000:>9.1f}")
+
+    print(f"\n{'app module':<48} {'self ms':>9} {'cumul. ms':>10}")
+    for item in sorted((i for i in imports if i.module.split(".")[0] == "app"),
+                       key=lambda i: i.cumulative_us, reverse=True):
+        print(f"{item.module:<48} {item.self_us / 1000:>9.1f} {item.cumulative_us / 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters; the fastest is reported")
+    parser.add_argument("--serve", action="store_true", help="also measure uvicorn's time to first response")
+    parser.add_argument("--budget", type=float, help="maximum seconds to import --module")
+    args = parser.parse_args()
+
+    imports, wall = min((profile_imports(args.module) for _ in range(args.repeat)), key=lambda run: run[1])
+    report(imports, args.top)
+    total = sum(item.self_us for item in imports) / 1e6
+    print(f"\nimport {args.module}: {total:.3f}s in {len(imports)} modules, {wall:.3f}s wall-clock with the interpreter")
+    if args.serve:
+        print(f"time to first response: {min(time_to_first_response() for _ in range(args.repeat)):.3f}s")
+    if args.budget is not None and wall > args.budget:
+        print(f"Over the startup budget of {args.budget:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
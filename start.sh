@@ -2,10 +2,10 @@
 
 echo "🚀 Starting AA-PY Backend..."
 
-# Run migrations
+# Run migrations; skipped when the schema is current, one instance at a time otherwise
 echo "📦 Running database migrations..."
-alembic upgrade head || echo "⚠️ Migration failed, continuing..."
+python -m app.migrate || echo "⚠️ Migration failed, continuing..."
 
 # Start the application
 echo "🎯 Starting FastAPI application..."
-uvicorn app.main:app --host 0.0.0.0 --port ${PORT:-8000}
+uvicorn app.main:app --host 0.0.0.0 --port ${PORT:-8000} --timeout-graceful-shutdown 10
@@ -1,4 +1,12 @@
 """Test configuration and fixtures"""
+import os
+
+# Background workers poll the database; tests drive them directly instead
+os.environ.setdefault("REMINDERS_ENABLED", "false")
+os.environ.setdefault("JOBS_IN_PROCESS", "false")
+# Routes over their query budget or running N+1 queries fail the test
+os.environ.setdefault("QUERY_BUDGET_STRICT", "true")
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -6,7 +14,6 @@ from sqlalchemy.orm import sessionmaker
 from app.main import app
 from app.db import Base, get_db
 from app.auth import get_password_hash
-import os
 
 # Test database URL
 TEST_DATABASE_URL = "sqlite:///./test.db"
@@ -58,3 +65,75 @@ def auth_headers(client, test_user):
     response = client.post("/auth/register", json=test_user)
     token = response.json()["access_token"]
     return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def db_session():
+    """Session on a fresh in-memory database with the application schema"""
+    from sqlalchemy.pool import StaticPool
+    from app.database import Base as AppBase
+    from app import models  # noqa: F401
+
+    memory_engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    AppBase.metadata.create_all(bind=memory_engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=memory_engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        memory_engine.dispose()
+
+@pytest.fixture
+def org_user(db_session):
+    """User who owns an organization in the in-memory database"""
+    from app import models
+
+    user = models.User(email="owner@example.com", password_hash=get_password_hash("secret123"), name="Owner")
+    org = models.Org(name="Test Hukuk Bürosu")
+    db_session.add_all([user, org])
+    db_session.flush()
+    db_session.add(models.Membership(user_id=user.id, org_id=org.id, role=models.RoleEnum.owner))
+    db_session.commit()
+    user.current_org_id = org.id
+    user.current_role = models.RoleEnum.owner.value
+    return user
+
+@pytest.fixture
+def api(db_session):
+    """Test client whose routes use the in-memory database, without background services"""
+    from app.database import get_db as app_get_db, get_directory_db
+
+    def override():
+        yield db_session
+
+    app.dependency_overrides[app_get_db] = override
+    app.dependency_overrides[get_directory_db] = override
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(app_get_db, None)
+        app.dependency_overrides.pop(get_directory_db, None)
+
+@pytest.fixture
+def member_headers(db_session, org_user):
+    """Factory of authorization headers for org_user or a new member of its organization"""
+    from app import models
+    from app.auth import create_access_token
+
+    def make(role="owner", user=None):
+        if user is None and role == "owner":
+            user = org_user
+        elif user is None:
+            user = models.User(email=f"{role}{db_session.query(models.User).count()}@example.com",
+                               password_hash="x", name=role.title())
+            db_session.add(user)
+            db_session.flush()
+            db_session.add(models.Membership(user_id=user.id, org_id=org_user.current_org_id, role=role))
+            db_session.commit()
+        token = create_access_token({"user_id": user.id, "org_id": org_user.current_org_id, "role": role})
+        return {"Authorization": f"Bearer {token}"}
+
+    return make
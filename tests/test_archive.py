@@ -0,0 +1,119 @@
+"""Test org archive export and restore"""
+import io
+import json
+import tarfile
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import models
+from app.archive import export_org, restore_archive
+from app.auth import verify_password
+from app.database import Base
+
+
+def seed_org(db, user):
+    """Add a few clients, cases and events to the user's org"""
+    org_id = user.current_org_id
+    for i in range(3):
+        client = models.Client(user_id=user.id, org_id=org_id, name=f"Müvekkil {i}", email=None)
+        db.add(client)
+        db.flush()
+        case = models.Case(user_id=user.id, org_id=org_id, client_id=client.id,
+                           case_number=f"2024/{i + 1}", title=f"Dava {i}")
+        db.add(case)
+        db.flush()
+        db.add(models.Event(user_id=user.id, org_id=org_id, case_id=case.id, title="Duruşma",
+                            starts_at=datetime(2024, 5, 1, 9) + timedelta(days=i)))
+    db.commit()
+
+
+def test_export_writes_chunks_and_manifest(db_session, org_user):
+    """Test archive layout"""
+    seed_org(db_session, org_user)
+    buffer = io.BytesIO()
+    export_org(db_session.get_bind(), org_user.current_org_id, buffer, chunk_rows=2)
+
+    buffer.seek(0)
+    with tarfile.open(fileobj=buffer, mode="r:gz") as tar:
+        names = tar.getnames()
+    assert names[-1] == "manifest.json"
+    assert "clients/00000.jsonl" in names
+    assert "clients/00001.jsonl" in names
+
+
+def test_restore_remaps_ids(db_session, org_user):
+    """Test restoring an archive into a database that already has data"""
+    seed_org(db_session, org_user)
+    buffer = io.BytesIO()
+    export_org(db_session.get_bind(), org_user.current_org_id, buffer, chunk_rows=2)
+
+    target = create_engine("sqlite://")
+    Base.metadata.create_all(bind=target)
+    with target.begin() as conn:
+        conn.execute(models.Org.__table__.insert(), [{"name": "Other"}, {"name": "Another"}])
+
+    buffer.seek(0)
+    summary = restore_archive(target, buffer, org_name="Restored")
+    assert summary["rows"] == {"users": 1, "orgs": 1, "memberships": 1,
+                               "clients": 3, "cases": 3, "events": 3,
+                               "event_exceptions": 0}
+
+    db = sessionmaker(bind=target)()
+    org = db.query(models.Org).filter(models.Org.id == summary["org_id"]).one()
+    assert org.id == 3
+    assert org.name == "Restored"
+    for event in db.query(models.Event).all():
+        assert event.org_id == org.id
+        assert event.case.client.org_id == org.id
+    db.close()
+
+
+def test_restore_rejects_taken_case_numbers(db_session, org_user):
+    """Test restoring next to the source org fails before loading anything"""
+    seed_org(db_session, org_user)
+    buffer = io.BytesIO()
+    export_org(db_session.get_bind(), org_user.current_org_id, buffer)
+    orgs = db_session.query(models.Org).count()
+
+    buffer.seek(0)
+    with pytest.raises(ValueError, match="3 archived case numbers.*: 2024/1, 2024/2, 2024/3"):
+        restore_archive(db_session.get_bind(), buffer)
+    assert db_session.query(models.Org).count() == orgs
+
+
+def test_export_route_is_admin_only_and_leaves_out_hashes(api, db_session, org_user, member_headers):
+    """Test members get 403 and the archive holds current members only, without password hashes"""
+    seed_org(db_session, org_user)
+    lawyer_headers = member_headers("lawyer")
+    # A former member whose events stay in the org
+    former = models.User(email="former@example.com", password_hash="x", name="Former")
+    db_session.add(former)
+    db_session.flush()
+    db_session.add(models.Event(user_id=former.id, org_id=org_user.current_org_id, title="Eski",
+                                starts_at=datetime(2024, 6, 1, 9)))
+    db_session.commit()
+
+    assert api.get("/api/orgs/export", headers=lawyer_headers).status_code == 403
+    response = api.get("/api/orgs/export", headers=member_headers("owner"))
+    assert response.status_code == 200
+
+    with tarfile.open(fileobj=io.BytesIO(response.content), mode="r:gz") as tar:
+        manifest = json.load(tar.extractfile("manifest.json"))
+        users = [dict(zip(manifest["tables"]["users"]["columns"], json.loads(line)))
+                 for line in tar.extractfile("users/00000.jsonl")]
+    assert "password_hash" not in manifest["tables"]["users"]["columns"]
+    assert b"password_hash" not in response.content
+    assert sorted(u["email"] for u in users) == ["lawyer1@example.com", "owner@example.com"]
+
+    target = create_engine("sqlite://")
+    Base.metadata.create_all(bind=target)
+    summary = restore_archive(target, io.BytesIO(response.content))
+    db = sessionmaker(bind=target)()
+    owner = db.query(models.User).filter_by(email="owner@example.com").one()
+    assert owner.password_hash.startswith("!")
+    assert not verify_password("secret123", owner.password_hash)
+    # The former member's event is attributed to the owner
+    assert db.query(models.Event).filter_by(title="Eski").one().user_id == owner.id
+    assert summary["rows"]["users"] == 2
+    db.close()
@@ -0,0 +1,78 @@
+"""Test the write-behind audit log"""
+import asyncio
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import models
+from app.database import Base
+from app.audit import AuditWriter, audit_writer, set_actor
+
+
+def audit_rows(db, entity="clients"):
+    query = db.query(models.AuditLog).filter(models.AuditLog.entity == entity).order_by(models.AuditLog.id)
+    return [(a.entity, a.action, a.user_id, a.changes) for a in query]
+
+
+def test_changes_are_recorded_on_commit(db_session, org_user):
+    """Test create/update/delete are captured per field and rollbacks are not"""
+    set_actor(db_session, org_user.id, org_user.current_org_id)
+    client = models.Client(user_id=org_user.id, org_id=org_user.current_org_id, name="Ayşe")
+    db_session.add(client)
+    db_session.commit()
+
+    client.phone = "555"
+    db_session.flush()
+    db_session.rollback()
+
+    client.name = "Ayşe Yılmaz"
+    db_session.commit()
+    db_session.delete(client)
+    db_session.commit()
+
+    rows = audit_rows(db_session)
+    assert [(entity, action, user_id) for entity, action, user_id, _ in rows] == [
+        ("clients", "create", org_user.id), ("clients", "update", org_user.id), ("clients", "delete", org_user.id)
+    ]
+    assert rows[1][3] == {"name": ["Ayşe", "Ayşe Yılmaz"]}
+    assert rows[0][3]["name"] == [None, "Ayşe"]
+
+
+def test_writer_batches_and_drains_on_stop(tmp_path, monkeypatch):
+    """Test queued records are written in batches and remaining ones on shutdown"""
+    # A file database, since the writer thread needs its own connection
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    writer = AuditWriter(batch_size=10, flush_seconds=0.05)
+    monkeypatch.setattr("app.audit.audit_writer", writer)
+    set_actor(db, 1, 1)
+
+    async def run():
+        await writer.start()
+        for i in range(3):
+            db.add(models.Org(name=f"Büro {i}"))
+            db.commit()
+        await writer.stop()
+
+    asyncio.run(run())
+    assert [action for _, action, _, _ in audit_rows(db, "orgs")] == ["create"] * 3
+    assert audit_writer is not writer
+    db.close()
+    engine.dispose()
+
+
+def test_route_reads_offset_window_as_utc(api, db_session, org_user, member_headers):
+    """Test from/to with a UTC offset select the same entries as naive UTC"""
+    db_session.add(models.AuditLog(org_id=org_user.current_org_id, user_id=org_user.id, entity="clients",
+                                   entity_id=1, action="create", changes={}, created_at=datetime(2030, 5, 6, 9, 0)))
+    db_session.commit()
+    headers = member_headers("owner")
+    for from_, to in (("2030-05-06T08:59:00", "2030-05-06T09:01:00"),
+                      ("2030-05-06T11:59:00+03:00", "2030-05-06T12:01:00+03:00")):
+        response = api.get("/api/audit/", headers=headers, params={"entity": "clients", "from": from_, "to": to})
+        assert response.status_code == 200
+        assert len(response.json()) == 1
+    response = api.get("/api/audit/", headers=headers, params={"entity": "clients", "from": "2030-05-06T09:01:00+03:00"})
+    assert len(response.json()) == 1
+    response = api.get("/api/audit/", headers=headers, params={"entity": "clients", "to": "2030-05-06T11:59:00+03:00"})
+    assert response.json() == []
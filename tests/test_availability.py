@@ -0,0 +1,64 @@
+"""Test free/busy merging and available-slot search"""
+from datetime import datetime, timedelta
+from app import models
+from app.availability import AvailabilityCache, free_slots, load_busy, merge_intervals, union_busy
+
+
+def at(hour, minute=0):
+    return datetime(2030, 5, 6, hour, minute)
+
+
+def test_sweep_line_slots():
+    """Test overlapping and touching busy intervals merge and gaps become slots"""
+    busy = merge_intervals([(at(10), at(11)), (at(9), at(10)), (at(10, 30), at(12)), (at(14), at(15))])
+    assert busy == [(at(9), at(12)), (at(14), at(15))]
+
+    combined = union_busy([busy, [(at(12, 15), at(13))]])
+    slots = free_slots(combined, at(8), at(18), timedelta(minutes=30))
+    assert slots == [(at(8), at(9)), (at(13), at(14)), (at(15), at(18))]
+
+
+def test_load_busy_and_cache(db_session, org_user):
+    """Test busy lists include series and are dropped on the owner's writes"""
+    org_id = org_user.current_org_id
+    for title, starts_at, hours, rrule in [
+        ("Duruşma", at(9), 2, None),
+        ("Bitişsiz", at(16), None, None),
+        ("Önceki gün", at(9) - timedelta(days=1), 1, None),
+        ("Günlük", at(8) - timedelta(days=3), 1, "FREQ=DAILY"),
+    ]:
+        db_session.add(models.Event(user_id=org_user.id, org_id=org_id, title=title, starts_at=starts_at,
+                                    ends_at=starts_at + timedelta(hours=hours) if hours else None, rrule=rrule))
+    db_session.commit()
+
+    busy = load_busy(db_session, org_id, [org_user.id], at(7), at(17))
+    assert busy == {org_user.id: [(at(8), at(11)), (at(16), at(17))]}
+
+    cache = AvailabilityCache()
+    calls = []
+
+    def load(user_ids):
+        calls.append(user_ids)
+        return load_busy(db_session, org_id, user_ids, at(7), at(17))
+
+    assert cache.get(org_id, at(7), at(17), [org_user.id], load) == busy
+    assert cache.get(org_id, at(7), at(17), [org_user.id], load) == busy
+    assert len(calls) == 1
+
+    cache.invalidate(models.Event(user_id=org_user.id, org_id=org_id))
+    cache.get(org_id, at(7), at(17), [org_user.id], load)
+    assert len(calls) == 2
+
+
+def test_route_accepts_offset_window(api, db_session, org_user, member_headers):
+    """Test a Z / +03:00 window is read as naive UTC instead of failing"""
+    db_session.add(models.Event(user_id=org_user.id, org_id=org_user.current_org_id, title="Duruşma",
+                                starts_at=at(9), ends_at=at(10), rrule="FREQ=DAILY;COUNT=2"))
+    db_session.commit()
+    response = api.get("/api/events/availability", headers=member_headers("owner"), params={
+        "users": str(org_user.id), "from": "2030-05-06T08:00:00Z", "to": "2030-05-06T14:00:00+03:00"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["users"][0]["busy"] == [{"starts_at": "2030-05-06T09:00:00", "ends_at": "2030-05-06T10:00:00"}]
+    assert body["slots"] == [{"starts_at": "2030-05-06T08:00:00", "ends_at": "2030-05-06T09:00:00"},
+                             {"starts_at": "2030-05-06T10:00:00", "ends_at": "2030-05-06T11:00:00"}]
@@ -0,0 +1,84 @@
+"""Test calendar range queries and iCalendar feeds"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from app import models
+from app.ical import FeedCache, render_event
+from app.scheduling import overlaps_range
+
+
+def add_event(db, user, title, starts_at, ends_at=None):
+    event = models.Event(user_id=user.id, org_id=user.current_org_id, title=title,
+                         starts_at=starts_at, ends_at=ends_at)
+    db.add(event)
+    db.commit()
+    return event
+
+
+def test_range_includes_overlapping_events(db_session, org_user):
+    """Test events spanning the window edges are included"""
+    march = datetime(2030, 3, 1)
+    april = datetime(2030, 4, 1)
+    add_event(db_session, org_user, "inside", datetime(2030, 3, 10, 9), datetime(2030, 3, 10, 10))
+    add_event(db_session, org_user, "spans start", datetime(2030, 2, 28, 22), datetime(2030, 3, 1, 2))
+    add_event(db_session, org_user, "instant", datetime(2030, 3, 31, 23))
+    add_event(db_session, org_user, "ends at start", datetime(2030, 2, 27), march)
+    add_event(db_session, org_user, "starts at end", april, april + timedelta(hours=1))
+
+    titles = {
+        e.title for e in db_session.query(models.Event).filter(overlaps_range(march, april))
+    }
+    assert titles == {"inside", "spans start", "instant"}
+
+
+def test_render_event_escapes_and_folds():
+    """Test RFC 5545 text escaping and line folding"""
+    event = SimpleNamespace(
+        id=7, title="Duruşma; Ankara, 3. Asliye " + "x" * 80, type=None, location=None,
+        starts_at=datetime(2030, 1, 2, 9), ends_at=None, created_at=datetime(2030, 1, 1)
+    )
+    text = render_event(event)
+    assert "SUMMARY:Duruşma\\; Ankara\\, 3. Asliye" in text
+    assert all(len(line.encode()) <= 75 for line in text.split("\r\n"))
+    assert "DTSTART:20300102T090000Z" in text
+
+
+def test_feed_cache_patches_without_reloading():
+    """Test cached feeds are updated in place on event writes"""
+    cache = FeedCache()
+    event = SimpleNamespace(id=1, user_id=5, org_id=9, title="Toplantı", type=None, location=None,
+                            starts_at=datetime.utcnow() + timedelta(days=1), ends_at=None,
+                            created_at=datetime.utcnow())
+    loads = []
+
+    def load():
+        loads.append(1)
+        return [event]
+
+    body, etag = cache.get(5, 9, load)
+    assert cache.get(5, 9, load) == (body, etag)
+
+    event.title = "Duruşma"
+    cache.upsert_event(event)
+    updated, new_etag = cache.get(5, 9, load)
+    assert new_etag != etag
+    assert b"SUMMARY:Duru" in updated
+
+    cache.remove_event(event)
+    assert b"BEGIN:VEVENT" not in cache.get(5, 9, load)[0]
+    assert len(loads) == 1
+
+
+def test_feed_token_revoked_by_rotation_and_leaving(api, db_session, org_user, member_headers):
+    """Test a rotated feed URL stops working, and so does a removed member's feed"""
+    headers = member_headers("lawyer")
+    membership = db_session.query(models.Membership).filter_by(role=models.RoleEnum.lawyer).one()
+    old_url = api.get("/api/events/feed", headers=headers).json()["url"]
+    assert api.get(old_url).status_code == 200
+
+    new_url = api.post("/api/events/feed/rotate", headers=headers).json()["url"]
+    assert api.get(old_url).status_code == 401
+    assert api.get(new_url).status_code == 200
+
+    db_session.delete(membership)
+    db_session.commit()
+    assert api.get(new_url).status_code == 401
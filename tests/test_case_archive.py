@@ -0,0 +1,40 @@
+"""Test archival of closed cases"""
+from datetime import datetime
+from app import models
+from app.case_archive import archive_closed_cases, restore_case
+
+
+def add_case(db, user, number, status, starts_at):
+    case = models.Case(user_id=user.id, org_id=user.current_org_id, client_id=1,
+                       case_number=number, title=number, status=status)
+    db.add(case)
+    db.flush()
+    db.add(models.Event(user_id=user.id, org_id=user.current_org_id, case_id=case.id,
+                        title=f"Duruşma {number}", starts_at=starts_at))
+    return case
+
+
+def test_archive_and_restore(db_session, org_user):
+    """Test old closed cases move with their events and come back on restore"""
+    db_session.add(models.Client(user_id=org_user.id, org_id=org_user.current_org_id, name="Müvekkil"))
+    old = add_case(db_session, org_user, "2023/1", models.CaseStatusEnum.closed, datetime(2023, 5, 1, 10))
+    open_case = add_case(db_session, org_user, "2023/2", models.CaseStatusEnum.active, datetime(2023, 5, 2, 10))
+    add_case(db_session, org_user, "2026/1", models.CaseStatusEnum.closed, datetime(2026, 5, 1, 10))
+    db_session.commit()
+    old_id, open_id = old.id, open_case.id
+    db_session.query(models.Case).update({"updated_at": datetime(2023, 6, 1)})
+    db_session.commit()
+
+    assert archive_closed_cases(db_session.get_bind(), months=6) == 1
+    db_session.expire_all()
+    assert [c.id for c in db_session.query(models.Case).order_by(models.Case.id)] == [open_id, open_id + 1]
+    archived = db_session.get(models.ArchivedCase, old_id)
+    assert [e.title for e in archived.events] == ["Duruşma 2023/1"]
+    tombstones = db_session.query(models.SyncTombstone.entity).order_by(models.SyncTombstone.id).all()
+    assert [t.entity for t in tombstones] == ["cases", "events"]
+
+    restore_case(db_session, archived)
+    db_session.commit()
+    assert db_session.get(models.Case, old_id).case_number == "2023/1"
+    assert db_session.query(models.Event).filter(models.Event.case_id == old_id).count() == 1
+    assert db_session.query(models.ArchivedEvent).count() == 0
@@ -0,0 +1,68 @@
+"""Test scheduling-conflict detection"""
+from datetime import datetime, timedelta
+from app import models
+from app.conflicts import find_conflicts
+
+
+def add_event(db, user, title, starts_at, hours=1, **kwargs):
+    event = models.Event(user_id=user.id, org_id=user.current_org_id, title=title, starts_at=starts_at,
+                         ends_at=starts_at + timedelta(hours=hours) if hours else None, **kwargs)
+    db.add(event)
+    db.commit()
+    return event
+
+
+def probe(user, starts_at, hours=1, **kwargs):
+    return models.Event(user_id=user.id, org_id=user.current_org_id, title="Yeni", starts_at=starts_at,
+                        ends_at=starts_at + timedelta(hours=hours), **kwargs)
+
+
+def test_overlaps_by_user_and_location(db_session, org_user):
+    """Test half-open overlap per user and per location"""
+    other = models.User(email="other@example.com", password_hash="x")
+    db_session.add(other)
+    db_session.commit()
+    other.current_org_id = org_user.current_org_id
+
+    nine = datetime(2030, 5, 6, 9)
+    add_event(db_session, org_user, "Duruşma", nine)
+    add_event(db_session, org_user, "Bitişik", nine + timedelta(hours=2))
+    add_event(db_session, other, "Salon", nine, location="Salon 4")
+    add_event(db_session, other, "Başka", nine)
+
+    conflicts = find_conflicts(db_session, probe(org_user, nine + timedelta(minutes=30), location="Salon 4"))
+    assert sorted((c.event.title, c.reason) for c in conflicts) == [("Duruşma", "user"), ("Salon", "location")]
+
+    # Touching intervals do not conflict
+    assert find_conflicts(db_session, probe(org_user, nine + timedelta(hours=1))) == []
+
+
+def test_open_ended_events_and_series(db_session, org_user):
+    """Test events without an end and recurring series are considered"""
+    monday = datetime(2030, 5, 6, 9)
+    add_event(db_session, org_user, "Bitişsiz", monday, hours=None)
+    add_event(db_session, org_user, "Haftalık", monday - timedelta(weeks=4), rrule="FREQ=WEEKLY")
+
+    conflicts = find_conflicts(db_session, probe(org_user, monday + timedelta(weeks=1, minutes=45)))
+    assert [(c.event.title, c.recurrence_id) for c in conflicts] == [("Haftalık", monday + timedelta(weeks=1))]
+
+    titles = sorted(c.event.title for c in find_conflicts(db_session, probe(org_user, monday + timedelta(minutes=59))))
+    assert titles == ["Bitişsiz", "Haftalık"]
+
+
+def test_create_and_update_accept_offset_datetimes(api, db_session, org_user, member_headers):
+    """Test +03:00 bodies are stored as naive UTC and checked against series without a 500"""
+    headers = member_headers("owner")
+    add_event(db_session, org_user, "Haftalık", datetime(2026, 11, 2, 7), rrule="FREQ=WEEKLY;COUNT=4")
+
+    response = api.post("/api/events/", headers=headers, json={
+        "title": "Duruşma", "starts_at": "2026-11-09T10:00:00+03:00", "ends_at": "2026-11-09T11:00:00+03:00"})
+    assert response.status_code == 200
+    created = response.json()
+    assert created["starts_at"] == "2026-11-09T07:00:00"
+    assert [c["recurrence_id"] for c in created["conflicts"]] == ["2026-11-09T07:00:00"]
+
+    response = api.put(f"/api/events/{created['id']}", headers=headers,
+                       json={"starts_at": "2026-11-10T09:00:00Z", "ends_at": "2026-11-10T10:00:00Z"})
+    assert response.status_code == 200
+    assert (response.json()["starts_at"], response.json()["conflicts"]) == ("2026-11-10T09:00:00", [])
@@ -0,0 +1,45 @@
+"""Test memory diagnostics routes"""
+import tracemalloc
+from fastapi.testclient import TestClient
+from app import diagnostics, models
+from app.main import app
+
+client = TestClient(app)
+AUTH = {"Authorization": "Bearer diag-secret"}
+
+# Kept alive between snapshots so the diff has something to find
+retained = []
+
+
+def test_routes_disabled_without_token(monkeypatch):
+    """Test the routes are hidden unless DIAGNOSTICS_TOKEN is set and sent"""
+    monkeypatch.setattr(diagnostics, "DIAGNOSTICS_TOKEN", None)
+    assert client.get("/api/diagnostics/memory", headers=AUTH).status_code == 404
+    monkeypatch.setattr(diagnostics, "DIAGNOSTICS_TOKEN", "diag-secret")
+    assert client.get("/api/diagnostics/memory").status_code == 401
+
+
+def test_snapshot_diff_and_session_report(monkeypatch, db_session, org_user):
+    """Test a diff points at the line that allocated and sessions are counted"""
+    monkeypatch.setattr(diagnostics, "DIAGNOSTICS_TOKEN", "diag-secret")
+    try:
+        assert client.post("/api/diagnostics/tracemalloc/start", headers=AUTH).json()["tracing"]
+        first = client.post("/api/diagnostics/tracemalloc/snapshots", headers=AUTH).json()
+        retained.extend(bytearray(1000) for _ in range(2000))
+        second = client.post("/api/diagnostics/tracemalloc/snapshots", headers=AUTH).json()
+        assert second["size"] - first["size"] >= 2000 * 1000
+        assert client.get("/api/diagnostics/memory", headers=AUTH).json()["tracemalloc"]["snapshots"][-2:] == [first, second]
+
+        changes = client.get(f"/api/diagnostics/tracemalloc/diff?from={first['id']}", headers=AUTH).json()["changes"]
+        top = max(changes, key=lambda change: change["size_diff"])
+        assert top["file"] == __file__ and top["count_diff"] >= 2000
+    finally:
+        client.post("/api/diagnostics/tracemalloc/stop", headers=AUTH)
+        retained.clear()
+    assert not tracemalloc.is_tracing()
+
+    db_session.query(models.User).all()
+    report = client.get("/api/diagnostics/memory", headers=AUTH).json()
+    assert report["sessions"]["open"] >= 1
+    assert report["sessions"]["identity_map_by_class"]["User"] >= 1
+    assert "default" in report["pools"]
@@ -24,3 +24,45 @@ def test_api_health(client):
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
+
+def test_readiness_checks_database_and_migrations(client, tmp_path, monkeypatch):
+    """Test readiness reports each check with its latency and fails until migrated"""
+    from sqlalchemy import create_engine
+    from app.health import ReadinessProbe
+    from app.migrate import migrate
+
+    url = f"sqlite:///{tmp_path}/ready.db"
+    engine = create_engine(url)
+    probe = ReadinessProbe(engines=lambda: {"default": engine}, ttl=0)
+    monkeypatch.setattr("app.main.readiness", probe)
+
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["checks"]["migrations"]["status"] == "fail"
+
+    migrate(url)
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    checks = response.json()["checks"]
+    assert set(checks) == {"pool", "database", "migrations"}
+    assert all(check["status"] == "ok" and check["latency_ms"] >= 0 for check in checks.values())
+    assert client.get("/health/live").json()["status"] == "alive"
+
+def test_readiness_is_cached_and_skips_a_saturated_pool(tmp_path):
+    """Test probes within the ttl reuse one result and a full pool is not waited on"""
+    from sqlalchemy import create_engine, event
+    from app.health import ReadinessProbe
+
+    engine = create_engine(f"sqlite:///{tmp_path}/ready.db", pool_size=1, max_overflow=0, pool_timeout=5)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    probe = ReadinessProbe(engines=lambda: {"default": engine}, ttl=60)
+    assert probe.result() is probe.result()
+    assert statements.count("SELECT 1") == 1
+
+    probe.invalidate()
+    with engine.connect():
+        result = probe.result()
+    assert result["status"] == "not_ready"
+    assert result["checks"]["pool"]["saturation"] == 1.0
+    assert result["checks"]["database"]["status"] == "skipped"
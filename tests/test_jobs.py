@@ -0,0 +1,84 @@
+"""Test the database-backed job queue"""
+from datetime import datetime, timedelta
+from app import models
+from app.jobs import Worker, enqueue, job_handler
+
+
+@job_handler("test_echo")
+def echo_job(job, db):
+    if job.payload.get("fail"):
+        raise RuntimeError("boom")
+    return {"echo": job.payload}
+
+
+def test_claim_order_and_org_limit(db_session, org_user):
+    """Test higher priority runs first and an org never exceeds its running limit"""
+    org_id = org_user.current_org_id
+    low = enqueue(db_session, "test_echo", org_id=org_id)
+    high = enqueue(db_session, "test_echo", org_id=org_id, priority=5)
+    later = enqueue(db_session, "test_echo", org_id=org_id, priority=9,
+                    run_at=datetime.utcnow() + timedelta(hours=1))
+    other = enqueue(db_session, "test_echo")
+
+    first = Worker(bind=db_session.get_bind(), name="a", per_org=1)
+    second = Worker(bind=db_session.get_bind(), name="b", per_org=1)
+    assert first.claim() == high.id
+    # The org is at its limit, so only the org-less job is claimable
+    assert second.claim() == other.id
+    assert second.claim() is None
+
+    first.execute(high.id)
+    assert second.claim() == low.id
+    db_session.expire_all()
+    assert db_session.get(models.Job, high.id).status == models.JobStatusEnum.succeeded
+    assert db_session.get(models.Job, high.id).result == {"echo": {}}
+    assert db_session.get(models.Job, later.id).status == models.JobStatusEnum.queued
+
+
+def test_retry_backoff_then_failure(db_session):
+    """Test a failing job is retried later and fails after max_attempts"""
+    job = enqueue(db_session, "test_echo", payload={"fail": True}, max_attempts=2)
+    worker = Worker(bind=db_session.get_bind(), name="w")
+
+    assert worker.run_once()
+    db_session.refresh(job)
+    assert (job.status, job.attempts) == (models.JobStatusEnum.queued, 1)
+    assert job.run_at > datetime.utcnow() and "boom" in job.error
+    assert not worker.run_once()
+
+    job.run_at = datetime.utcnow()
+    db_session.commit()
+    assert worker.run_once()
+    db_session.refresh(job)
+    assert (job.status, job.attempts) == (models.JobStatusEnum.failed, 2)
+
+
+def test_reap_requeues_stalled_jobs(db_session):
+    """Test jobs of a worker that stopped heartbeating go back to the queue"""
+    job = enqueue(db_session, "test_echo")
+    worker = Worker(bind=db_session.get_bind(), name="dead", lease_seconds=60)
+    assert worker.claim() == job.id
+
+    job.locked_at = datetime.utcnow() - timedelta(minutes=5)
+    db_session.commit()
+    assert Worker(bind=db_session.get_bind(), lease_seconds=60).reap() == 1
+    db_session.refresh(job)
+    assert (job.status, job.locked_by) == (models.JobStatusEnum.queued, None)
+
+
+def test_members_cannot_read_org_exports(api, db_session, org_user, member_headers):
+    """Test only admins see an org export job; a member gets 403 and their own jobs only"""
+    org_id = org_user.current_org_id
+    export = enqueue(db_session, "org_export", org_id=org_id, user_id=org_user.id)
+    lawyer = member_headers("lawyer")
+    lawyer_id = db_session.query(models.Membership).filter_by(role=models.RoleEnum.lawyer).one().user_id
+    own = enqueue(db_session, "test_echo", org_id=org_id, user_id=lawyer_id)
+
+    assert [job["id"] for job in api.get("/api/jobs/", headers=lawyer).json()] == [own.id]
+    assert api.get(f"/api/jobs/{export.id}", headers=lawyer).status_code == 403
+    assert api.get(f"/api/jobs/{export.id}/download", headers=lawyer).status_code == 403
+    assert api.get(f"/api/jobs/{own.id}", headers=lawyer).status_code == 200
+
+    owner = member_headers("owner")
+    assert {job["id"] for job in api.get("/api/jobs/", headers=owner).json()} == {export.id, own.id}
+    assert api.get(f"/api/jobs/{export.id}", headers=owner).status_code == 200
@@ -0,0 +1,39 @@
+"""Test simulated database latency"""
+import time
+from sqlalchemy import create_engine, text
+from app.latency import LatencyInjector, inject_latency
+
+
+def test_statements_wait_for_latency_inside_the_block_only():
+    """Test each statement sleeps while injecting and not afterwards"""
+    engine = create_engine("sqlite://")
+    with engine.connect() as conn:
+        with inject_latency(20, target=engine) as injector:
+            started = time.perf_counter()
+            for _ in range(3):
+                conn.execute(text("SELECT 1"))
+            assert time.perf_counter() - started >= 0.06
+        assert injector.round_trips == 3
+
+        started = time.perf_counter()
+        conn.execute(text("SELECT 1"))
+        assert time.perf_counter() - started < 0.02
+        assert injector.round_trips == 3
+
+
+def test_roundtrip_mode_counts_connects_and_transaction_ends():
+    """Test connects, commits and rollbacks cost round trips and jitter is seeded"""
+    engine = create_engine("sqlite://")
+    with inject_latency(0.1, jitter_ms=0.05, per="roundtrip", target=engine, seed=1) as injector:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT 1"))
+        # Three handshake round trips, the statement and the commit
+        assert injector.round_trips == 5
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        # The statement and the rollback on close
+        assert injector.round_trips == 7
+
+    replay = LatencyInjector(0.1, jitter_ms=0.05, seed=1)
+    replay.delay(7)
+    assert replay.slept == injector.slept
@@ -0,0 +1,51 @@
+"""Test request metrics"""
+import json
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.metrics import MetricsMiddleware, Registry, render, write_snapshot
+
+
+def make_app(registry):
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, registry=registry)
+
+    @app.get("/cases/{case_id}")
+    def get_case(case_id: int):
+        return {"id": case_id}
+
+    return app
+
+
+def test_counts_by_route_template():
+    """Test requests are grouped by route template, not raw path"""
+    registry = Registry()
+    client = TestClient(make_app(registry))
+    for case_id in (1, 2, 3):
+        client.get(f"/cases/{case_id}")
+    client.get("/cases/abc")
+    client.get("/missing")
+
+    text = render(registry, directory=None)
+    assert 'http_requests_total{method="GET",route="/cases/{case_id}",status="200"} 3' in text
+    assert 'http_requests_total{method="GET",route="/cases/{case_id}",status="422"} 1' in text
+    assert 'http_requests_total{method="GET",route="<unmatched>",status="404"} 1' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/cases/{case_id}",le="+Inf"} 4' in text
+    assert 'http_requests_in_progress{method="GET"} 0' in text
+
+
+def test_aggregates_worker_snapshots(tmp_path):
+    """Test /metrics sums the snapshots of all workers, gauges only of live ones"""
+    registry = Registry()
+    TestClient(make_app(registry)).get("/cases/1")
+    write_snapshot(registry, str(tmp_path))
+    # Snapshot left by an exited worker
+    (tmp_path / "999999999.json").write_text(json.dumps({
+        "pid": 999999999,
+        "routes": [["/cases/{case_id}", "GET", [1] + [0] * 11, 0.001, 1, {"200": 1}]],
+        "in_progress": {"GET": 5},
+    }))
+
+    text = render(registry, directory=str(tmp_path))
+    assert 'http_requests_total{method="GET",route="/cases/{case_id}",status="200"} 2' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/cases/{case_id}"} 2' in text
+    assert 'http_requests_in_progress{method="GET"} 0' in text
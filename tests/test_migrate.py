@@ -0,0 +1,33 @@
+"""Test migrations at boot"""
+import subprocess
+import sys
+from pathlib import Path
+from app.migrate import alembic_config, migrate, target_revisions
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_migrates_once_then_skips(tmp_path):
+    """Test a fresh database is upgraded to the target and a current one is left alone"""
+    url = f"sqlite:///{tmp_path}/app.db"
+    first = migrate(url)
+    assert first["migrated"] and first["from"] == ()
+    assert first["to"] == target_revisions(alembic_config())
+
+    second = migrate(url)
+    assert not second["migrated"]
+    assert second["to"] == first["to"]
+
+
+def test_concurrent_migrators_let_one_migrate(tmp_path):
+    """Test instances booting together wait for the first one instead of racing it"""
+    url = f"sqlite:///{tmp_path}/app.db"
+    processes = [
+        subprocess.Popen([sys.executable, "-m", "app.migrate", "--database-url", url], cwd=ROOT,
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for _ in range(3)
+    ]
+    outputs = [process.communicate()[0] for process in processes]
+    assert [process.returncode for process in processes] == [0, 0, 0]
+    assert sum("Migrated an empty database" in output for output in outputs) == 1
+    assert sum("nothing to migrate" in output for output in outputs) == 2
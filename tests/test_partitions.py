@@ -0,0 +1,117 @@
+"""Test monthly event partition helpers
+
+The Postgres test runs migration 010 on the database in TEST_POSTGRES_URL,
+dropping everything in its public schema first.
+"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.migrate import migrate
+from app.partitions import (add_months, ensure_partitions, events_partitioned, existing_partitions, month_start,
+                            partition_name, partitioned, partitioned_engine)
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+def test_month_arithmetic():
+    """Test month boundaries used for partition ranges"""
+    assert month_start(datetime(2026, 10, 19, 15, 30)) == datetime(2026, 10, 1)
+    assert add_months(datetime(2026, 11, 1), 2) == datetime(2027, 1, 1)
+    assert add_months(datetime(2026, 1, 1), -1) == datetime(2025, 12, 1)
+    assert partition_name(datetime(2027, 3, 1)) == "events_2027_03"
+
+
+def test_sqlite_keeps_single_table(db_session):
+    """Test SQLite is left unpartitioned"""
+    bind = db_session.get_bind()
+    assert not events_partitioned(bind.dialect)
+    assert ensure_partitions(bind) == []
+
+
+postgres = pytest.mark.skipif(not TEST_POSTGRES_URL, reason="set TEST_POSTGRES_URL to a throwaway Postgres database")
+
+
+def migrate_empty(engine, target="010_partition_events"):
+    with engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+    migrate(TEST_POSTGRES_URL, target)
+
+
+@postgres
+def test_postgres_migration_routes_months_and_cascades():
+    """Test migration 010 on Postgres: rows land in their month's partition and deletes reach dependents"""
+    engine = create_engine(TEST_POSTGRES_URL)
+    try:
+        migrate_empty(engine)
+        assert partitioned_engine(engine)
+
+        this_month = month_start(datetime.utcnow())
+        next_month = add_months(this_month, 1)
+        far_future = add_months(this_month, 5 * 12)
+        with engine.begin() as conn:
+            assert partitioned(conn)
+            assert {partition_name(this_month), partition_name(next_month), "events_default"} <= existing_partitions(conn)
+            user_id = conn.execute(text(
+                "INSERT INTO users (email, password_hash) VALUES ('pg@example.com', 'x') RETURNING id")).scalar()
+            org_id = conn.execute(text("INSERT INTO orgs (name) VALUES ('Test') RETURNING id")).scalar()
+            ids = {}
+            for starts_at in (this_month + timedelta(days=3), next_month + timedelta(days=3), far_future):
+                ids[starts_at] = conn.execute(text(
+                    "INSERT INTO events (user_id, org_id, title, starts_at) "
+                    "VALUES (:user_id, :org_id, 'Duruşma', :starts_at) RETURNING id"
+                ), {"user_id": user_id, "org_id": org_id, "starts_at": starts_at}).scalar()
+            placed = dict(conn.execute(text("SELECT id, tableoid::regclass::text FROM events")).all())
+            assert placed == {
+                ids[this_month + timedelta(days=3)]: partition_name(this_month),
+                ids[next_month + timedelta(days=3)]: partition_name(next_month),
+                ids[far_future]: "events_default",
+            }
+
+            event_id = ids[next_month + timedelta(days=3)]
+            conn.execute(text(
+                "INSERT INTO event_exceptions (event_id, original_start, cancelled) VALUES (:id, :start, true)"
+            ), {"id": event_id, "start": next_month + timedelta(days=3)})
+            conn.execute(text(
+                "INSERT INTO reminder_deliveries (event_id, occurrence_start, minutes_before) VALUES (:id, :start, 30)"
+            ), {"id": event_id, "start": next_month + timedelta(days=3)})
+            conn.execute(text("DELETE FROM events WHERE id = :id"), {"id": event_id})
+            assert conn.execute(text("SELECT count(*) FROM event_exceptions")).scalar() == 0
+            assert conn.execute(text("SELECT count(*) FROM reminder_deliveries")).scalar() == 0
+
+        # Creating the far month's partition moves its row out of events_default
+        assert partition_name(far_future) in ensure_partitions(engine, months_ahead=5 * 12)
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT tableoid::regclass::text FROM events WHERE id = :id"),
+                                {"id": ids[far_future]}).scalar() == partition_name(far_future)
+    finally:
+        engine.dispose()
+
+
+@postgres
+def test_postgres_migration_honours_partition_flag(monkeypatch):
+    """Test PARTITION_EVENTS=false keeps one events table with cascading foreign keys"""
+    monkeypatch.setenv("PARTITION_EVENTS", "false")
+    engine = create_engine(TEST_POSTGRES_URL)
+    try:
+        migrate_empty(engine, "001_initial@head")
+        assert not partitioned_engine(engine)
+        with engine.begin() as conn:
+            assert not partitioned(conn)
+            user_id = conn.execute(text(
+                "INSERT INTO users (email, password_hash) VALUES ('pg@example.com', 'x') RETURNING id")).scalar()
+            org_id = conn.execute(text("INSERT INTO orgs (name) VALUES ('Test') RETURNING id")).scalar()
+            event_id = conn.execute(text(
+                "INSERT INTO events (user_id, org_id, title, starts_at) VALUES (:user_id, :org_id, 'Duruşma', now()) "
+                "RETURNING id"), {"user_id": user_id, "org_id": org_id}).scalar()
+            conn.execute(text(
+                "INSERT INTO event_exceptions (event_id, original_start, cancelled) VALUES (:id, now(), true)"
+            ), {"id": event_id})
+            conn.execute(text("DELETE FROM events WHERE id = :id"), {"id": event_id})
+            assert conn.execute(text("SELECT count(*) FROM event_exceptions")).scalar() == 0
+        assert ensure_partitions(engine) == []
+    finally:
+        engine.dispose()
@@ -0,0 +1,59 @@
+"""Test on-demand request profiling"""
+import json
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.auth import create_access_token
+from app.profiling import ProfilingMiddleware
+
+
+def busy_handler(seconds: float = 0.1):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+    return {"ok": True}
+
+
+def make_app(directory, sample_rate: float = 0.0):
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, directory=str(directory), sample_rate=sample_rate, interval=0.002)
+
+    @app.get("/busy")
+    def busy():
+        return busy_handler()
+
+    return app
+
+
+def token(role: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'user_id': 1, 'org_id': 1, 'role': role})}"}
+
+
+def test_admin_gets_inline_profile_of_threadpool_work(tmp_path):
+    """Test an admin's request is profiled, including the sync endpoint's thread"""
+    client = TestClient(make_app(tmp_path))
+    response = client.get("/busy", headers={**token("admin"), "X-Profile": "inline"})
+    assert response.headers["x-profiled-status"] == "200"
+    profile = response.json()
+    names = {frame["name"] for frame in profile["shared"]["frames"]}
+    assert "busy_handler" in names
+    assert all(p["type"] == "sampled" and len(p["samples"]) == len(p["weights"]) for p in profile["profiles"])
+
+    response = client.get("/busy", headers={**token("owner"), "X-Profile": "1"})
+    assert response.json() == {"ok": True}
+    with open(tmp_path / response.headers["x-profile"]) as f:
+        assert json.load(f)["profiles"]
+
+
+def test_header_ignored_for_other_roles_and_sampling_saves(tmp_path):
+    """Test non-admins cannot profile on demand while sampled requests are saved quietly"""
+    client = TestClient(make_app(tmp_path))
+    response = client.get("/busy", headers={**token("lawyer"), "X-Profile": "inline"})
+    assert response.json() == {"ok": True}
+    assert "x-profile" not in response.headers
+    assert not list(tmp_path.iterdir())
+
+    client = TestClient(make_app(tmp_path, sample_rate=1.0))
+    response = client.get("/busy")
+    assert "x-profile" not in response.headers
+    assert len(list(tmp_path.glob("*.speedscope.json"))) == 1
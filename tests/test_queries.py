@@ -0,0 +1,50 @@
+"""Test per-request SQL query accounting"""
+import logging
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from app.queries import QueryBudgetExceeded, QueryStatsMiddleware, count_queries, query_budget
+
+
+def make_app(strict: bool):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware, strict=strict, threshold=5)
+
+    @app.get("/items")
+    @query_budget(3)
+    def items(n: int = 1):
+        # One lookup per item, as a lazy-loaded relationship would do
+        with engine.connect() as conn:
+            return [conn.execute(text("SELECT :i"), {"i": i}).scalar() for i in range(n)]
+
+    return app
+
+
+def test_reports_queries_and_n_plus_one(caplog):
+    """Test statement counts are reported and repeated statements logged"""
+    client = TestClient(make_app(strict=False))
+    response = client.get("/items?n=2")
+    assert response.headers["x-db-queries"] == "2"
+    assert response.headers["server-timing"].startswith("db;dur=")
+
+    with caplog.at_level(logging.WARNING, logger="app.queries"):
+        client.get("/items?n=6")
+    assert "6 queries, budget 3" in caplog.text
+    assert "N+1: 6x SELECT ?" in caplog.text
+
+
+def test_strict_mode_fails_over_budget(db_session):
+    """Test strict mode raises for a route over its budget"""
+    client = TestClient(make_app(strict=True))
+    assert client.get("/items?n=3").status_code == 200
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/items?n=4")
+
+    # Code outside requests is counted explicitly
+    with count_queries() as stats:
+        db_session.execute(text("SELECT 1"))
+        db_session.execute(text("SELECT 2"))
+    assert stats.count == 2
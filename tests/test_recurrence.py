@@ -0,0 +1,91 @@
+"""Test recurrence rules and occurrence expansion"""
+from datetime import datetime, timedelta
+from itertools import islice
+from types import SimpleNamespace
+import pytest
+from app import models
+from app.recurrence import count_occurrences, expand, iter_starts, parse_rrule, series_end
+
+
+def series(rrule, starts_at, ends_at=None, exceptions=()):
+    return SimpleNamespace(id=1, user_id=1, org_id=1, case_id=None, case=None, type=None,
+                           title="Toplantı", location=None, rrule=rrule, created_at=starts_at,
+                           starts_at=starts_at, ends_at=ends_at, exceptions=list(exceptions))
+
+
+def test_parse_rejects_unsupported_rules():
+    """Test invalid RRULE values raise ValueError"""
+    for text in ("FREQ=HOURLY", "FREQ=DAILY;COUNT=2;UNTIL=20300101", "FREQ=MONTHLY;BYDAY=MO",
+                 "FREQ=WEEKLY;BYSETPOS=1", "FREQ=DAILY;INTERVAL=0"):
+        with pytest.raises(ValueError):
+            parse_rrule(text)
+
+
+@pytest.mark.parametrize("rrule", [
+    "FREQ=DAILY;INTERVAL=3",
+    "FREQ=WEEKLY;BYDAY=MO,TH",
+    "FREQ=WEEKLY;INTERVAL=2",
+    "FREQ=MONTHLY",
+    "FREQ=YEARLY",
+])
+def test_skip_ahead_matches_full_walk(rrule):
+    """Test jumping to a later window yields the same occurrences as walking"""
+    rule = parse_rrule(rrule)
+    dtstart = datetime(2024, 1, 31, 9)
+    after = datetime(2031, 6, 15)
+    walked = [s for s in islice(iter_starts(rule, dtstart), 5000) if s >= after][:5]
+    assert list(islice(iter_starts(rule, dtstart, after=after), 5)) == walked
+
+
+def test_monthly_skips_missing_days_and_count_bounds_series():
+    """Test RFC 5545 month-end behaviour and COUNT end"""
+    rule = parse_rrule("FREQ=MONTHLY;COUNT=3")
+    starts = list(iter_starts(rule, datetime(2024, 1, 31, 9)))
+    assert starts == [datetime(2024, 1, 31, 9), datetime(2024, 3, 31, 9), datetime(2024, 5, 31, 9)]
+    assert series_end(rule, starts[0], starts[0] + timedelta(hours=1)) == datetime(2024, 5, 31, 10)
+    assert series_end(parse_rrule("FREQ=DAILY"), starts[0], None) is None
+
+
+def test_expand_applies_exceptions():
+    """Test cancelled and moved occurrences inside a window"""
+    start = datetime(2030, 1, 7, 9)  # Monday
+    event = series("FREQ=WEEKLY", start, start + timedelta(hours=1), exceptions=[
+        SimpleNamespace(original_start=datetime(2030, 1, 14, 9), cancelled=True,
+                        title=None, starts_at=None, ends_at=None, location=None),
+        SimpleNamespace(original_start=datetime(2030, 1, 21, 9), cancelled=False,
+                        title="Ertelendi", starts_at=datetime(2030, 2, 5, 9), ends_at=None, location=None),
+    ])
+
+    window = list(expand(event, datetime(2030, 2, 1), datetime(2030, 2, 12)))
+    assert [(o.title, o.starts_at) for o in window] == [
+        ("Toplantı", datetime(2030, 2, 4, 9)),
+        ("Ertelendi", datetime(2030, 2, 5, 9)),
+        ("Toplantı", datetime(2030, 2, 11, 9)),
+    ]
+    assert window[1].ends_at == datetime(2030, 2, 5, 10)
+    assert window[1].recurrence_id == datetime(2030, 1, 21, 9)
+
+    # An open-ended series is only walked as far as the window
+    assert count_occurrences([event], datetime(2030, 1, 1), datetime(2031, 1, 1)) == 51
+
+
+def test_routes_accept_offset_datetimes(api, db_session, org_user, member_headers):
+    """Test UTC and +03:00 query and path datetimes are read as the stored naive UTC"""
+    headers = member_headers("owner")
+    db_session.add(models.Event(user_id=org_user.id, org_id=org_user.current_org_id, title="Haftalık",
+                                starts_at=datetime(2026, 10, 5, 7), ends_at=datetime(2026, 10, 5, 8),
+                                rrule="FREQ=WEEKLY;COUNT=4"))
+    db_session.commit()
+    series_id = db_session.query(models.Event).one().id
+
+    response = api.get("/api/events/", headers=headers,
+                       params={"from": "2026-10-01T00:00:00Z", "to": "2026-10-13T03:00:00+03:00"})
+    assert response.status_code == 200
+    assert [e["starts_at"] for e in response.json()] == ["2026-10-05T07:00:00", "2026-10-12T07:00:00"]
+
+    occurrence = f"/api/events/{series_id}/occurrences/2026-10-12T10:00:00+03:00"
+    response = api.put(occurrence, headers=headers, json={"starts_at": "2026-10-12T12:00:00+03:00"})
+    assert response.status_code == 200
+    assert response.json()["starts_at"] == "2026-10-12T09:00:00"
+    assert api.delete(f"/api/events/{series_id}/occurrences/2026-10-19T07:00:00Z",
+                      headers=headers).status_code == 200
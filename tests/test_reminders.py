@@ -0,0 +1,85 @@
+"""Test reminder scheduling and delivery claims"""
+from datetime import datetime, timedelta
+from sqlalchemy.orm import sessionmaker
+from app import models
+from app.reminders import ReminderScheduler, event_reminders
+
+
+class ListSink:
+    def __init__(self):
+        self.delivered = []
+
+    def deliver(self, reminder):
+        self.delivered.append(reminder)
+
+
+def test_event_reminders_for_series():
+    """Test reminders are generated per occurrence and lead time"""
+    event = models.Event(id=1, user_id=1, org_id=1, title="Haftalık", starts_at=datetime(2030, 5, 6, 9),
+                         rrule="FREQ=WEEKLY")
+    event.exceptions = []
+    reminders = event_reminders(event, datetime(2030, 5, 13, 8), datetime(2030, 5, 13, 9), [60, 15])
+    assert [(r.starts_at, r.minutes_before) for r in reminders] == [
+        (datetime(2030, 5, 13, 9), 60), (datetime(2030, 5, 13, 9), 15)
+    ]
+    assert reminders[0].fire_at == datetime(2030, 5, 13, 8)
+
+
+def test_delivery_is_claimed_once(db_session, org_user):
+    """Test a reminder is sent once even when two workers fire it"""
+    starts_at = datetime.utcnow().replace(microsecond=0) + timedelta(minutes=62)
+    event = models.Event(user_id=org_user.id, org_id=org_user.current_org_id, title="Duruşma", starts_at=starts_at)
+    db_session.add(event)
+    db_session.commit()
+
+    workers = []
+    for _ in range(2):
+        scheduler = ReminderScheduler(bind=db_session.get_bind(), sink=ListSink(), minutes=[60])
+        scheduler._session_factory = sessionmaker(bind=scheduler.bind)
+        workers.append(scheduler)
+
+    reminders = workers[0]._load(datetime.utcnow(), datetime.utcnow() + timedelta(minutes=5))
+    assert [r.event_id for r in reminders] == [event.id]
+
+    for scheduler in workers:
+        assert scheduler._deliver(reminders[0])
+    assert [len(s.sink.delivered) for s in workers] == [1, 0]
+
+    # A rescheduled event no longer has the old reminder
+    event.starts_at += timedelta(hours=1)
+    db_session.commit()
+    workers[1]._deliver(reminders[0])
+    assert workers[1].sink.delivered == []
+
+
+def test_refresh_loads_series_only_when_due(db_session, org_user, monkeypatch):
+    """Test a series is expanded once, then skipped until it is due or changed"""
+    from app import reminders
+
+    now = datetime.utcnow().replace(microsecond=0)
+    series = models.Event(user_id=org_user.id, org_id=org_user.current_org_id, title="Haftalık toplantı",
+                          starts_at=now - timedelta(days=5), rrule="FREQ=WEEKLY")
+    db_session.add(series)
+    db_session.commit()
+
+    expanded = []
+    original = reminders.event_reminders
+    monkeypatch.setattr(reminders, "event_reminders", lambda event, *args: expanded.append(event.id) or original(event, *args))
+    scheduler = ReminderScheduler(bind=db_session.get_bind(), sink=ListSink(), minutes=[60])
+    scheduler._session_factory = sessionmaker(bind=scheduler.bind)
+
+    assert scheduler._load(now, now + timedelta(minutes=5)) == []
+    db_session.refresh(series)
+    assert series.next_occurrence_at == now + timedelta(days=2)
+    assert scheduler._load(now, now + timedelta(minutes=5)) == []
+    assert expanded == [series.id]
+
+    # Moving next week's occurrence to within the hour brings the series back
+    series.exceptions.append(models.EventException(original_start=now + timedelta(days=9),
+                                                   starts_at=now + timedelta(minutes=62)))
+    db_session.commit()
+    assert series.next_occurrence_at is None
+    loaded = scheduler._load(now, now + timedelta(minutes=5))
+    assert [(r.event_id, r.starts_at) for r in loaded] == [(series.id, now + timedelta(minutes=62))]
+    db_session.refresh(series)
+    assert series.next_occurrence_at == now + timedelta(minutes=62)
@@ -0,0 +1,96 @@
+"""Test org sharding across SQLite files"""
+from datetime import datetime
+import pytest
+from sqlalchemy import select
+from starlette.requests import Request
+from app import models
+from app.auth import create_access_token
+from app.database import Base
+from app.shards import OrgMoved, ShardMap, copy_changes, copy_org_row, _copy_rows
+
+
+@pytest.fixture
+def shard_map(tmp_path):
+    shards = ShardMap({"default": f"sqlite:///{tmp_path}/a.db", "b": f"sqlite:///{tmp_path}/b.db"}, ttl=0)
+    for engine in shards.engines().values():
+        Base.metadata.create_all(bind=engine)
+    yield shards
+    for engine in shards.engines().values():
+        engine.dispose()
+
+
+def seed_org(db):
+    user = models.User(email="owner@example.com", password_hash="x", name="Owner")
+    org = models.Org(name="Test Hukuk Bürosu")
+    db.add_all([user, org])
+    db.flush()
+    db.add(models.Membership(user_id=user.id, org_id=org.id, role=models.RoleEnum.owner))
+    client = models.Client(user_id=user.id, org_id=org.id, name="Ayşe Yılmaz")
+    db.add(client)
+    db.flush()
+    case = models.Case(user_id=user.id, org_id=org.id, client_id=client.id, case_number="2026/1", title="Dava")
+    db.add(case)
+    db.flush()
+    db.add(models.Event(user_id=user.id, org_id=org.id, case_id=case.id, title="Duruşma",
+                        starts_at=datetime(2026, 11, 2, 10)))
+    db.commit()
+    return user.id, org.id
+
+
+def test_move_routes_and_fences(shard_map):
+    """Test a moved org is served from its new shard and its old copy refuses writes"""
+    db = shard_map.session()
+    user_id, org_id = seed_org(db)
+    token = create_access_token({"user_id": user_id, "org_id": org_id, "role": "owner"})
+    request = Request({"type": "http", "query_string": b"",
+                       "headers": [(b"authorization", f"Bearer {token}".encode())]})
+    assert shard_map.session_for(request).get_bind() is shard_map.engine()
+
+    shard_map.move_org(org_id, "b", log=lambda *_: None)
+    assert shard_map.shard_for(org_id) == "b"
+    target = shard_map.session_for(request)
+    assert target.get_bind() is shard_map.engine("b")
+    assert [c.name for c in target.query(models.Client)] == ["Ayşe Yılmaz"]
+    assert target.query(models.Event).one().case.case_number == "2026/1"
+    assert target.get(models.Org, org_id).moved_to is None
+    target.close()
+
+    # Writers still routed to the old shard are turned away
+    db.add(models.Client(user_id=user_id, org_id=org_id, name="Geç Yazan"))
+    with pytest.raises(OrgMoved):
+        db.commit()
+    db.rollback()
+    db.close()
+
+    shard_map.purge(org_id, "default")
+    with shard_map.engine().connect() as conn:
+        assert conn.execute(select(models.Client.id)).all() == []
+        # The directory keeps the org and its members
+        assert conn.execute(select(models.Org.moved_to)).scalar() == "b"
+        assert conn.execute(select(models.Membership.org_id)).scalar() == org_id
+
+
+def test_copy_changes_catches_up(shard_map):
+    """Test rows changed or deleted after the bulk copy are brought over"""
+    db = shard_map.session()
+    _, org_id = seed_org(db)
+    source, target = shard_map.engine(), shard_map.engine("b")
+    since = db.get(models.Org, org_id).sync_version
+    with source.connect() as src, target.begin() as dst:
+        copy_org_row(src, dst, org_id, authors=True)
+        for name in ("clients", "cases", "events"):
+            _copy_rows(src, dst, name, models.Base.metadata.tables[name].c.org_id == org_id)
+
+    client = db.query(models.Client).one()
+    client.name = "Ayşe Kaya"
+    db.delete(db.query(models.Event).one())
+    db.add(models.Client(user_id=client.user_id, org_id=org_id, name="Mehmet Demir"))
+    db.commit()
+    db.close()
+
+    with source.connect() as src, target.begin() as dst:
+        upto, copied = copy_changes(src, dst, org_id, since)
+    assert upto > since and copied == 2
+    with target.connect() as conn:
+        assert sorted(conn.execute(select(models.Client.name)).scalars()) == ["Ayşe Kaya", "Mehmet Demir"]
+        assert conn.execute(select(models.Event.id)).all() == []
@@ -0,0 +1,46 @@
+"""Test the API's cold start stays cheap"""
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+# Seconds of wall-clock time for a fresh interpreter to import app.main (about 1.3s locally)
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET_SECONDS", "4"))
+
+
+def run_python(code: str) -> str:
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                          check=True).stdout
+
+
+def _timed_import() -> float:
+    started = time.perf_counter()
+    run_python("import app.main")
+    return time.perf_counter() - started
+
+
+def test_import_stays_within_startup_budget():
+    """Test importing the full app in a fresh interpreter fits the wall-clock budget"""
+    run_python("import app.main")  # Compile bytecode once, as a deployed image has it
+    elapsed = min(_timed_import() for _ in range(3))
+    assert elapsed < STARTUP_BUDGET, f"import app.main took {elapsed:.2f}s, budget {STARTUP_BUDGET}s"
+
+
+def test_heavy_dependencies_and_engine_load_on_first_use():
+    """Test passlib, jose and the engine stay unloaded until auth or the database is used"""
+    output = run_python(
+        "import json, sys\n"
+        "import app.main, app.database\n"
+        "heavy = ('passlib', 'jose', 'cryptography')\n"
+        "loaded = [m for m in heavy if m in sys.modules]\n"
+        "engine_before = app.database._engine is not None\n"
+        "from app.auth import create_access_token, decode_token\n"
+        "assert decode_token(create_access_token({'user_id': 1}))['user_id'] == 1\n"
+        "from app.database import engine\n"
+        "print(json.dumps({'loaded': loaded, 'engine_before': engine_before,\n"
+        "                  'jose_after': 'jose' in sys.modules, 'engine_after': app.database._engine is engine}))\n"
+    ).splitlines()[-1]
+    assert json.loads(output) == {"loaded": [], "engine_before": False, "jose_after": True, "engine_after": True}
@@ -0,0 +1,58 @@
+"""Test the SSE change hub"""
+import asyncio
+import json
+from app import models
+from app.stream import ChangeHub
+
+
+def frames_of(text):
+    return [dict(line.split(": ", 1) for line in frame.split("\n")) for frame in text.strip().split("\n\n")]
+
+
+def test_fan_out_and_resume():
+    """Test subscribers get their org's changes and resume from Last-Event-ID"""
+    async def run():
+        hub = ChangeHub()
+        await hub.start()
+        first, other = hub.subscribe(1), hub.subscribe(2)
+        assert await first.__anext__() == "retry: 3000\n\n"
+        await other.__anext__()
+
+        pending = asyncio.ensure_future(first.__anext__())
+        waiting = asyncio.ensure_future(other.__anext__())
+        await asyncio.sleep(0)
+        hub.publish(1, [("cases", 7, "update"), ("events", 3, "create")])
+        frame = frames_of(await pending)[0]
+        assert frame["event"] == "change"
+        assert json.loads(frame["data"]) == {"entity": "cases", "id": 7, "op": "update", "version": 1}
+        assert not waiting.done()
+        waiting.cancel()
+
+        # Resuming after the first change replays the second
+        resumed = hub.subscribe(1, frame["id"])
+        await resumed.__anext__()
+        assert json.loads(frames_of(await resumed.__anext__())[0]["data"])["id"] == 3
+
+        # Ids from another process cannot be resumed
+        stale = hub.subscribe(1, "deadbeef-1")
+        await stale.__anext__()
+        assert frames_of(await stale.__anext__())[0]["event"] == "reset"
+
+        await hub.stop()
+
+    asyncio.run(run())
+
+
+def test_commits_publish_changes(db_session, org_user, monkeypatch):
+    """Test committed writes are published and rolled back ones are not"""
+    published = []
+    monkeypatch.setattr("app.stream.change_hub.publish", lambda org_id, changes: published.append((org_id, changes)))
+
+    client = models.Client(user_id=org_user.id, org_id=org_user.current_org_id, name="Ayşe")
+    db_session.add(client)
+    db_session.commit()
+    client.name = "Fatma"
+    db_session.flush()
+    db_session.rollback()
+
+    assert published == [(org_user.current_org_id, [("clients", client.id, "create")])]
@@ -0,0 +1,54 @@
+"""Test delta sync versions and tombstones"""
+from datetime import datetime, timedelta
+from app import models
+from app.sync import Cursor, changes_since, prune_tombstones
+
+
+def sync_all(db, org_id, cursor, limit=2):
+    """Follow pages to the end; returns (entity, id) items and the final cursor"""
+    items = []
+    while True:
+        page = changes_since(db, org_id, cursor, limit)
+        items += [("clients", row.id) for row in page.clients]
+        items += [("cases", row.id) for row in page.cases]
+        items += [("deleted", row.entity, row.entity_id) for row in page.deleted]
+        cursor = page.next
+        if not page.has_more:
+            return items, cursor
+
+
+def test_changes_and_tombstones_since_cursor(db_session, org_user):
+    """Test writes get increasing versions and a sync returns only what changed"""
+    org_id = org_user.current_org_id
+    clients = [models.Client(user_id=org_user.id, org_id=org_id, name=f"Müvekkil {i}") for i in range(5)]
+    db_session.add_all(clients)
+    db_session.commit()
+    assert {c.sync_version for c in clients} == {1}
+
+    items, cursor = sync_all(db_session, org_id, Cursor.start(0))
+    assert sorted(items) == sorted(("clients", c.id) for c in clients)
+    assert changes_since(db_session, org_id, cursor, 10).clients == []
+
+    case = models.Case(user_id=org_user.id, org_id=org_id, client_id=clients[0].id, case_number="2026/1", title="Dava")
+    clients[1].name = "Yeni Ad"
+    db_session.add(case)
+    db_session.delete(clients[4])
+    db_session.commit()
+
+    items, cursor = sync_all(db_session, org_id, cursor)
+    assert items == [("clients", clients[1].id), ("cases", case.id), ("deleted", "clients", 5)]
+
+
+def test_pruned_tombstones(db_session, org_user):
+    """Test pruning records the newest version it removed"""
+    org_id = org_user.current_org_id
+    client = models.Client(user_id=org_user.id, org_id=org_id, name="Silinecek")
+    db_session.add(client)
+    db_session.commit()
+    db_session.delete(client)
+    db_session.commit()
+
+    assert prune_tombstones(db_session.get_bind(), timedelta(days=-1)) == 1
+    org = db_session.get(models.Org, org_id)
+    db_session.refresh(org)
+    assert org.sync_pruned_version == org.sync_version == 2
@@ -0,0 +1,57 @@
+"""Test local request tracing"""
+import json
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from app.tracing import Exporter, TracingMiddleware, instrument_fastapi, traced
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+@traced("lookup")
+def lookup():
+    # Sync dependency, run in the threadpool
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT 42")).scalar()
+
+
+def make_app(exporter: Exporter, sample_rate: float):
+    instrument_fastapi()
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware, sample_rate=sample_rate, exporter=exporter)
+
+    @app.get("/answer/{n}")
+    def answer(n: int, value: int = Depends(lookup)):
+        return {"n": n, "value": value}
+
+    return app
+
+
+def test_spans_follow_dependencies_threads_and_sql(tmp_path):
+    """Test a sampled request records nested spans and exports OTLP JSON lines"""
+    path = tmp_path / "traces.jsonl"
+    client = TestClient(make_app(Exporter(path=str(path)), sample_rate=1.0))
+    response = client.get("/answer/1", headers={"traceparent": f"00-{'ab' * 16}-{'cd' * 8}-01"})
+    assert response.headers["x-trace-id"] == "ab" * 16
+
+    line = json.loads(path.read_text().splitlines()[0])
+    spans = {s["name"]: s for s in line["resourceSpans"][0]["scopeSpans"][0]["spans"]}
+    root = spans["GET /answer/{n}"]
+    assert root["parentSpanId"] == "cd" * 8
+    assert spans["dependencies"]["parentSpanId"] == root["spanId"]
+    assert spans["lookup"]["parentSpanId"] == spans["dependencies"]["spanId"]
+    assert spans["db.query"]["parentSpanId"] == spans["lookup"]["spanId"]
+    assert spans["endpoint answer"]["parentSpanId"] == root["spanId"]
+    assert spans["serialize"]["parentSpanId"] == root["spanId"]
+    assert {"key": "db.statement", "value": {"stringValue": "SELECT 42"}} in spans["db.query"]["attributes"]
+
+
+def test_unsampled_requests_are_not_traced():
+    """Test nothing is recorded when the request is not sampled"""
+    exporter = Exporter(path=None)
+    client = TestClient(make_app(exporter, sample_rate=0.0))
+    response = client.get("/answer/2")
+    assert response.json() == {"n": 2, "value": 42}
+    assert "x-trace-id" not in response.headers
+    assert exporter.recent() == {"resourceSpans": []}